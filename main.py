@@ -9,11 +9,35 @@ def main():
     
     parser.add_argument("input_file", help="Python source file")
     parser.add_argument("-o", "--output", help="Output assembly file")
-    parser.add_argument("-O", "--optimize", type=int, choices=[0, 1, 2, 3], default=1,
-                      help="Optimization level (0-3)")
+    parser.add_argument("-O", "--optimize", choices=["0", "1", "2", "3", "s"], default="1",
+                      help="Optimization level (0-3, or s to optimize for size)")
     parser.add_argument("--dump-ast", action="store_true", help="Dump AST")
     parser.add_argument("--dump-tokens", action="store_true", help="Dump tokens")
     parser.add_argument("--dump-ir", action="store_true", help="Dump intermediate representation")
+    parser.add_argument("--time-passes", action="store_true", help="Report time spent in each optimization pass")
+    parser.add_argument("--stats", action="store_true", help="Report optimization pass statistics")
+    parser.add_argument("--size-report", action="store_true",
+                      help="Assemble the output and report section and function sizes")
+    parser.add_argument("--remarks-output", help="Write optimization remarks to this file")
+    parser.add_argument("--remarks-format", choices=["yaml", "json"], default="yaml",
+                      help="Format of the optimization remarks file")
+    parser.add_argument("--remarks-kind", action="append", choices=["passed", "missed", "analysis"],
+                      help="Only keep remarks of this kind (repeatable)")
+    parser.add_argument("--config", help="Optimizer configuration file to build with, or to write when autotuning")
+    parser.add_argument("--autotune", type=int, metavar="BUDGET", default=0,
+                      help="Time this many builds of the program and keep the fastest configuration")
+    parser.add_argument("--link-with", action="append", metavar="FILE",
+                      help="Extra file linked into autotuning builds, such as the runtime (repeatable)")
+    parser.add_argument("--cache-dir", help="Reuse optimized IR and assembly of unchanged functions from this directory "
+                      "(entries are pickles; only use a directory no other user can write)")
+    parser.add_argument("--cache-size", type=int, default=64, metavar="MB",
+                      help="Size limit of the cache directory; least recently used entries are evicted")
+    parser.add_argument("--benchmark", action="store_true",
+                      help="Run the program built with each register allocator and compare runtimes (see --link-with)")
+    parser.add_argument("--frame-report", action="store_true",
+                      help="Report each function's stack frame size before and after slot sharing")
+    parser.add_argument("--peephole-report", action="store_true",
+                      help="Report how often each peephole rule fired")
     
     args = parser.parse_args()
     
@@ -33,10 +57,24 @@ def main():
     return run_compiler(
         args.input_file,
         args.output,
-        args.optimize,
-        True,  # Always dump AST
-        True,  # Always dump tokens
-        True   # Always dump IR
+        args.optimize if args.optimize == "s" else int(args.optimize),
+        dump_ast=True,  # Always dump AST
+        dump_tokens_flag=True,  # Always dump tokens
+        dump_ir=True,  # Always dump IR
+        time_passes=args.time_passes,
+        stats=args.stats,
+        remarks_output=args.remarks_output,
+        remarks_format=args.remarks_format,
+        remarks_kinds=args.remarks_kind,
+        size_report=args.size_report,
+        config_file=args.config,
+        autotune_budget=args.autotune,
+        link_with=args.link_with,
+        cache_dir=args.cache_dir,
+        cache_size=args.cache_size,
+        benchmark=args.benchmark,
+        frame_report=args.frame_report,
+        peephole_report=args.peephole_report
     )
 
 if __name__ == "__main__":
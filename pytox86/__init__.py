@@ -7,34 +7,77 @@ from .analyzer import SemanticAnalyzer
 from .irgen import IRGenerator
 from .optim import Optimizer
 from .codegen import X86Generator
+from .cache import optimize_cached, generate_cached
+from .sink import StreamSink
+
+DEFAULT_REGISTER_ALLOCATORS = {0: "stack", 3: "graph-coloring"}
+
+# Bytes loop starts are aligned to; -O1 and -Os do not pad
+DEFAULT_LOOP_ALIGNMENTS = {2: 16, 3: 16}
 
 class Transpiler:
-    def __init__(self, optimization_level=1):
+    def __init__(self, optimization_level=1, config=None, cache=None, register_allocator=None):
         self.lexer = Lexer()
         self.parser = Parser()
         self.analyzer = SemanticAnalyzer()
         self.irgen = IRGenerator()
-        self.optimizer = Optimizer(optimization_level)
-        self.codegen = X86Generator()
         
-    def transpile(self, source_code, filename="<unknown>"):
+        # A tuned configuration overrides the level's parameters and pass order
+        config = config or {}
+        self.optimizer = Optimizer(
+            optimization_level,
+            config.get("params"),
+            config.get("passes"),
+            config.get("late_passes"),
+        )
+        
+        # Values live in registers from -O1 on; -O0 keeps every variable in
+        # memory and -O3 spends more compile time on coloring
+        if register_allocator is None:
+            register_allocator = config.get("register_allocator", DEFAULT_REGISTER_ALLOCATORS.get(optimization_level, "linear-scan"))
+            
+        self.codegen = X86Generator(
+            optimize_size=optimization_level == "s",
+            register_allocator=register_allocator,
+            block_layout=optimization_level != 0,
+            loop_alignment=config.get("loop_alignment", DEFAULT_LOOP_ALIGNMENTS.get(optimization_level, 0)),
+            peephole=optimization_level != 0,
+        )
+        self.cache = cache
+        
+    def transpile(self, source_code, filename="<unknown>", output=None):
+        """The assembly for source_code, or None after streaming it to the
+        text stream output."""
+        sink = StreamSink(output) if output is not None else None
+        
         tokens = self.lexer.tokenize(source_code)
         ast = self.parser.parse(tokens)
         self.analyzer.analyze(ast)
         ir = self.irgen.generate(ast)
+        
+        if self.cache is not None:
+            optimized_ir = optimize_cached(self.optimizer, ir, self.cache)
+            return generate_cached(self.codegen, optimized_ir, self.cache, sink)
+            
         optimized_ir = self.optimizer.optimize(ir)
-        assembly = self.codegen.generate(optimized_ir)
+        assembly = self.codegen.generate(optimized_ir, sink=sink)
         return assembly
 
+    def pass_statistics(self):
+        """Timing and change counts for each optimizer pass of the last transpile."""
+        return self.optimizer.stats.to_dict()
+
+    def optimization_remarks(self, kinds=None):
+        """Remarks on what the optimizer did and did not do during the last transpile."""
+        return self.optimizer.remarks.to_list(kinds)
+
     def transpile_file(self, input_file, output_file=None):
         with open(input_file, 'r') as f:
             source_code = f.read()
             
-        assembly = self.transpile(source_code, input_file)
-        
         if output_file:
             with open(output_file, 'w') as f:
-                f.write(assembly)
+                self.transpile(source_code, input_file, f)
             return f"Assembly written to {output_file}"
         else:
-            return assembly
+            return self.transpile(source_code, input_file)
@@ -0,0 +1,43 @@
+from dataclasses import dataclass, field
+from typing import List
+
+# What the code generator emits: instructions, labels and directives, kept
+# apart until a function is finished so the peephole optimizer can work on
+# opcodes and operands rather than text
+
+@dataclass
+class Instruction:
+    opcode: str
+    operands: List[str] = field(default_factory=list)
+    indent: str = ""
+
+    def render(self):
+        if not self.operands:
+            return f"{self.indent}{self.opcode}"
+        return f"{self.indent}{self.opcode} {', '.join(self.operands)}"
+
+    def map_operands(self, function):
+        return Instruction(self.opcode, [function(operand) for operand in self.operands], self.indent)
+
+@dataclass
+class Label:
+    name: str
+    indent: str = ""
+
+    def render(self):
+        return f"{self.indent}{self.name}:"
+
+    def map_operands(self, function):
+        return self
+
+@dataclass
+class Directive:
+    # Blank lines and comments are directives too
+    text: str
+    indent: str = ""
+
+    def render(self):
+        return f"{self.indent}{self.text}"
+
+    def map_operands(self, function):
+        return self
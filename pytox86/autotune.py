@@ -0,0 +1,146 @@
+import json
+import random
+
+from .optim import Optimizer, OPTIMIZATION_PASSES
+from .bench import time_program, DEFAULT_COMPILER_FLAGS
+
+# Values the search draws each tunable parameter from
+PARAM_CHOICES = {
+    "inline_threshold": [0, 8, 16, 30, 60],
+    "inline_caller_budget": [0, 100, 400, 1500, 4000],
+    "unroll_factor": [1, 2, 4, 8],
+    "full_unroll_limit": [0, 8, 16, 32, 64],
+    "unroll_budget": [0, 48, 96, 320, 1000],
+    "specialize_threshold": [-32, -16, 0, 16],
+    "max_specializations": [0, 2, 4, 8],
+}
+
+def default_config(optimization_level=2):
+    optimizer = Optimizer(optimization_level)
+    return {
+        "optimization_level": optimization_level,
+        "passes": [optimization.__name__ for optimization in optimizer.optimizations],
+        "late_passes": [optimization.__name__ for optimization in optimizer.late_optimizations],
+        "params": dict(optimizer.params),
+    }
+
+def load_config(path):
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def save_config(config, path):
+    with open(path, 'w') as f:
+        json.dump(config, f, indent=2)
+        f.write("\n")
+
+class Autotuner:
+    """Searches pass orders and parameters for the fastest build of one program.
+
+    Every candidate is compiled, assembled and linked with the C compiler,
+    then run; candidates whose exit status or output differ from the -O0
+    build are rejected.
+    """
+
+    def __init__(self, source, optimization_level=2, link_with=(), compiler="gcc",
+                 compiler_flags=DEFAULT_COMPILER_FLAGS, repeats=3, timeout=10, seed=0):
+        self.source = source
+        self.optimization_level = optimization_level
+        self.link_with = list(link_with)
+        self.compiler = compiler
+        self.compiler_flags = list(compiler_flags)
+        self.repeats = repeats
+        self.timeout = timeout
+        self.rng = random.Random(seed)
+        self.reference = None
+        self.history = []
+
+    def tune(self, budget):
+        """Evaluate up to budget candidates; returns the best config and its time."""
+        self.reference = self.run(self.build({"optimization_level": 0}), 1)
+        if self.reference is None:
+            raise RuntimeError("Unoptimized build of the program failed")
+
+        best = default_config(self.optimization_level)
+        best_time = self.evaluate(best)
+
+        if best_time is None:
+            raise RuntimeError("Default configuration failed to build or run")
+
+        for step in range(budget - 1):
+            # Alternate greedy steps around the best config with random restarts
+            if step % 4 == 3:
+                candidate = self.random_config()
+            else:
+                candidate = self.mutate(best)
+
+            seconds = self.evaluate(candidate)
+            if seconds is not None and seconds < best_time:
+                best, best_time = candidate, seconds
+
+        return best, best_time
+
+    def evaluate(self, config):
+        # A pass order that breaks the compiler is just a failed candidate
+        try:
+            result = self.run(self.build(config), self.repeats)
+        except Exception:
+            result = None
+
+        seconds = None
+        if result is not None:
+            status, output, seconds = result
+            reference_status, reference_output, _ = self.reference
+
+            if (status, output) != (reference_status, reference_output):
+                seconds = None
+
+        self.history.append((config, seconds))
+        return seconds
+
+    def build(self, config):
+        from pytox86 import Transpiler
+
+        level = config.get("optimization_level", self.optimization_level)
+        return Transpiler(level, config).transpile(self.source)
+
+    def run(self, assembly, repeats):
+        return time_program(assembly, self.link_with, repeats, self.timeout, self.compiler, self.compiler_flags)
+
+    def mutate(self, config):
+        config = json.loads(json.dumps(config))
+
+        # Either pipeline may gain any pass, not only those the level runs;
+        # the late one may be left empty
+        pipeline = self.rng.choice(["passes", "late_passes"])
+        passes = config[pipeline]
+        shortest = 1 if pipeline == "passes" else 0
+        missing = [name for name in OPTIMIZATION_PASSES if name not in passes]
+        choice = self.rng.randrange(4)
+
+        if choice == 0 and len(passes) > 1:
+            i, j = self.rng.sample(range(len(passes)), 2)
+            passes[i], passes[j] = passes[j], passes[i]
+        elif choice == 1 and len(passes) > shortest:
+            passes.pop(self.rng.randrange(len(passes)))
+        elif choice == 2 and missing:
+            passes.insert(self.rng.randrange(len(passes) + 1), self.rng.choice(missing))
+        else:
+            name = self.rng.choice(sorted(PARAM_CHOICES))
+            config["params"][name] = self.rng.choice(PARAM_CHOICES[name])
+
+        return config
+
+    def random_config(self):
+        config = default_config(self.optimization_level)
+        self.rng.shuffle(config["passes"])
+        config["params"] = {name: self.rng.choice(values) for name, values in PARAM_CHOICES.items()}
+        return config
+
+    def format_history(self):
+        lines = ["=== Autotuning ==="]
+
+        for i, (config, seconds) in enumerate(self.history):
+            timing = "failed" if seconds is None else f"{seconds * 1000:.3f} ms"
+            lines.append(f"  {i:>4}  {timing:>12}  {len(config['passes'])}+{len(config['late_passes'])} passes  {config['params']}")
+
+        return "\n".join(lines)
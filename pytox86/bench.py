@@ -0,0 +1,75 @@
+import os
+import subprocess
+import tempfile
+import time
+
+DEFAULT_COMPILER_FLAGS = ("-no-pie", "-z", "noexecstack")
+
+def time_program(assembly, link_with=(), repeats=3, timeout=10, compiler="gcc",
+                 compiler_flags=DEFAULT_COMPILER_FLAGS):
+    """Link assembly into an executable and run it repeats times.
+
+    Returns the exit status, the output and the fastest wall-clock time, or
+    None when the program crashes or times out.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        source = os.path.join(directory, "out.s")
+        binary = os.path.join(directory, "out")
+
+        with open(source, "w") as f:
+            f.write(assembly)
+            f.write("\n")
+
+        result = subprocess.run([compiler, *compiler_flags, "-o", binary, source, *link_with],
+                                capture_output=True, text=True)
+        if result.returncode != 0:
+            raise RuntimeError(f"Linking failed: {result.stderr.strip()}")
+
+        best = None
+        for _ in range(repeats):
+            start = time.perf_counter()
+            try:
+                result = subprocess.run([binary], capture_output=True, timeout=timeout)
+            except subprocess.TimeoutExpired:
+                return None
+            seconds = time.perf_counter() - start
+
+            if result.returncode < 0:
+                return None
+
+            best = seconds if best is None else min(best, seconds)
+
+        return result.returncode, result.stdout, best
+
+def compare_register_allocators(source, optimization_level=1, link_with=(), repeats=5):
+    """Time the program built with each register allocator against the stack-only scheme."""
+    from pytox86 import Transpiler
+    from .codegen import REGISTER_ALLOCATORS
+
+    results = {}
+    for allocator in ["stack", *REGISTER_ALLOCATORS]:
+        assembly = Transpiler(optimization_level, register_allocator=allocator).transpile(source)
+        instructions = sum(1 for line in assembly.splitlines()
+                           if line.startswith("    ") and not line.strip().endswith(":") and not line.strip().startswith("."))
+        results[allocator] = (instructions, time_program(assembly, link_with, repeats))
+
+    return results
+
+def format_comparison(results, baseline="stack"):
+    lines = ["=== Register allocator benchmark ===",
+             f"  {'Allocator':<16}  {'Instrs':>7}  {'Time (ms)':>10}  {'Speedup':>8}"]
+    reference = results[baseline][1]
+
+    for allocator, (instructions, result) in results.items():
+        if result is None:
+            lines.append(f"  {allocator:<16}  {instructions:>7}  {'failed':>10}")
+            continue
+
+        status, output, seconds = result
+        speedup = f"{reference[2] / seconds:.2f}x" if reference and seconds else "-"
+        note = ""
+        if reference and (status, output) != reference[:2]:
+            note = "  (output differs)"
+        lines.append(f"  {allocator:<16}  {instructions:>7}  {seconds * 1000:>10.3f}  {speedup:>8}{note}")
+
+    return "\n".join(lines)
@@ -0,0 +1,264 @@
+import functools
+import hashlib
+import json
+import os
+import pickle
+import re
+import tempfile
+
+from .irgen import IRProgram
+from .callgraph import CallGraph
+
+# Passes whose result for a function depends on other functions' bodies;
+# the last two only transform values no caller makes a float
+INTERPROCEDURAL_PASSES = {
+    "propagate_interprocedural_constants", "inline_functions",
+    "eliminate_tail_recursion", "strength_reduce_induction_variables",
+}
+
+LITERAL_LABEL = re.compile(r"\.LC\d+\b")
+
+@functools.lru_cache(maxsize=None)
+def compiler_fingerprint():
+    """Hash of the compiler's own sources, so entries written by any other
+    version of the IR, the optimizer or the code generator are never read."""
+    directory = os.path.dirname(os.path.abspath(__file__))
+    digest = hashlib.sha256()
+
+    for name in sorted(os.listdir(directory)):
+        if name.endswith(".py"):
+            with open(os.path.join(directory, name), "rb") as f:
+                digest.update(name.encode() + b"\0" + f.read())
+
+    return digest.hexdigest()
+
+def callee_signatures(function, program):
+    functions = {func.name: func for func in program.functions}
+    signatures = {}
+
+    for block in function.blocks:
+        for instr in block.instructions:
+            if instr.op == "call":
+                callee = functions.get(instr.args[0])
+                signatures[instr.args[0]] = len(callee.params) if callee is not None else None
+
+    return sorted(signatures.items())
+
+def fingerprint_function(function, program, options):
+    """Stable hash of a function's structure, its callees' signatures and the options.
+
+    Source lines are left out, so moving a function within its file keeps
+    its cache entries valid.
+    """
+    blocks = []
+    for block in function.blocks:
+        blocks.append([
+            block.label,
+            [[instr.op, [repr(arg) for arg in instr.args], instr.result] for instr in block.instructions],
+            block.next_block.label if block.next_block else None,
+            block.branch_target.label if block.branch_target else None,
+        ])
+
+    structure = {
+        "compiler": compiler_fingerprint(),
+        "name": function.name,
+        "params": function.params,
+        "locals": function.local_vars,
+        "blocks": blocks,
+        "callees": callee_signatures(function, program),
+        "options": options,
+    }
+
+    return hashlib.sha256(json.dumps(structure, sort_keys=True).encode()).hexdigest()
+
+def combine_fingerprints(fingerprints):
+    return hashlib.sha256("".join(fingerprints).encode()).hexdigest()
+
+class CompilationCache:
+    """On-disk store of optimized IR and assembly with LRU eviction by total size.
+
+    Entries are pickles, and unpickling runs arbitrary code: the directory
+    must only be writable by the user running the compiler. A new directory
+    is created private to that user.
+    """
+
+    def __init__(self, directory, max_bytes=64 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+
+    def path(self, kind, key):
+        return os.path.join(self.directory, f"{kind}-{key}.pickle")
+
+    def get(self, kind, key):
+        path = self.path(kind, key)
+
+        try:
+            with open(path, "rb") as f:
+                value = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            self.misses += 1
+            return None
+
+        # The modification time doubles as the last use for eviction
+        os.utime(path)
+        self.hits += 1
+        return value
+
+    def put(self, kind, key, value):
+        fd, temporary = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(value, f)
+
+        os.replace(temporary, self.path(kind, key))
+        self.evict()
+
+    def evict(self):
+        entries = []
+
+        for name in os.listdir(self.directory):
+            if not name.endswith(".pickle"):
+                continue
+
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, name))
+
+        total = sum(size for _, size, _ in entries)
+
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            total -= size
+
+    def format(self):
+        return f"=== Compilation cache ===\n  {self.hits} hits, {self.misses} misses ({self.directory})"
+
+def cache_units(program, interprocedural):
+    """Groups of functions whose optimization does not depend on anything outside them."""
+    if not interprocedural:
+        return [[func] for func in program.functions]
+
+    # Inlining and constant propagation only follow call edges, so each
+    # connected component of the call graph is optimized on its own
+    graph = CallGraph(program)
+    component = {}
+
+    for name in graph.functions:
+        if name in component:
+            continue
+
+        worklist = [name]
+        while worklist:
+            member = worklist.pop()
+            if member not in component:
+                component[member] = name
+                worklist.extend(graph.callees[member] + graph.callers[member])
+
+    units = {}
+    for func in program.functions:
+        units.setdefault(component[func.name], []).append(func)
+
+    return list(units.values())
+
+def optimize_cached(optimizer, program, cache):
+    """Optimize only the units of program that are not already in the cache."""
+    options = optimizer.options()
+    interprocedural = any(name in INTERPROCEDURAL_PASSES for name in options["passes"])
+
+    results = []
+    missed = []
+
+    for unit in cache_units(program, interprocedural):
+        key = combine_fingerprints([fingerprint_function(func, program, options) for func in unit])
+        functions = cache.get("ir", key)
+
+        if functions is None:
+            missed.append((key, unit))
+        results.append((key, functions))
+
+    # Units do not affect each other, so all misses share one optimizer run;
+    # it runs even when empty so its statistics describe this build
+    names = {func.name: key for key, unit in missed for func in unit}
+    subprogram = IRProgram([func for _, unit in missed for func in unit], list(program.global_vars))
+    optimizer.optimize(subprogram)
+
+    optimized = {key: [] for key, _ in missed}
+    for func in subprogram.functions:
+        # Specialized clones are named after the function they came from
+        optimized[names[func.name.split(".constprop.")[0]]].append(func)
+
+    for key, functions in optimized.items():
+        cache.put("ir", key, functions)
+
+    results = [(key, functions if functions is not None else optimized[key]) for key, functions in results]
+
+    program.functions = uniquify_labels([func for _, functions in results for func in functions])
+    return program
+
+def uniquify_labels(functions):
+    # Entries from different builds may have numbered labels from the same
+    # counters, e.g. the unroller's; qualify any clash with the function name
+    seen = set()
+
+    for func in functions:
+        renamed = {block.label: f"{block.label}.{func.name}" for block in func.blocks if block.label in seen}
+
+        for block in func.blocks:
+            if block.label in renamed:
+                block.label = renamed[block.label]
+
+            for instr in block.instructions:
+                if instr.op == "jump" and instr.args[0] in renamed:
+                    instr.args[0] = renamed[instr.args[0]]
+                elif instr.op == "branch":
+                    instr.args[1:3] = [renamed.get(label, label) for label in instr.args[1:3]]
+
+            seen.add(block.label)
+
+    return functions
+
+def generate_cached(generator, program, cache, sink=None):
+    """Emit assembly, reusing the cached code of unchanged functions."""
+    options = generator.options()
+
+    def generate_function(func):
+        # Which values are floats depends on the callers too
+        key = fingerprint_function(func, program, dict(options, floats=generator.types.signature(func)))
+        entry = cache.get("asm", key)
+
+        if entry is None:
+            start = len(generator.output)
+            generator.function_literals = {}
+            generator.generate_function(func)
+
+            # Literal labels are numbered per program; store them by index
+            literals = generator.function_literals
+            labels = {label: i for i, label in enumerate(literals)}
+            template = lambda operand: LITERAL_LABEL.sub(lambda match: f"{{LC{labels[match.group(0)]}}}",
+                                                         operand.replace("{", "{{").replace("}", "}}"))
+            code = [record.map_operands(template) for record in generator.output[start:]]
+            generator.function_literals = None
+
+            cache.put("asm", key, {
+                "code": code,
+                "literals": list(literals.values()),
+                "frame": generator.frame_sizes[func.name],
+            })
+            return
+
+        generator.frame_sizes[func.name] = entry["frame"]
+        labels = {f"LC{i}": generator.add_constant(kind, value) for i, (kind, value) in enumerate(entry["literals"])}
+        generator.output.extend(record.map_operands(lambda operand: operand.format(**labels)) for record in entry["code"])
+
+    return generator.generate(program, generate_function, sink)
@@ -0,0 +1,106 @@
+from typing import Dict, List, Set
+from .irgen import IRProgram, IRFunction
+
+class CallGraph:
+    def __init__(self, program):
+        self.functions = {func.name: func for func in program.functions}
+        self.callees = {name: [] for name in self.functions}
+        self.callers = {name: [] for name in self.functions}
+        self.call_sites = {name: [] for name in self.functions}
+
+        for func in program.functions:
+            for block in func.blocks:
+                for instr in block.instructions:
+                    if instr.op == "call" and instr.args[0] in self.functions:
+                        callee = instr.args[0]
+                        self.call_sites[callee].append((func, block, instr))
+
+                        if callee not in self.callees[func.name]:
+                            self.callees[func.name].append(callee)
+                            self.callers[callee].append(func.name)
+
+        self.sccs = self.compute_sccs()
+        self.scc_of = {name: i for i, scc in enumerate(self.sccs) for name in scc}
+
+    def compute_sccs(self):
+        # Tarjan's algorithm; SCCs come out callees before callers
+        index = {}
+        lowlink = {}
+        on_stack = set()
+        stack = []
+        sccs = []
+        counter = 0
+
+        for root in self.functions:
+            if root in index:
+                continue
+
+            work = [(root, iter(self.callees[root]))]
+            index[root] = lowlink[root] = counter
+            counter += 1
+            stack.append(root)
+            on_stack.add(root)
+
+            while work:
+                name, children = work[-1]
+                advanced = False
+
+                for child in children:
+                    if child not in index:
+                        index[child] = lowlink[child] = counter
+                        counter += 1
+                        stack.append(child)
+                        on_stack.add(child)
+                        work.append((child, iter(self.callees[child])))
+                        advanced = True
+                        break
+                    elif child in on_stack:
+                        lowlink[name] = min(lowlink[name], index[child])
+
+                if advanced:
+                    continue
+
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    lowlink[parent] = min(lowlink[parent], lowlink[name])
+
+                if lowlink[name] == index[name]:
+                    scc = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        scc.append(member)
+                        if member == name:
+                            break
+                    sccs.append(scc)
+
+        return sccs
+
+    def is_recursive(self, name):
+        scc = self.sccs[self.scc_of[name]]
+        return len(scc) > 1 or name in self.callees[name]
+
+    def bottom_up(self):
+        return [name for scc in self.sccs for name in scc]
+
+def remove_dead_functions(program):
+    """Drop functions that can no longer be reached from main."""
+    graph = CallGraph(program)
+    if "main" not in graph.functions:
+        return False
+
+    live = set()
+    worklist = ["main"]
+
+    while worklist:
+        name = worklist.pop()
+        if name not in live:
+            live.add(name)
+            worklist.extend(graph.callees[name])
+
+    if len(live) == len(program.functions):
+        return False
+
+    program.functions = [func for func in program.functions if func.name in live]
+    return True
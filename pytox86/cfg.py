@@ -0,0 +1,148 @@
+from typing import Dict, List, Optional
+from .irgen import IRFunction, BasicBlock, IRInstruction
+
+TERMINATORS = ("jump", "branch", "ret")
+
+def terminator(block):
+    """Return the first terminator of a block; anything after it is dead."""
+    for instr in block.instructions:
+        if instr.op in TERMINATORS:
+            return instr
+    return None
+
+def is_temp(value):
+    # A bare "%" is the modulo operator of a binop, not a temp
+    return isinstance(value, str) and value.startswith("%") and len(value) > 1
+
+class ControlFlowGraph:
+    def __init__(self, function):
+        self.function = function
+        self.blocks = {block.label: block for block in function.blocks}
+        self.succs = {}
+        self.preds = {label: [] for label in self.blocks}
+
+        for i, block in enumerate(function.blocks):
+            succs = []
+            term = terminator(block)
+
+            if term is None:
+                # Blocks without a terminator fall through in layout order
+                if i + 1 < len(function.blocks):
+                    succs.append(function.blocks[i + 1].label)
+            elif term.op == "jump":
+                succs.append(term.args[0])
+            elif term.op == "branch":
+                succs.extend(term.args[1:3])
+
+            succs = [s for s in dict.fromkeys(succs) if s in self.blocks]
+            self.succs[block.label] = succs
+
+            for succ in succs:
+                self.preds[succ].append(block.label)
+
+        self.entry = function.entry_block.label
+        self.rpo = self.compute_rpo()
+        self.idom = self.compute_dominators()
+        self.dom_children = {label: [] for label in self.rpo}
+
+        for label in self.rpo:
+            parent = self.idom.get(label)
+            if parent is not None and parent != label:
+                self.dom_children[parent].append(label)
+
+    def compute_rpo(self):
+        visited = set()
+        order = []
+        stack = [(self.entry, iter(self.succs.get(self.entry, [])))]
+        visited.add(self.entry)
+
+        while stack:
+            label, children = stack[-1]
+            advanced = False
+
+            for child in children:
+                if child not in visited:
+                    visited.add(child)
+                    stack.append((child, iter(self.succs[child])))
+                    advanced = True
+                    break
+
+            if not advanced:
+                order.append(label)
+                stack.pop()
+
+        order.reverse()
+        return order
+
+    def compute_dominators(self):
+        # Cooper, Harvey and Kennedy's iterative algorithm over reverse postorder
+        index = {label: i for i, label in enumerate(self.rpo)}
+        idom = {self.entry: self.entry}
+        changed = True
+
+        while changed:
+            changed = False
+
+            for label in self.rpo[1:]:
+                new_idom = None
+
+                for pred in self.preds[label]:
+                    if pred not in idom:
+                        continue
+                    if new_idom is None:
+                        new_idom = pred
+                        continue
+
+                    a, b = pred, new_idom
+                    while a != b:
+                        while index[a] > index[b]:
+                            a = idom[a]
+                        while index[b] > index[a]:
+                            b = idom[b]
+                    new_idom = a
+
+                if new_idom is not None and idom.get(label) != new_idom:
+                    idom[label] = new_idom
+                    changed = True
+
+        return idom
+
+    def reachable(self, label):
+        return label in self.idom
+
+    def dominates(self, a, b):
+        if not self.reachable(b):
+            return False
+
+        while True:
+            if a == b:
+                return True
+            parent = self.idom[b]
+            if parent == b:
+                return False
+            b = parent
+
+    def dominator_preorder(self):
+        order = []
+        stack = [self.entry]
+
+        while stack:
+            label = stack.pop()
+            order.append(label)
+            stack.extend(reversed(self.dom_children[label]))
+
+        return order
+
+    def blocks_between(self, dominator, label):
+        """Blocks on some path from dominator to label, excluding dominator itself."""
+        region = set()
+        worklist = [p for p in self.preds[label] if p != dominator]
+
+        while worklist:
+            current = worklist.pop()
+            if current in region or not self.reachable(current):
+                continue
+            region.add(current)
+            worklist.extend(p for p in self.preds[current] if p != dominator)
+
+        return region
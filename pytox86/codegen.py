@@ -1,65 +1,238 @@
+import heapq
+
 from .irgen import IRProgram, IRFunction, BasicBlock, IRInstruction
+from .regalloc import LinearScanAllocator, GraphColoringAllocator, CALLER_SAVED, instruction_uses, instruction_defs, live_intervals, live_parameters
+from .cfg import is_temp, terminator
+from .layout import BlockLayout
+from .constpool import ConstantPool
+from .typeinfer import FloatTypes, FLOAT_OPS
+from .sink import StringSink
+from .peephole import PeepholeOptimizer
+from .asm import Instruction, Label, Directive
+
+# Runtime list layout: a 64-bit length followed by the 64-bit items, as
+# produced by the runtime and read by _py_len and _py_getitem
+LIST_LENGTH_OFFSET = 0
+LIST_ITEMS_OFFSET = 8
+LIST_ITEM_SIZE = 8
+
+# 32-bit halves of the 64-bit registers; writing one zero-extends into the
+# full register with a shorter encoding
+REGISTERS_32 = {
+    "rax": "eax", "rbx": "ebx", "rcx": "ecx", "rdx": "edx", "rsi": "esi", "rdi": "edi",
+    "r8": "r8d", "r9": "r9d", "r10": "r10d", "r11": "r11d",
+    "r12": "r12d", "r13": "r13d", "r14": "r14d", "r15": "r15d",
+}
+
+# IR operations that are lowered to a call
+CALLING_OPS = {"call", "len", "getitem", "newlist"}
+
+ARGUMENT_REGISTERS = ["rdi", "rsi", "rdx", "rcx", "r8", "r9"]
+FLOAT_ARGUMENT_REGISTERS = [f"xmm{i}" for i in range(8)]
+
+# Argument registers that are not also scratch registers, free for values
+# in functions that make no calls
+LEAF_REGISTERS = ["rsi", "rdi", "r8", "r9"]
+
+# Signed 32-bit immediates, the widest most instructions sign-extend
+IMM32_MIN = -2 ** 31
+IMM32_MAX = 2 ** 31 - 1
+IMM64_MAX = 2 ** 63 - 1
+
+ALU_INSTRUCTIONS = {"+": "add", "-": "sub", "*": "imul", "&": "and", "|": "or", "^": "xor"}
+COMMUTATIVE_OPS = {"+", "*", "&", "|", "^"}
+SHIFT_INSTRUCTIONS = {"<<": "sal", ">>": "sar"}
+
+CONDITION_CODES = {"==": "e", "!=": "ne", "<": "l", ">": "g", "<=": "le", ">=": "ge"}
+INVERTED_CONDITIONS = {
+    "e": "ne", "ne": "e", "l": "ge", "ge": "l", "g": "le", "le": "g",
+    "a": "be", "be": "a", "ae": "b", "b": "ae", "fe": "fne", "fne": "fe",
+}
+# The condition that holds with the operands exchanged
+SWAPPED_CONDITIONS = {"==": "==", "!=": "!=", "<": ">", ">": "<", "<=": ">=", ">=": "<="}
+
+# After ucomisd, which flags like an unsigned compare. a and ae are false
+# for unordered (NaN) operands, so < and <= swap sides; fe and fne also
+# look at the parity flag NaNs set
+FLOAT_CONDITIONS = {">": "a", ">=": "ae", "==": "fe", "!=": "fne"}
+FLOAT_INSTRUCTIONS = {"+": "addsd", "-": "subsd", "*": "mulsd", "/": "divsd"}
+
+# Index scales an address can encode, and the multipliers lea reaches
+# with the index also used as the base
+LEA_SCALES = {1, 2, 4, 8}
+LEA_MULTIPLIERS = {2, 3, 4, 5, 8, 9}
+
+# Rough latencies used to choose between tilings of the same IR; reading a
+# memory operand costs MEMORY_OPERAND_COST on top
+INSTRUCTION_COSTS = {"imul": 3, "mul": 3, "idiv": 40}
+MEMORY_OPERAND_COST = 3
+
+def is_register(operand):
+    return operand in REGISTERS_32
+
+def is_memory(operand):
+    return operand is not None and operand.startswith("QWORD PTR")
+
+def is_immediate(operand):
+    return operand is not None and not is_register(operand) and not is_memory(operand)
+
+def division_magic(divisor):
+    """Multiplier m and shift s with n // divisor == (n * m >> 64) >> s
+    for every 0 <= n < 2**63 (Granlund and Montgomery)."""
+    for shift in range(64):
+        multiplier = -(-2 ** (64 + shift) // divisor)
+        if multiplier < 2 ** 64 and multiplier * divisor - 2 ** (64 + shift) <= 2 ** (shift + 1):
+            return multiplier, shift
+    return None
+
+def classify_arguments(floats):
+    """Where each argument goes under the System V ABI: a register, or its
+    index among the arguments passed on the stack."""
+    registers = iter(ARGUMENT_REGISTERS)
+    float_registers = iter(FLOAT_ARGUMENT_REGISTERS)
+    locations = []
+    stack = 0
+    
+    for is_float in floats:
+        register = next(float_registers if is_float else registers, None)
+        
+        if register is None:
+            locations.append(stack)
+            stack += 1
+        else:
+            locations.append(register)
+            
+    return locations
+
+def tiling_cost(code):
+    cost = 0
+    
+    for instr in code:
+        if not isinstance(instr, Instruction):
+            continue
+            
+        cost += INSTRUCTION_COSTS.get(instr.opcode, 1)
+        
+        if instr.opcode == "lea":
+            # Base, index and displacement together take an extra cycle
+            if instr.operands[1].count("+") + instr.operands[1].count("-") >= 2:
+                cost += 1
+        elif any("PTR [" in operand for operand in instr.operands):
+            cost += MEMORY_OPERAND_COST
+            
+    return cost
+
+# Line prefixes by nesting depth, built once
+INDENTS = ["    " * depth for depth in range(4)]
+
+# "stack" keeps every variable in its own frame slot
+REGISTER_ALLOCATORS = {
+    "linear-scan": LinearScanAllocator,
+    "graph-coloring": GraphColoringAllocator,
+}
 
 class X86Generator:
-    def __init__(self):
+    def __init__(self, optimize_size=False, register_allocator="stack", block_layout=False, loop_alignment=0,
+                 peephole=False):
+        if register_allocator != "stack" and register_allocator not in REGISTER_ALLOCATORS:
+            raise ValueError(f"Unknown register allocator '{register_allocator}'")
+        if loop_alignment < 0 or loop_alignment & (loop_alignment - 1):
+            raise ValueError(f"Loop alignment must be a power of two, not {loop_alignment}")
+            
+        self.optimize_size = optimize_size
+        self.register_allocator = register_allocator
+        self.block_layout = block_layout
+        self.loop_alignment = loop_alignment
+        self.peephole = peephole
+        self.peephole_optimizer = None
         self.output = []
         self.indentation = 0
         self.label_counter = 0
-        self.str_literals = {}
-        self.str_counter = 0
+        self.constants = ConstantPool()
         self.current_function = None
         self.stack_vars = {}
+        self.register_vars = {}
+        self.saved_registers = []
         self.stack_size = 0
+        self.stack_lists = {}
+        self.frameless = False
+        self.epilogue_label = None
+        self.next_label = None
+        self.function_literals = None
+        self.frame_sizes = {}
+        self.addresses = {}
+        self.folded = set()
+        self.fused_compares = {}
+        self.local_labels = 0
+        self.use_counts = {}
+        self.def_counts = {}
+        self.types = None
+        
+    def options(self):
+        return {
+            "optimize_size": self.optimize_size,
+            "register_allocator": self.register_allocator,
+            "block_layout": self.block_layout,
+            "loop_alignment": self.loop_alignment,
+            "peephole": self.peephole,
+        }
         
-    def generate(self, ir_program):
+    def generate(self, ir_program, generate_function=None, sink=None):
+        """Write the program's assembly to sink, or return it without one.
+        
+        Each function's lines go to the sink once it is finished; the
+        constants are written after the last function.
+        """
+        collect = sink is None
+        if collect:
+            sink = StringSink()
+            
         self.output = []
         self.indentation = 0
         self.label_counter = 0
-        self.str_literals = {}
-        self.str_counter = 0
+        self.constants = ConstantPool()
+        self.frame_sizes = {}
+        self.types = FloatTypes(ir_program)
+        self.peephole_optimizer = PeepholeOptimizer() if self.peephole else None
         
         self.emit_header()
         
         for func in ir_program.functions:
-            self.generate_function(func)
+            (generate_function or self.generate_function)(func)
+            self.flush(sink)
             
         self.emit_footer()
+        self.flush(sink)
+        sink.close()
+        
+        return sink.getvalue() if collect else None
         
-        return "\n".join(self.output)
+    def flush(self, sink):
+        # Cached functions are stored before this, so the rule counts cover every function
+        if self.peephole_optimizer:
+            self.output = self.peephole_optimizer.optimize(self.output)
+            
+        sink.write_lines([record.render() for record in self.output])
+        self.output = []
         
     def emit_header(self):
-        self.emit_line(".intel_syntax noprefix")
-        self.emit_line(".global main")
-        self.emit_line(".text")
+        self.emit_directive(".intel_syntax noprefix")
+        self.emit_directive(".global main")
+        self.emit_directive(".text")
         
     def emit_footer(self):
-        if self.str_literals:
-            self.emit_line(".section .rodata")
-            
-            for label, value in self.str_literals.items():
-                escaped_value = ""
-                
-                for c in value:
-                    if c == '"':
-                        escaped_value += '\\"'
-                    elif c == '\\':
-                        escaped_value += '\\\\'
-                    elif c == '\n':
-                        escaped_value += '\\n'
-                    elif c == '\t':
-                        escaped_value += '\\t'
-                    elif c == '\r':
-                        escaped_value += '\\r'
-                    else:
-                        escaped_value += c
-                        
-                self.emit_line(f"{label}:")
-                self.emit_line(f'    .string "{escaped_value}"')
-                
+        self.constants.emit(self.emit_directive)
+        
     def generate_function(self, func):
         self.current_function = func
         self.stack_vars = {}
+        self.register_vars = {}
+        self.saved_registers = []
         self.stack_size = 0
+        self.addresses = {}
+        self.folded = set()
+        self.fused_compares = {}
+        self.local_labels = 0
         
         local_vars = set(func.local_vars)
         
@@ -70,40 +243,195 @@ class X86Generator:
                     temp_vars.add(instr.result)
                     
         all_vars = list(local_vars) + list(temp_vars)
-        self.stack_size = len(all_vars) * 8
+        params = live_parameters(func)
+        floats = self.param_floats(func.name, func.params)
+        locations = dict(zip(func.params, classify_arguments(floats)))
         
+        if self.register_allocator != "stack":
+            # Only spilled variables keep a frame slot, next to the slots
+            # that preserve the callee-saved registers the function uses
+            caller_saved = list(CALLER_SAVED)
+            
+            if not any(instr.op in CALLING_OPS for block in func.blocks for instr in block.instructions):
+                # Without calls the argument registers are only needed for the
+                # incoming parameters that are read
+                caller_saved += [reg for reg in LEAF_REGISTERS if reg not in (locations[param] for param in params)]
+                
+            allocator = REGISTER_ALLOCATORS[self.register_allocator](CALLING_OPS, caller_saved)
+            allocation = allocator.allocate(func, all_vars)
+            self.register_vars = allocation.registers
+            all_vars = allocation.spilled
+            self.saved_registers = allocation.callee_saved
+            
+        slots = self.share_stack_slots(func, all_vars)
+        slot_count = max(slots.values(), default=-1) + 1
+        self.stack_size = (slot_count + len(self.saved_registers)) * 8
+        
+        # Lists that do not escape get a region below the variable slots,
+        # laid out like the runtime's heap lists
+        self.stack_lists = {}
+        lists_size = 0
+        for block in func.blocks:
+            for instr in block.instructions:
+                if instr.op == "newlist_stack":
+                    lists_size += LIST_ITEMS_OFFSET + LIST_ITEM_SIZE * instr.args[0]
+                    self.stack_lists[id(instr)] = self.stack_size + lists_size
+                    
+        self.stack_size += lists_size
         if self.stack_size % 16 != 0:
             self.stack_size += 8
             
-        for i, var in enumerate(all_vars):
-            self.stack_vars[var] = i * 8
+        for var, slot in slots.items():
+            self.stack_vars[var] = slot * 8
             
-        self.emit_line("")
-        self.emit_line(f"{func.name}:")
+        self.saved_registers = [(register, (slot_count + i) * 8 + 8)
+                                for i, register in enumerate(self.saved_registers)]
+        
+        # With a slot for every name, as before sharing
+        unshared = (len(all_vars) + len(self.saved_registers)) * 8 + lists_size
+        self.frame_sizes[func.name] = (unshared + unshared % 16, self.stack_size)
+        
+        # Under -Os a function without stack slots or calls needs no frame,
+        # and all of its returns share one epilogue
+        self.frameless = self.optimize_size and self.stack_size == 0 and not any(
+            instr.op in CALLING_OPS for block in func.blocks for instr in block.instructions
+        )
+        self.epilogue_label = f".L{func.name}_epilogue" if self.optimize_size else None
+        
+        self.emit_directive("")
+        self.emit_directive(f".type {func.name}, @function")
+        self.emit_label(func.name)
         self.indentation += 1
         
-        self.emit_line("push rbp")
-        self.emit_line("mov rbp, rsp")
+        if not self.frameless:
+            self.emit("push", "rbp")
+            self.emit("mov", "rbp", "rsp")
         
         if self.stack_size > 0:
-            self.emit_line(f"sub rsp, {self.stack_size}")
+            self.emit("sub", "rsp", self.stack_size)
+            
+        for register, offset in self.saved_registers:
+            self.emit("mov", f"QWORD PTR [rbp-{offset}]", register)
             
-        for i, param in enumerate(func.params):
-            if i < 6:
-                reg = ["rdi", "rsi", "rdx", "rcx", "r8", "r9"][i]
-                self.emit_line(f"mov QWORD PTR [rbp-{self.stack_vars[param]+8}], {reg}")
+        for param in params:
+            location = locations[param]
+            
+            if isinstance(location, int) and self.frameless:
+                # Only the return address sits above the stack arguments
+                self.emit("mov", "rax", f"QWORD PTR [rsp+{(location+1)*8}]")
+                self.store_var(param, "rax")
+            elif isinstance(location, int):
+                self.emit("mov", "rax", f"QWORD PTR [rbp+{(location+2)*8}]")
+                self.store_var(param, "rax")
+            elif location.startswith("xmm"):
+                self.finish_float(param, location)
             else:
-                self.emit_line(f"mov rax, QWORD PTR [rbp+{(i-6+2)*8}]")
-                self.emit_line(f"mov QWORD PTR [rbp-{self.stack_vars[param]+8}], rax")
+                self.store_var(param, location)
                 
+        self.use_counts = {}
+        self.def_counts = {}
         for block in func.blocks:
-            self.emit_line("")
-            self.emit_line(f"{block.label}:")
+            for instr in block.instructions:
+                for name in instruction_uses(instr):
+                    self.use_counts[name] = self.use_counts.get(name, 0) + 1
+                for name in instruction_defs(instr):
+                    self.def_counts[name] = self.def_counts.get(name, 0) + 1
+                    
+        blocks = func.blocks
+        loop_tops = set()
+        
+        if self.block_layout:
+            layout = BlockLayout(func)
+            blocks = layout.order
+            if self.loop_alignment > 1:
+                loop_tops = layout.loop_tops()
+                
+        # Where a block without a terminator continues
+        fallthrough = {block.label: func.blocks[i + 1].label for i, block in enumerate(func.blocks[:-1])}
+        
+        for i, block in enumerate(blocks):
+            following = blocks[i + 1].label if i + 1 < len(blocks) else self.epilogue_label
+            self.emit_directive("")
+            
+            if block.label in loop_tops:
+                self.emit_directive(f".p2align {self.loop_alignment.bit_length() - 1}")
+            self.emit_label(block.label)
+            
+            self.select_addresses(block)
+            self.select_branches(block)
             
             for instr in block.instructions:
+                if id(instr) in self.folded:
+                    continue
+                    
+                # Where execution continues if this instruction does not jump
+                self.next_label = following if instr is block.instructions[-1] else None
                 self.generate_instruction(instr)
                 
+            if terminator(block) is None and block.label in fallthrough and fallthrough[block.label] != following:
+                self.emit("jmp", fallthrough[block.label])
+                
+        if self.epilogue_label and any(instr.op == "ret" for block in func.blocks for instr in block.instructions):
+            self.emit_directive("")
+            self.emit_label(self.epilogue_label)
+            self.emit_epilogue()
+            
         self.indentation -= 1
+        self.emit_directive(f".size {func.name}, .-{func.name}")
+        
+    def share_stack_slots(self, func, names):
+        """Slot numbers for names; names whose lifetimes never overlap share a slot."""
+        intervals = live_intervals(func, set(names), CALLING_OPS)
+        slots = {}
+        count = 0
+        free = []
+        active = []
+        
+        for interval in sorted(intervals.values(), key=lambda interval: (interval.start, interval.name)):
+            # Slots of names dead before this one starts are free again
+            while active and active[0][0] < interval.start:
+                heapq.heappush(free, heapq.heappop(active)[1])
+                
+            if free:
+                slot = heapq.heappop(free)
+            else:
+                slot = count
+                count += 1
+                
+            slots[interval.name] = slot
+            heapq.heappush(active, (interval.end, slot))
+            
+        # Names that are never read or written still get a slot of their own
+        for name in names:
+            if name not in slots:
+                slots[name] = count
+                count += 1
+                
+        return slots
+        
+    def format_frame_sizes(self):
+        lines = ["=== Frame sizes ==="]
+        
+        for name, (before, after) in self.frame_sizes.items():
+            lines.append(f"  {name:<24} {before:>8} -> {after:>8} bytes")
+            
+        total_before = sum(before for before, _ in self.frame_sizes.values())
+        total_after = sum(after for _, after in self.frame_sizes.values())
+        lines.append(f"  {'total':<24} {total_before:>8} -> {total_after:>8} bytes")
+        return "\n".join(lines)
+        
+    def format_peephole_counts(self):
+        if self.peephole_optimizer is None:
+            return "=== Peephole rules ===\n  (peephole optimizer disabled)"
+        return self.peephole_optimizer.format_counts()
+        
+    def emit_epilogue(self):
+        for register, offset in self.saved_registers:
+            self.emit("mov", register, f"QWORD PTR [rbp-{offset}]")
+            
+        if not self.frameless:
+            self.emit("leave")
+        self.emit("ret")
         
     def generate_instruction(self, instr):
         if not self.current_function:
@@ -113,287 +441,962 @@ class X86Generator:
         if instr.op == "const":
             value = instr.args[0]
             
-            if isinstance(value, bool):
-                value = 1 if value else 0
-                
             if isinstance(value, str):
+                target = self.target(instr.result)
                 label = self.add_string_literal(value)
-                self.emit_line(f"lea rax, [{label}]")
-            else:
-                # Use immediate value directly
-                self.emit_line(f"mov rax, {value}")
-                
-            if instr.result:
-                self.store_var(instr.result, "rax")
+                self.emit("lea", target, f"[rip+{label}]")
+                self.finish(instr.result, target)
+            elif instr.result:
+                self.emit_assignment(instr.result, int(value) if isinstance(value, bool) else value)
                 
         elif instr.op == "load":
             var_name = instr.args[0]
-            self.load_var(var_name, "rax")
             
+            if instr.result and self.has_home(var_name):
+                self.emit_assignment(instr.result, var_name)
+            elif instr.result:
+                target = self.target(instr.result)
+                self.load_var(var_name, target)
+                
+                if self.is_float(var_name):
+                    self.store_var(instr.result, target)
+                else:
+                    self.finish(instr.result, target)
+                
+        elif instr.op == "copy":
             if instr.result:
-                self.store_var(instr.result, "rax")
+                self.emit_assignment(instr.result, instr.args[0])
                 
         elif instr.op == "store":
             source = instr.args[0]
             dest = instr.args[1]
             
-            self.load_value(source, "rax")
-            self.store_var(dest, "rax")
+            self.emit_assignment(dest, source)
             
         elif instr.op == "binop":
             op, left, right = instr.args
             
-            # Load operands
-            self.load_value(left, "rax")
-            self.load_value(right, "rcx")
-            
-            # Perform operation
-            if op == "+":
-                self.emit_line("add rax, rcx")
-            elif op == "-":
-                self.emit_line("sub rax, rcx")
-            elif op == "*":
-                self.emit_line("imul rax, rcx")
-            elif op == "/":
-                # Division requires special handling
-                self.emit_line("cqo")  # Sign-extend RAX into RDX:RAX
-                self.emit_line("idiv rcx")  # RDX:RAX / RCX, result in RAX
-            elif op == "%":
-                # Modulo
-                self.emit_line("cqo")
-                self.emit_line("idiv rcx")  # Remainder goes to RDX
-                self.emit_line("mov rax, rdx")
-            elif op == "<<":
-                self.emit_line("mov rdx, rcx")  # Save rcx
-                self.emit_line("shl rax, cl")  # Shift uses CL register (low 8 bits of RCX)
-            elif op == ">>":
-                self.emit_line("mov rdx, rcx")
-                self.emit_line("shr rax, cl")
-            elif op == "&":
-                self.emit_line("and rax, rcx")
-            elif op == "|":
-                self.emit_line("or rax, rcx")
-            elif op == "^":
-                self.emit_line("xor rax, rcx")
-                
-            # Store result
-            if instr.result:
-                self.store_var(instr.result, "rax")
+            if op in FLOAT_OPS and (self.is_float(left) or self.is_float(right)):
+                self.emit_float_binop(op, left, right, instr.result)
+            elif id(instr) in self.addresses:
+                # Folded with the sums and scalings feeding it, see select_addresses
+                self.emit_lea(*self.addresses[id(instr)], instr.result)
+            else:
+                self.select_binop(instr)
                 
         elif instr.op == "unop":
             op, operand = instr.args
             
-            self.load_value(operand, "rax")
+            target = self.target(instr.result)
+            self.move_to_register(target, operand)
             
-            if op == "-":
-                self.emit_line("neg rax")
-            elif op == "~":
-                self.emit_line("not rax")
-                
-            if instr.result:
-                self.store_var(instr.result, "rax")
-                
-        elif instr.op == "compare":
-            op, left, right = instr.args
-            
-            # Load operands
-            self.load_value(left, "rax")
-            self.load_value(right, "rcx")
+            if self.is_float(operand):
+                # Negating a double flips its sign bit
+                if op == "-":
+                    self.emit("btc", target, "63")
+                if instr.result:
+                    self.store_var(instr.result, target)
+            else:
+                if op == "-":
+                    self.emit("neg", target)
+                elif op == "~":
+                    self.emit("not", target)
+                    
+                self.finish(instr.result, target)
             
-            # Compare
-            self.emit_line("cmp rax, rcx")
-            
-            # Set result based on comparison type
-            if op == "==":
-                self.emit_line("sete al")
-            elif op == "!=":
-                self.emit_line("setne al")
-            elif op == "<":
-                self.emit_line("setl al")
-            elif op == ">":
-                self.emit_line("setg al")
-            elif op == "<=":
-                self.emit_line("setle al")
-            elif op == ">=":
-                self.emit_line("setge al")
-                
-            # Zero-extend AL to RAX
-            self.emit_line("movzx rax, al")
+        elif instr.op == "compare":
+            condition = self.emit_compare(*instr.args)
             
             if instr.result:
-                self.store_var(instr.result, "rax")
+                # movzx into the 32-bit register clears the upper half too
+                target = self.target(instr.result)
+                self.emit_setcc(condition)
+                self.emit("movzx", REGISTERS_32[target], "al")
+                self.finish(instr.result, target)
                 
         elif instr.op == "branch":
             cond, true_label, false_label = instr.args
             
-            # Load condition
-            self.load_value(cond, "rax")
-            
-            # Compare with zero
-            self.emit_line("cmp rax, 0")
-            
-            # Conditional jump
-            self.emit_line(f"je {false_label}")
-            self.emit_line(f"jmp {true_label}")
+            if id(instr) in self.fused_compares:
+                # The compare's flags decide the branch; its boolean is never built
+                condition = self.emit_compare(*self.fused_compares[id(instr)].args)
+            elif self.is_float(cond):
+                self.load_float_operand(cond, "xmm0")
+                self.emit("pxor", "xmm1", "xmm1")
+                self.emit("ucomisd", "xmm0", "xmm1")
+                condition = "fne"
+            else:
+                operand = self.operand(cond)
+                condition = "ne"
+                
+                if is_register(operand):
+                    self.emit("test", operand, operand)
+                elif is_memory(operand):
+                    self.emit("cmp", operand, "0")
+                else:
+                    self.load_value(cond, "rax")
+                    self.emit("test", "rax", "rax")
+                    
+            self.emit_conditional_jump(condition, true_label, false_label)
             
         elif instr.op == "jump":
             label = instr.args[0]
-            self.emit_line(f"jmp {label}")
+            
+            if label != self.next_label:
+                self.emit("jmp", label)
             
         elif instr.op == "call":
             func_name = instr.args[0]
             args = instr.args[1:]
             
-            # Prepare function arguments according to x86-64 calling convention
-            # First 6 args go in registers, rest on stack
-            for i, arg in enumerate(args):
-                if i < 6:
-                    reg = ["rdi", "rsi", "rdx", "rcx", "r8", "r9"][i]
-                    self.load_value(arg, reg)
-                else:
-                    # Put remaining args on stack
-                    self.load_value(arg, "rax")
-                    self.emit_line("push rax")
+            if self.types and self.types.is_conversion(func_name) and len(args) == 1:
+                self.emit_conversion(func_name, args[0], instr.result)
+                return
+                
+            # Prepare function arguments according to the System V calling
+            # convention: floats in xmm0-xmm7, the rest in the six integer
+            # registers, and whatever does not fit on the stack
+            floats = self.param_floats(func_name, args)
+            locations = classify_arguments(floats)
+            stack_args = [(arg, is_float) for arg, is_float, location in zip(args, floats, locations)
+                          if isinstance(location, int)]
             
-            # Ensure 16-byte stack alignment before call
-            # If odd number of arguments on stack, add padding
-            if len(args) % 2 == 1:
-                self.emit_line("sub rsp, 8")
+            # Keep rsp 16-byte aligned at the call; the padding goes above
+            # the arguments so the callee finds them right after the return address
+            padding = 8 if len(stack_args) % 2 == 1 else 0
+            if padding:
+                self.emit("sub", "rsp", "8")
+                
+            for arg, is_float in reversed(stack_args):
+                operand = self.operand(arg)
+                
+                if is_float and not self.is_float(arg):
+                    self.load_float_operand(arg, "xmm0")
+                    self.emit("movq", "rax", "xmm0")
+                    operand = "rax"
+                elif operand is None:
+                    self.load_value(arg, "rax")
+                    operand = "rax"
+                self.emit("push", operand)
+                
+            # The float registers first: loading them may go through rax
+            for arg, location in zip(args, locations):
+                if isinstance(location, str) and location.startswith("xmm"):
+                    self.load_float_operand(arg, location)
+                    
+            for arg, location in zip(args, locations):
+                if isinstance(location, str) and not location.startswith("xmm"):
+                    self.load_value(arg, location)
+                    
+            if any(floats) and func_name not in self.types.functions:
+                # Variadic C functions read the number of vector registers used from al
+                self.emit("mov", "eax", min(sum(floats), len(FLOAT_ARGUMENT_REGISTERS)))
                 
             # Call the function
-            self.emit_line(f"call {func_name}")
+            self.emit("call", func_name)
             
             # Clean up the stack if necessary
-            if len(args) > 6:
-                stack_cleanup = (len(args) - 6) * 8
-                if len(args) % 2 == 1:
-                    stack_cleanup += 8
-                self.emit_line(f"add rsp, {stack_cleanup}")
+            if stack_args:
+                self.emit("add", "rsp", len(stack_args) * 8 + padding)
                 
             # Store return value if needed
-            if instr.result:
-                self.store_var(instr.result, "rax")
+            if instr.result and self.types.returns_float(func_name):
+                self.finish_float(instr.result, "xmm0")
+            elif instr.result:
+                self.finish(instr.result, "rax")
                 
         elif instr.op == "len":
             value = instr.args[0]
             
             self.load_value(value, "rdi")
-            self.emit_line("call _py_len")
-            
-            if instr.result:
-                self.store_var(instr.result, "rax")
+            self.emit("call", "_py_len")
+            self.finish(instr.result, "rax")
                 
         elif instr.op == "getitem":
             value, index = instr.args
             
             self.load_value(value, "rdi")
             self.load_value(index, "rsi")
-            self.emit_line("call _py_getitem")
+            self.emit("call", "_py_getitem")
+            self.finish_item(instr.result, "rax", value)
+                
+        elif instr.op == "getitem_unchecked":
+            # Index already proven in bounds by the optimizer; read the item directly
+            value, index = instr.args
             
-            if instr.result:
-                self.store_var(instr.result, "rax")
+            target = self.target(instr.result)
+            self.emit("mov", target, f"QWORD PTR [{self.item_address(value, index)}]")
+            self.finish_item(instr.result, target, value)
+            
+        elif instr.op == "newlist":
+            count = instr.args[0]
+            
+            self.emit_immediate("rdi", LIST_ITEMS_OFFSET + LIST_ITEM_SIZE * count)
+            self.emit("call", "malloc")
+            self.emit("mov", f"QWORD PTR [rax+{LIST_LENGTH_OFFSET}]", count)
+            self.finish(instr.result, "rax")
                 
+        elif instr.op == "newlist_stack":
+            # Escape analysis showed the list dies with the frame
+            count = instr.args[0]
+            
+            target = self.target(instr.result)
+            self.emit("lea", target, f"[rbp-{self.stack_lists[id(instr)]}]")
+            self.emit("mov", f"QWORD PTR [{target}+{LIST_LENGTH_OFFSET}]", count)
+            self.finish(instr.result, target)
+                
+        elif instr.op == "setitem":
+            value, index, item = instr.args
+            
+            operand = None
+            if self.holds_float_list(value) and not self.is_float(item):
+                # Lists holding floats keep every item as a double
+                self.load_float_operand(item, "xmm0")
+                self.emit("movq", "rdx", "xmm0")
+                operand = "rdx"
+                
+            address = self.item_address(value, index)
+            
+            if operand is None:
+                operand = self.operand(item)
+                
+                if not (is_register(operand) or is_immediate(operand)):
+                    self.load_value(item, "rdx")
+                    operand = "rdx"
+                    
+            self.emit("mov", f"QWORD PTR [{address}]", operand)
+            
         elif instr.op == "ret":
             # Function return
-            if instr.args:
+            if instr.args and self.types.returns_float(self.current_function.name):
+                # Floats come back in xmm0
+                self.load_float_operand(instr.args[0], "xmm0")
+            elif instr.args:
                 # Return with value
                 self.load_value(instr.args[0], "rax")
             else:
                 # Return void (0)
-                self.emit_line("xor rax, rax")
+                register = "eax" if self.optimize_size else "rax"
+                self.emit("xor", register, register)
                 
             # Epilogue
-            self.emit_line("leave")
-            self.emit_line("ret")
+            if self.epilogue_label is None:
+                self.emit_epilogue()
+            elif self.next_label != self.epilogue_label:
+                self.emit("jmp", self.epilogue_label)
             
     def load_var(self, var_name, dest_reg):
-        if var_name in self.stack_vars:
-            self.emit_line(f"mov {dest_reg}, QWORD PTR [rbp-{self.stack_vars[var_name]+8}]")
+        if var_name in self.register_vars:
+            if self.register_vars[var_name] != dest_reg:
+                self.emit("mov", dest_reg, self.register_vars[var_name])
+        elif var_name in self.stack_vars:
+            self.emit("mov", dest_reg, f"QWORD PTR [rbp-{self.stack_vars[var_name]+8}]")
         else:
-            self.emit_line(f"mov {dest_reg}, QWORD PTR [{var_name}]")
+            self.emit("mov", dest_reg, f"QWORD PTR [{var_name}]")
             
     def store_var(self, var_name, src_reg):
-        if var_name in self.stack_vars:
-            self.emit_line(f"mov QWORD PTR [rbp-{self.stack_vars[var_name]+8}], {src_reg}")
+        if var_name in self.register_vars:
+            if self.register_vars[var_name] != src_reg:
+                self.emit("mov", self.register_vars[var_name], src_reg)
+        elif var_name in self.stack_vars:
+            self.emit("mov", f"QWORD PTR [rbp-{self.stack_vars[var_name]+8}]", src_reg)
         else:
-            self.emit_line(f"mov QWORD PTR [{var_name}], {src_reg}")
+            self.emit("mov", f"QWORD PTR [{var_name}]", src_reg)
             
     def load_value(self, value, dest_reg):
-        if isinstance(value, (int, float, bool)):
+        if isinstance(value, float):
+            self.load_float(value, dest_reg)
+        elif isinstance(value, (int, bool)):
             # Handle primitive literals directly
             if isinstance(value, bool):
                 value = 1 if value else 0
-            self.emit_line(f"mov {dest_reg}, {value}")
+            self.emit_immediate(dest_reg, value)
         elif isinstance(value, str):
-            # Special case for temps with embedded literals (e.g., %t5 representing the number 5)
-            if value.startswith("%t") and value[2:].isdigit() and value not in self.stack_vars:
-                # Extract the number directly from the temp name
-                # These are created in visit_Constant for small integers
-                num_value = int(value[2:])  # Skip '%t' prefix
-                self.emit_line(f"mov {dest_reg}, {num_value}")
-                return
-                
-            # Case 1: Variable references (local vars, params, regular temp vars)
+            # Case 1: Variable references (local vars, params, temp vars)
             if value.startswith("%") or (self.current_function and 
                   (value in self.current_function.local_vars or value in self.current_function.params)):
-                if value.startswith("%") and value not in self.stack_vars:
-                    # This is a compiler-generated temporary variable reference
-                    # If not in stack_vars, try the embedded literal pattern again
-                    var_name = value[2:] if value.startswith("%t") else ""
-                    try:
-                        # Try to convert to a number (should rarely happen since we check above)
-                        immediate_value = int(var_name)
-                        self.emit_line(f"mov {dest_reg}, {immediate_value}")
-                    except ValueError:
-                        # If conversion fails, emit a warning and use 0
-                        self.emit_line(f"mov {dest_reg}, 0")
-                        self.emit_line(f"# Warning: Unresolved temp variable {value}")
-                else:
-                    # Normal variable load
-                    self.load_var(value, dest_reg)
+                if value.startswith("%") and not self.has_home(value):
+                    # Every temp the IR defines gets a register or a slot
+                    raise RuntimeError(f"Internal compiler error: temp {value} has no home "
+                                       f"in {self.current_function.name}")
+                    
+                self.load_var(value, dest_reg)
             # Case 2: Numeric literals (numbers as strings)
             else:
                 try:
                     num_value = int(value)
-                    self.emit_line(f"mov {dest_reg}, {num_value}")
+                    self.emit_immediate(dest_reg, num_value)
                 except ValueError:
                     try:
-                        num_value = float(value)
-                        label = self.add_float_literal(num_value)
-                        self.emit_line(f"movsd {dest_reg}, [{label}]")
+                        self.load_float(float(value), dest_reg)
                     except ValueError:
                         # Case 3: Boolean literals
                         if value == "True":
-                            self.emit_line(f"mov {dest_reg}, 1")
+                            self.emit("mov", dest_reg, "1")
                         elif value == "False":
-                            self.emit_line(f"mov {dest_reg}, 0")
+                            self.emit("mov", dest_reg, "0")
                         # Case 4: String literals (anything else)
                         else:
                             label = self.add_string_literal(value)
-                            self.emit_line(f"lea {dest_reg}, [{label}]")
+                            self.emit("lea", dest_reg, f"[rip+{label}]")
                             
-    def add_string_literal(self, value):
-        for label, existing_value in self.str_literals.items():
-            if existing_value == value:
-                return label
+    def operand(self, value):
+        """The x86 operand naming value in place, or None if it must be loaded first."""
+        if isinstance(value, bool):
+            value = int(value)
+            
+        if type(value) is int:
+            return str(value) if IMM32_MIN <= value <= IMM32_MAX else None
+            
+        if isinstance(value, str):
+            if value in self.register_vars:
+                return self.register_vars[value]
+            if value in self.stack_vars:
+                return f"QWORD PTR [rbp-{self.stack_vars[value]+8}]"
                 
-        label = f".LC{self.str_counter}"
-        self.str_counter += 1
-        self.str_literals[label] = value
-        return label
+        return None
         
-    def add_float_literal(self, value):
-        str_value = str(value)
+    def target(self, dest):
+        # Results are computed in their own register when they have one
+        home = self.operand(dest) if dest else None
+        return home if is_register(home) else "rax"
+        
+    def finish(self, dest, register):
+        if dest and self.is_float(dest):
+            # An int assigned to a name that also holds floats
+            self.emit("cvtsi2sd", "xmm0", register)
+            self.finish_float(dest, "xmm0")
+        elif dest:
+            self.store_var(dest, register)
+            
+    def finish_item(self, dest, register, value):
+        # Items of a list holding floats are already doubles
+        if dest and self.holds_float_list(value):
+            self.store_var(dest, register)
+        else:
+            self.finish(dest, register)
+            
+    def finish_float(self, dest, register):
+        home = self.operand(dest) if dest else None
+        
+        if is_register(home):
+            self.emit("movq", home, register)
+        elif is_memory(home):
+            self.emit("movsd", home, register)
+        elif dest:
+            self.emit("movsd", f"QWORD PTR [{dest}]", register)
+            
+    def emit_assignment(self, dest, value):
+        if not self.is_float(dest) or self.is_float(value):
+            self.emit_move(dest, value)
+        elif isinstance(value, int):
+            self.emit_move(dest, float(value))
+        else:
+            self.load_float_operand(value, "xmm0")
+            self.finish_float(dest, "xmm0")
+            
+    def move_to_register(self, register, value):
+        operand = self.operand(value)
         
-        for label, existing_value in self.str_literals.items():
-            if existing_value == str_value:
-                return label
+        if operand is None:
+            self.load_value(value, register)
+        elif is_immediate(operand):
+            self.emit_immediate(register, int(operand))
+        elif operand != register:
+            self.emit("mov", register, operand)
+            
+    def emit_move(self, dest, value):
+        home = self.operand(dest) or f"QWORD PTR [{dest}]"
+        source = self.operand(value)
+        
+        if is_register(home):
+            self.move_to_register(home, value)
+        elif is_register(source) or is_immediate(source):
+            self.emit("mov", home, source)
+        else:
+            # No memory-to-memory moves
+            self.move_to_register("rax", value)
+            self.emit("mov", home, "rax")
+            
+    def capture(self, generate, *args):
+        """The code generate emits, taken back out of the output."""
+        start = len(self.output)
+        generate(*args)
+        
+        code = self.output[start:]
+        del self.output[start:]
+        return code
+        
+    def select_binop(self, instr):
+        """Emit the cheapest of the tilings that compute a binop."""
+        op, left, right = instr.args
+        
+        if op in ("/", "//", "%"):
+            candidates = [self.capture(self.emit_division, op, left, right, instr.result)]
+            
+            if type(right) is int and right > 0:
+                candidates.append(self.capture(self.emit_constant_division, op, left, right, instr.result))
+                
+            self.output.extend(min(candidates, key=tiling_cost))
+            return
+            
+        if op in SHIFT_INSTRUCTIONS:
+            target = self.target(instr.result)
+            count = self.operand(right)
+            
+            if not is_immediate(count):
+                # Variable counts live in CL
+                self.load_value(right, "rcx")
+                count = "cl"
+                
+            self.move_to_register(target, left)
+            self.emit(SHIFT_INSTRUCTIONS[op], target, count)
+            self.finish(instr.result, target)
+            return
+            
+        candidates = [self.capture(self.emit_alu, op, left, right, instr.result)]
+        
+        if op == "*":
+            a, b = self.operand(left), self.operand(right)
+            if is_immediate(a):
+                a, b = b, a
+            if is_immediate(b) and (is_register(a) or is_memory(a)):
+                candidates.append(self.capture(self.emit_imul, a, b, instr.result))
+                
+            candidates.extend(self.capture(self.emit_multiply, *plan, instr.result)
+                              for plan in self.multiply_plans(left, right))
+            
+        form = self.lea_form(op, left, right)
+        if form:
+            candidates.append(self.capture(self.emit_lea, *form, instr.result))
+            
+        self.output.extend(min(candidates, key=tiling_cost))
+        
+    def emit_division(self, op, left, right, dest):
+        self.move_to_register("rax", left)
+        self.move_to_register("rcx", right)
+        self.emit("cqo")  # Sign-extend RAX into RDX:RAX
+        self.emit("idiv", "rcx")  # Quotient in RAX, remainder in RDX
+        
+        # idiv truncates; Python floors, so a nonzero remainder whose sign
+        # differs from the divisor's moves one step down
+        done = self.local_label("floor")
+        self.emit("test", "rdx", "rdx")
+        self.emit("je", done)
+        self.emit("xor", "rcx", "rdx")
+        self.emit("jns", done)
+        
+        if op == "%":
+            self.emit("xor", "rcx", "rdx")
+            self.emit("add", "rdx", "rcx")
+        else:
+            self.emit("sub", "rax", "1")
+        self.emit_label(done)
+        
+        self.finish(dest, "rdx" if op == "%" else "rax")
+        
+    def emit_constant_division(self, op, left, divisor, dest):
+        target = self.target(dest)
+        
+        if divisor == 1:
+            if op == "%":
+                self.emit_immediate(target, 0)
+            else:
+                self.move_to_register(target, left)
+            self.finish(dest, target)
+            return
+            
+        if divisor & (divisor - 1) == 0:
+            # Arithmetic shifts and masks already round toward negative infinity
+            self.move_to_register(target, left)
+            
+            if op == "%":
+                mask = self.operand(divisor - 1)
+                if mask is None:
+                    self.emit_immediate("rcx", divisor - 1)
+                    mask = "rcx"
+                self.emit("and", target, mask)
+            else:
+                self.emit("sar", target, divisor.bit_length() - 1)
+                
+            self.finish(dest, target)
+            return
+            
+        # With sign = x >> 63, floor(x / d) == sign ^ ((x ^ sign) / d) and
+        # x ^ sign is never negative, so an unsigned multiply-high divides it
+        multiplier, shift = division_magic(divisor)
+        
+        self.move_to_register("rax", left)
+        self.emit("cqo")
+        self.emit("mov", "rcx", "rdx")
+        self.emit("xor", "rax", "rcx")
+        self.emit_immediate("rdx", multiplier - 2 ** 64 if multiplier > IMM64_MAX else multiplier)
+        self.emit("mul", "rdx")
+        if shift:
+            self.emit("shr", "rdx", shift)
+        self.emit("xor", "rdx", "rcx")
+        
+        if op != "%":
+            self.finish(dest, "rdx")
+            return
+            
+        # x % d == x - floor(x / d) * d
+        if IMM32_MIN <= divisor <= IMM32_MAX:
+            self.emit("imul", "rdx", "rdx", divisor)
+        else:
+            self.emit_immediate("rcx", divisor)
+            self.emit("imul", "rdx", "rcx")
+            
+        self.move_to_register(target, left)
+        self.emit("sub", target, "rdx")
+        self.finish(dest, target)
+        
+    def multiply_plans(self, left, right):
+        """Shift and lea sequences multiplying by a constant, as
+        (value, steps, negate) for emit_multiply."""
+        if isinstance(left, int):
+            left, right = right, left
+        if not isinstance(right, int) or isinstance(left, int) or not isinstance(left, str):
+            return []
+            
+        factor = abs(right)
+        negate = right < 0
+        
+        if factor <= 1:
+            return [(left, [("zero" if factor == 0 else "move", 0)], negate)]
+            
+        plans = []
+        
+        # Multiply by 3, 5 and 9 with lea while they divide the factor,
+        # leaving a power of two for a shift
+        steps = []
+        rest = factor
+        for multiplier in (9, 5, 3):
+            while rest % multiplier == 0:
+                steps.append(("lea", multiplier))
+                rest //= multiplier
+        if rest & (rest - 1) == 0:
+            if rest > 1:
+                steps.append(("sal", rest.bit_length() - 1))
+            if len(steps) <= 3:
+                plans.append((left, steps, negate))
+                
+        # 2**n + 1 and 2**n - 1
+        for sign, near in (("add", factor - 1), ("sub", factor + 1)):
+            if near & (near - 1) == 0 and near > 2:
+                plans.append((left, [(sign, near.bit_length() - 1)], negate))
+                
+        return plans
+        
+    def emit_multiply(self, value, steps, negate, dest):
+        target = self.target(dest)
+        source = self.operand(value)
+        kind, amount = steps[0]
+        
+        if kind in ("add", "sub"):
+            # target = (x << n) +/- x needs x intact after the shift
+            if not (is_register(source) or is_memory(source)):
+                self.load_value(value, "rcx")
+                source = "rcx"
+            if source == target:
+                target = "rax"
+                
+            self.move_to_register(target, value)
+            self.emit("sal", target, amount)
+            self.emit(kind, target, source)
+        elif kind == "zero":
+            self.emit_immediate(target, 0)
+        else:
+            if kind == "lea" and is_register(source):
+                # The first lea can read x where it lives
+                self.emit("lea", target, f"[{source}+{source}*{amount - 1}]")
+                steps = steps[1:]
+            else:
+                self.move_to_register(target, value)
+                
+            for kind, amount in steps:
+                if kind == "lea":
+                    self.emit("lea", target, f"[{target}+{target}*{amount - 1}]")
+                elif kind == "sal":
+                    self.emit("sal", target, amount)
+                    
+        if negate:
+            self.emit("neg", target)
+        self.finish(dest, target)
+        
+    def emit_compare(self, op, left, right):
+        """Emit a cmp for left op right; returns the condition code that holds."""
+        if self.is_float(left) or self.is_float(right):
+            return self.emit_float_compare(op, left, right)
+            
+        a, b = self.operand(left), self.operand(right)
+        
+        # cmp takes an immediate or one memory operand, and only on the right
+        if is_immediate(a) and (is_register(b) or is_memory(b)):
+            left, right, a, b = right, left, b, a
+            op = SWAPPED_CONDITIONS[op]
+        if not (is_register(a) or is_memory(a)) or (is_memory(a) and is_memory(b)):
+            self.move_to_register("rax", left)
+            a = "rax"
+        if b is None:
+            self.load_value(right, "rcx")
+            b = "rcx"
+            
+        self.emit("cmp", a, b)
+        return CONDITION_CODES[op]
+        
+    def emit_conditional_jump(self, condition, true_label, false_label):
+        if condition in ("fe", "fne"):
+            self.emit_float_equality_jump(condition, true_label, false_label)
+            return
+            
+        # Whichever target follows is reached by falling through
+        if true_label == self.next_label:
+            self.emit(f"j{INVERTED_CONDITIONS[condition]}", false_label)
+        elif false_label == self.next_label:
+            self.emit(f"j{condition}", true_label)
+        else:
+            self.emit(f"j{INVERTED_CONDITIONS[condition]}", false_label)
+            self.emit("jmp", true_label)
+            
+    def emit_float_equality_jump(self, condition, true_label, false_label):
+        # Doubles differ when ZF is clear or the compare was unordered (PF set)
+        if condition == "fe":
+            true_label, false_label = false_label, true_label
+            
+        self.emit("jne", true_label)
+        self.emit("jp", true_label)
+        if false_label != self.next_label:
+            self.emit("jmp", false_label)
+            
+    def emit_setcc(self, condition):
+        if condition == "fe":
+            self.emit("sete", "al")
+            self.emit("setnp", "cl")
+            self.emit("and", "al", "cl")
+        elif condition == "fne":
+            self.emit("setne", "al")
+            self.emit("setp", "cl")
+            self.emit("or", "al", "cl")
+        else:
+            self.emit(f"set{condition}", "al")
+            
+    def emit_alu(self, op, left, right, dest):
+        # Two-address form: the left operand is copied into the result
+        # register and the right one used in place
+        target = self.target(dest)
+        a, b = self.operand(left), self.operand(right)
+        
+        if op in COMMUTATIVE_OPS and a != target and (b == target or is_immediate(a)):
+            left, right, a, b = right, left, b, a
+        if b == target and a != target:
+            target = "rax"
+        if b is None:
+            self.load_value(right, "rcx")
+            b = "rcx"
+            
+        self.move_to_register(target, left)
+        
+        if op == "*" and is_immediate(b):
+            self.emit("imul", target, target, b)
+        else:
+            self.emit(ALU_INSTRUCTIONS[op], target, b)
+        self.finish(dest, target)
+        
+    def emit_imul(self, source, immediate, dest):
+        target = self.target(dest)
+        self.emit("imul", target, source, immediate)
+        self.finish(dest, target)
+        
+    def lea_form(self, op, left, right):
+        if op == "+":
+            return self.address_form([(left, 1), (right, 1)])
+            
+        if op == "-" and isinstance(right, int):
+            return self.address_form([(left, 1), (-right, 1)])
+            
+        if op == "*":
+            if isinstance(left, int):
+                left, right = right, left
+            if isinstance(right, int) and right in LEA_MULTIPLIERS and not isinstance(left, int):
+                if right in LEA_SCALES and right != 2:
+                    return self.address_form([(left, right)])
+                return self.address_form([(left, 1), (left, right - 1)])
+                
+        return None
+        
+    def address_form(self, terms):
+        """Split terms into at most a base, a scaled index and a displacement."""
+        names = []
+        disp = 0
+        
+        for value, scale in terms:
+            if isinstance(value, int):
+                disp += value * scale
+            elif isinstance(value, str):
+                names.append((value, scale))
+            else:
+                return None
                 
-        label = f".LC{self.str_counter}"
-        self.str_counter += 1
-        self.str_literals[label] = str_value
+        if not names or len(names) > 2 or sum(scale > 1 for _, scale in names) > 1:
+            return None
+        if not IMM32_MIN <= disp <= IMM32_MAX:
+            return None
+            
+        return names, disp
+        
+    def emit_lea(self, names, disp, dest):
+        target = self.target(dest)
+        scratch = ["rax", "rcx"]
+        registers = {}
+        
+        for value, _ in names:
+            if value not in registers:
+                operand = self.operand(value)
+                
+                if not is_register(operand):
+                    operand = scratch.pop(0)
+                    self.load_value(value, operand)
+                registers[value] = operand
+                
+        # The unscaled term is the base
+        parts = [registers[value] if scale == 1 else f"{registers[value]}*{scale}"
+                 for value, scale in sorted(names, key=lambda name: name[1])]
+        address = "+".join(parts) + (f"{disp:+d}" if disp else "")
+        
+        if len(names) == 1 and names[0][1] == 1 and not disp:
+            if registers[names[0][0]] != target:
+                self.emit("mov", target, registers[names[0][0]])
+        else:
+            self.emit("lea", target, f"[{address}]")
+        self.finish(dest, target)
+        
+    def local_label(self, kind):
+        # Numbered per function so cached functions never clash
+        self.local_labels += 1
+        return f".L{self.current_function.name}_{kind}{self.local_labels}"
+        
+    def single_use(self, name):
+        return is_temp(name) and self.use_counts.get(name) == 1 and self.def_counts.get(name) == 1
+        
+    def match_address(self, instructions, i):
+        """Grow the sum at instructions[i] over the single-use sums and scalings
+        computed right before it; returns the first instruction taken and the
+        address form, or None."""
+        terms = [(instructions[i].args[1], 1), (instructions[i].args[2], 1)]
+        first = i
+        
+        while first > 0:
+            prev = instructions[first - 1]
+            if prev.op != "binop" or not self.single_use(prev.result):
+                break
+                
+            position = next((n for n, term in enumerate(terms) if term == (prev.result, 1)), None)
+            if position is None:
+                break
+                
+            op, a, b = prev.args
+            if isinstance(a, int):
+                a, b = b, a
+                
+            if op == "+":
+                terms[position:position + 1] = [(a, 1), (b, 1)]
+            elif op == "*" and isinstance(b, int) and b in LEA_SCALES and not isinstance(a, int):
+                terms[position] = (a, b)
+            else:
+                break
+            first -= 1
+            
+        form = self.address_form(terms) if first < i else None
+        return (first, *form) if form else None
+        
+    def select_branches(self, block):
+        """Pair a block's closing branch with the compare right before it
+        when nothing else reads the compare's result."""
+        instructions = block.instructions
+        
+        if len(instructions) < 2 or instructions[-1].op != "branch" or instructions[-2].op != "compare":
+            return
+            
+        compare, branch = instructions[-2:]
+        if compare.result == branch.args[0] and self.single_use(compare.result):
+            self.fused_compares[id(branch)] = compare
+            self.folded.add(id(compare))
+            
+    def select_addresses(self, block):
+        """Fold chains of additions and scalings into single lea instructions
+        where that beats computing each step on its own."""
+        instructions = block.instructions
+        i = len(instructions) - 1
+        
+        while i >= 0:
+            instr = instructions[i]
+            match = None
+            if instr.op == "binop" and instr.args[0] == "+" and not self.is_float(instr.result):
+                match = self.match_address(instructions, i)
+                
+            if match:
+                first, names, disp = match
+                separate = sum(tiling_cost(self.capture(self.generate_instruction, other))
+                               for other in instructions[first:i + 1])
+                fused = tiling_cost(self.capture(self.emit_lea, names, disp, instr.result))
+                
+                if fused < separate:
+                    self.addresses[id(instr)] = (names, disp)
+                    self.folded.update(id(other) for other in instructions[first:i])
+                    i = first
+                    
+            i -= 1
+            
+    def item_address(self, value, index):
+        base = self.operand(value)
+        if not is_register(base):
+            self.load_value(value, "rax")
+            base = "rax"
+            
+        if isinstance(index, int):
+            return f"{base}+{LIST_ITEMS_OFFSET + LIST_ITEM_SIZE * index}"
+            
+        position = self.operand(index)
+        if not is_register(position):
+            self.load_value(index, "rcx")
+            position = "rcx"
+            
+        return f"{base}+{position}*{LIST_ITEM_SIZE}+{LIST_ITEMS_OFFSET}"
+        
+    def is_float(self, value):
+        return self.types is not None and self.types.is_float(self.current_function, value)
+        
+    def holds_float_list(self, value):
+        return self.types is not None and self.types.holds_float_list(self.current_function, value)
+        
+    def param_floats(self, name, values):
+        """Whether each of the values passed to function name travels as a float."""
+        floats = self.types.param_floats(name) if self.types and name in self.types.functions else []
+        return [floats[i] if i < len(floats) else self.is_float(value) for i, value in enumerate(values)]
+        
+    def load_float_operand(self, value, register):
+        """Load value into xmm register as a double, converting ints."""
+        if isinstance(value, (int, float)):
+            self.load_float(float(value), register)
+            return
+            
+        operand = self.operand(value)
+        
+        if not self.is_float(value):
+            if operand is None or is_immediate(operand):
+                self.move_to_register("rax", value)
+                operand = "rax"
+            self.emit("cvtsi2sd", register, operand)
+        elif is_register(operand):
+            self.emit("movq", register, operand)
+        elif is_memory(operand):
+            self.emit("movsd", register, operand)
+        else:
+            self.load_value(value, "rax")
+            self.emit("movq", register, "rax")
+            
+    def float_source(self, value, register):
+        # SSE arithmetic reads a double from memory in place
+        operand = self.operand(value)
+        if self.is_float(value) and is_memory(operand):
+            return operand
+            
+        self.load_float_operand(value, register)
+        return register
+        
+    def emit_float_binop(self, op, left, right, dest):
+        self.load_float_operand(left, "xmm0")
+        source = self.float_source(right, "xmm1")
+        
+        if op == "%":
+            # Python's modulo follows the divisor's sign: x - floor(x / y) * y,
+            # with the floor taken through a 64-bit integer
+            if source != "xmm1":
+                self.emit("movsd", "xmm1", source)
+            done = self.local_label("fmod")
+            
+            self.emit("movapd", "xmm2", "xmm0")
+            self.emit("divsd", "xmm2", "xmm1")
+            self.emit("cvttsd2si", "rax", "xmm2")
+            self.emit("cvtsi2sd", "xmm3", "rax")
+            self.emit("ucomisd", "xmm3", "xmm2")
+            self.emit("jbe", done)
+            self.emit("sub", "rax", "1")
+            self.emit("cvtsi2sd", "xmm3", "rax")
+            self.emit_label(done)
+            self.emit("mulsd", "xmm3", "xmm1")
+            self.emit("subsd", "xmm0", "xmm3")
+        else:
+            self.emit(FLOAT_INSTRUCTIONS[op], "xmm0", source)
+            
+        self.finish_float(dest, "xmm0")
+        
+    def emit_float_compare(self, op, left, right):
+        if op in ("<", "<="):
+            left, right = right, left
+            op = SWAPPED_CONDITIONS[op]
+            
+        self.load_float_operand(left, "xmm0")
+        self.emit("ucomisd", "xmm0", self.float_source(right, 'xmm1'))
+        return FLOAT_CONDITIONS[op]
+        
+    def emit_conversion(self, name, value, dest):
+        # The float() and int() builtins; int() truncates toward zero
+        if name == "float":
+            self.load_float_operand(value, "xmm0")
+            self.finish_float(dest, "xmm0")
+        elif self.is_float(value):
+            self.load_float_operand(value, "xmm0")
+            self.emit("cvttsd2si", "rax", "xmm0")
+            self.finish(dest, "rax")
+        else:
+            self.move_to_register("rax", value)
+            self.finish(dest, "rax")
+            
+    def load_float(self, value, dest_reg):
+        label = self.add_float_literal(value)
+        
+        if dest_reg.startswith("xmm"):
+            self.emit("movsd", dest_reg, f"QWORD PTR [rip+{label}]")
+        else:
+            # A general register just takes the bits
+            self.emit("mov", dest_reg, f"QWORD PTR [rip+{label}]")
+            
+    def has_home(self, var_name):
+        return var_name in self.stack_vars or var_name in self.register_vars
+        
+    def emit_immediate(self, dest_reg, value):
+        if self.optimize_size and type(value) is int and dest_reg in REGISTERS_32:
+            # xor r32, r32 and mov r32, imm32 both zero-extend and encode shorter
+            if value == 0:
+                self.emit("xor", REGISTERS_32[dest_reg], REGISTERS_32[dest_reg])
+                return
+            if 0 < value < 2 ** 32:
+                self.emit("mov", REGISTERS_32[dest_reg], value)
+                return
+                
+        self.emit("mov", dest_reg, value)
+        
+    def add_string_literal(self, value):
+        return self.add_constant("string", value)
+        
+    def add_float_literal(self, value):
+        return self.add_constant("double", float(value))
+        
+    def add_constant(self, kind, value):
+        label = self.constants.add(kind, value)
+        
+        # Constants referenced by the function being cached, see cache.py
+        if self.function_literals is not None:
+            self.function_literals.setdefault(label, (kind, value))
         return label
         
-    def emit_line(self, line):
-        indent = "    " * self.indentation
-        self.output.append(f"{indent}{line}")
+    def emit(self, opcode, *operands):
+        self.output.append(Instruction(opcode, [str(operand) for operand in operands], INDENTS[self.indentation]))
+        
+    def emit_label(self, name):
+        self.output.append(Label(name, INDENTS[self.indentation]))
+        
+    def emit_directive(self, text):
+        self.output.append(Directive(text, INDENTS[self.indentation]))
@@ -0,0 +1,57 @@
+import math
+import struct
+
+# What .string needs escaped; other control characters become octal escapes
+STRING_ESCAPES = {ord('"'): '\\"', ord('\\'): '\\\\', ord('\n'): '\\n', ord('\t'): '\\t', ord('\r'): '\\r'}
+STRING_ESCAPES.update({code: f"\\{code:03o}" for code in [*range(32), 127] if code not in STRING_ESCAPES})
+
+def escape_string(value):
+    return value.translate(STRING_ESCAPES)
+
+def float_bits(value):
+    return struct.unpack("<Q", struct.pack("<d", value))[0]
+
+class ConstantPool:
+    """The read-only constants of a program, one entry per distinct value.
+
+    Entries are found by hashing, so adding a constant is O(1). Doubles are
+    keyed by their bit pattern, which keeps 0.0 apart from -0.0 and lets
+    NaNs share an entry.
+    """
+
+    def __init__(self):
+        self.labels = {}
+        self.doubles = []
+        self.strings = []
+
+    def add(self, kind, value):
+        """Label of the entry holding value; kind is "string" or "double"."""
+        key = (kind, float_bits(value) if kind == "double" else value)
+        label = self.labels.get(key)
+
+        if label is None:
+            label = f".LC{len(self.labels)}"
+            self.labels[key] = label
+            (self.doubles if kind == "double" else self.strings).append((label, value))
+
+        return label
+
+    def emit(self, emit_line):
+        if not self.labels:
+            return
+
+        emit_line(".section .rodata")
+
+        if self.doubles:
+            emit_line(".p2align 3")
+
+            for label, value in self.doubles:
+                emit_line(f"{label}:")
+                if math.isfinite(value):
+                    emit_line(f"    .double {value!r}")
+                else:
+                    emit_line(f"    .quad {float_bits(value):#x}")
+
+        for label, value in self.strings:
+            emit_line(f"{label}:")
+            emit_line(f'    .string "{escape_string(value)}"')
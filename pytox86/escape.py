@@ -0,0 +1,65 @@
+from .cfg import is_temp
+
+class EscapeAnalysis:
+    """Flow-insensitive escape analysis of the lists a function allocates.
+
+    Temps and variables that may hold the same list are merged into one
+    class; a class escapes when any of its members is returned, passed to a
+    call, stored to a global or stored into another list.
+    """
+
+    def __init__(self, function, global_vars=()):
+        self.function = function
+        self.local_vars = set(function.local_vars) - set(global_vars)
+        self.parent = {}
+        self.reasons = {}
+        self.analyze()
+
+    def find(self, name):
+        root = name
+        while self.parent.get(root, root) != root:
+            root = self.parent[root]
+
+        while name != root:
+            self.parent[name], name = root, self.parent.get(name, name)
+
+        return root
+
+    def union(self, a, b):
+        a, b = self.find(a), self.find(b)
+        if a == b:
+            return
+
+        self.parent[a] = b
+        if a in self.reasons:
+            self.reasons.setdefault(b, self.reasons.pop(a))
+
+    def escape(self, value, reason):
+        if is_temp(value):
+            self.reasons.setdefault(self.find(value), reason)
+
+    def analyze(self):
+        for block in self.function.blocks:
+            for instr in block.instructions:
+                if instr.op == "copy" and is_temp(instr.args[0]):
+                    self.union(instr.args[0], instr.result)
+                elif instr.op == "load":
+                    self.union(instr.args[0], instr.result)
+                elif instr.op == "store":
+                    value, var = instr.args
+                    if var in self.local_vars:
+                        if is_temp(value):
+                            self.union(value, var)
+                    else:
+                        self.escape(value, f"stored to global '{var}'")
+                elif instr.op == "ret" and instr.args:
+                    self.escape(instr.args[0], "returned")
+                elif instr.op == "call":
+                    for arg in instr.args[1:]:
+                        self.escape(arg, f"passed to {instr.args[0]}")
+                elif instr.op == "setitem":
+                    self.escape(instr.args[2], "stored into a list")
+
+    def escape_reason(self, value):
+        """Why the list in value escapes, or None when it stays in the function."""
+        return self.reasons.get(self.find(value))
@@ -0,0 +1,151 @@
+from itertools import count
+from .irgen import IRProgram, IRFunction, BasicBlock, IRInstruction
+from .cfg import terminator, is_temp
+from .callgraph import CallGraph, remove_dead_functions
+from .remarks import RemarkEmitter
+
+# Rough instruction cost of a call that inlining removes: the call itself,
+# the callee's prologue and frame setup, and its leave/ret.
+CALL_OVERHEAD = 6
+ARGUMENT_COST = 2
+CONSTANT_ARGUMENT_BONUS = 3
+
+class Inliner:
+    def __init__(self, threshold=0, caller_budget=0, remarks=None):
+        self.threshold = threshold
+        self.caller_budget = caller_budget
+        self.remarks = remarks if remarks is not None else RemarkEmitter()
+        self.reset()
+
+    def reset(self):
+        self.suffixes = count()
+
+    def inline(self, program):
+        changed = False
+        graph = CallGraph(program)
+
+        for name in graph.bottom_up():
+            caller = graph.functions[name]
+
+            while True:
+                site = self.pick_call_site(graph, caller)
+                if site is None:
+                    break
+
+                block, instr = site
+                self.inline_call(caller, block, instr, graph.functions[instr.args[0]])
+                changed = True
+
+        if changed:
+            remove_dead_functions(program)
+
+        return changed
+
+    def pick_call_site(self, graph, caller):
+        caller_size = function_size(caller)
+
+        for block in caller.blocks:
+            for instr in block.instructions:
+                if instr.op != "call" or instr.args[0] not in graph.functions:
+                    continue
+
+                callee = graph.functions[instr.args[0]]
+
+                if callee is caller or graph.is_recursive(callee.name):
+                    self.remarks.missed(caller, block, f"{callee.name} not inlined: callee is recursive", instr)
+                    continue
+
+                size = function_size(callee)
+                if caller_size + size > self.caller_budget:
+                    self.remarks.missed(caller, block, f"{callee.name} not inlined: caller would grow past its budget of {self.caller_budget}", instr)
+                    continue
+
+                cost = self.inline_cost(callee, instr.args[1:])
+                if cost <= self.threshold:
+                    self.remarks.passed(caller, block, f"{callee.name} inlined (cost {cost}, threshold {self.threshold})", instr)
+                    return block, instr
+
+                self.remarks.missed(caller, block, f"{callee.name} not inlined: cost {cost} above threshold {self.threshold}", instr)
+
+        return None
+
+    def inline_cost(self, callee, args):
+        benefit = CALL_OVERHEAD + ARGUMENT_COST * len(args)
+        benefit += CONSTANT_ARGUMENT_BONUS * sum(1 for arg in args if not is_temp(arg))
+        return function_size(callee) - benefit
+
+    def inline_call(self, caller, block, call, callee):
+        suffix = f"i{next(self.suffixes)}"
+        callee_vars = set(callee.params) | set(callee.local_vars)
+
+        def rename_label(label):
+            return f"{label}_{suffix}"
+
+        def rename(value):
+            if is_temp(value):
+                return f"{value}.{suffix}"
+            return value
+
+        def rename_var(var):
+            return f"{var}.{suffix}" if var in callee_vars else var
+
+        index = block.instructions.index(call)
+        cont_block = BasicBlock(f"{block.label}_cont_{suffix}", block.instructions[index + 1:])
+        cont_block.next_block = block.next_block
+        cont_block.branch_target = block.branch_target
+
+        entry_label = rename_label(callee.entry_block.label)
+        block.instructions = block.instructions[:index]
+
+        for param, arg in zip(callee.params, call.args[1:]):
+            block.instructions.append(IRInstruction("store", [arg, rename_var(param)], None, call.line))
+        block.instructions.append(IRInstruction("jump", [entry_label]))
+
+        clones = []
+        for callee_block in callee.blocks:
+            clone = BasicBlock(rename_label(callee_block.label))
+
+            for instr in callee_block.instructions:
+                if instr.op == "ret":
+                    if call.result:
+                        if instr.args:
+                            clone.instructions.append(IRInstruction("copy", [rename(instr.args[0])], call.result, instr.line))
+                        else:
+                            clone.instructions.append(IRInstruction("const", [0], call.result, instr.line))
+                    clone.instructions.append(IRInstruction("jump", [cont_block.label]))
+                    break
+
+                args = [rename(arg) for arg in instr.args]
+
+                if instr.op == "load":
+                    args[0] = rename_var(args[0])
+                elif instr.op == "store":
+                    args[1] = rename_var(args[1])
+                elif instr.op == "jump":
+                    args[0] = rename_label(args[0])
+                elif instr.op == "branch":
+                    args[1:3] = [rename_label(label) for label in args[1:3]]
+
+                clone.instructions.append(IRInstruction(instr.op, args, rename(instr.result), instr.line))
+
+            clones.append(clone)
+
+        for clone, callee_block in zip(clones, callee.blocks):
+            if terminator(clone) is None and callee_block is not callee.blocks[-1]:
+                # Make layout fallthrough inside the callee explicit
+                next_label = clones[clones.index(clone) + 1].label
+                clone.instructions.append(IRInstruction("jump", [next_label]))
+
+        block.next_block = clones[0] if clones else cont_block
+        block.branch_target = None
+
+        position = caller.blocks.index(block) + 1
+        caller.blocks[position:position] = clones + [cont_block]
+
+        for var in callee.params + callee.local_vars:
+            renamed = rename_var(var)
+            if renamed not in caller.local_vars:
+                caller.local_vars.append(renamed)
+
+def function_size(function):
+    return sum(1 for block in function.blocks for instr in block.instructions if instr.op != "jump")
@@ -0,0 +1,247 @@
+from .irgen import IRProgram, IRFunction, BasicBlock, IRInstruction
+from .cfg import ControlFlowGraph, terminator, is_temp
+from .callgraph import CallGraph, remove_dead_functions
+from .inline import function_size
+from .remarks import RemarkEmitter
+
+# Estimated instructions saved for each use of a parameter that becomes constant
+FOLDED_USE_GAIN = 3
+
+def constant_key(value):
+    if is_temp(value) or not isinstance(value, (int, float, bool)):
+        return None
+    return (type(value).__name__, value)
+
+def constant_temps(func):
+    """Temps with a single definition, and that definition a const."""
+    counts = {}
+    values = {}
+
+    for block in func.blocks:
+        for instr in block.instructions:
+            if instr.result:
+                counts[instr.result] = counts.get(instr.result, 0) + 1
+                if instr.op == "const":
+                    values[instr.result] = instr.args[0]
+
+    return {temp: value for temp, value in values.items() if counts[temp] == 1}
+
+class InterproceduralConstantPropagator:
+    def __init__(self, specialize_threshold=0, max_specializations=0, remarks=None):
+        self.specialize_threshold = specialize_threshold
+        self.max_specializations = max_specializations
+        self.remarks = remarks if remarks is not None else RemarkEmitter()
+        self.reset()
+
+    def reset(self):
+        # What has been bound and cloned so far; kept across the optimizer's
+        # fixpoint rounds so the same work is not redone, cleared per program
+        self.bound_params = set()
+        self.specializations = {}
+        self.clone_counts = {}
+        self.constants = {}
+
+    def argument_key(self, site, index):
+        func, _, instr = site
+        if len(instr.args) <= index + 1:
+            return None
+
+        arg = instr.args[index + 1]
+        if is_temp(arg):
+            if func.name not in self.constants:
+                self.constants[func.name] = constant_temps(func)
+            return constant_key(self.constants[func.name].get(arg))
+
+        return constant_key(arg)
+
+    def propagate(self, program):
+        changed = False
+        self.constants = {}
+
+        if self.propagate_arguments(program):
+            changed = True
+        if self.propagate_returns(program):
+            changed = True
+        if self.specialize(program):
+            changed = True
+            remove_dead_functions(program)
+
+        return changed
+
+    def propagate_arguments(self, program):
+        # A parameter that every call site passes the same constant for is
+        # that constant inside the callee
+        changed = False
+        graph = CallGraph(program)
+
+        for name, func in graph.functions.items():
+            sites = graph.call_sites[name]
+
+            if name == "main" or not sites:
+                continue
+
+            for i, param in enumerate(func.params):
+                keys = {self.argument_key(site, i) for site in sites}
+
+                if len(keys) != 1 or None in keys:
+                    continue
+
+                key = keys.pop()
+                if (name, param, key) in self.bound_params:
+                    continue
+
+                self.bind_parameter(func, param, key[1])
+                self.bound_params.add((name, param, key))
+                self.remarks.passed(func, func.entry_block, f"parameter '{param}' is {key[1]} at every call site")
+                changed = True
+
+        return changed
+
+    def bind_parameter(self, func, param, value):
+        cfg = ControlFlowGraph(func)
+
+        if cfg.preds[func.entry_block.label]:
+            # The entry is a loop header; give the function a fresh entry
+            entry = BasicBlock(f"{func.entry_block.label}_ipcp")
+            entry.instructions.append(IRInstruction("jump", [func.entry_block.label]))
+            entry.next_block = func.entry_block
+            func.blocks.insert(0, entry)
+            func.entry_block = entry
+
+        func.entry_block.instructions.insert(0, IRInstruction("store", [value, param]))
+
+    def propagate_returns(self, program):
+        # A function that returns the same constant on every path makes its
+        # call results that constant; the calls stay for their side effects
+        changed = False
+        graph = CallGraph(program)
+
+        for name, func in graph.functions.items():
+            key = self.constant_return(func)
+            if key is None:
+                continue
+
+            for caller, block, instr in graph.call_sites[name]:
+                if instr.result:
+                    self.remarks.passed(caller, block, f"call to {name} always returns {key[1]}", instr)
+                    index = block.instructions.index(instr)
+                    block.instructions.insert(index + 1, IRInstruction("const", [key[1]], instr.result))
+                    instr.result = None
+                    changed = True
+
+        return changed
+
+    def constant_return(self, func):
+        cfg = ControlFlowGraph(func)
+        keys = set()
+
+        for block in func.blocks:
+            term = terminator(block)
+
+            if not cfg.reachable(block.label) or term is None or term.op != "ret":
+                continue
+
+            keys.add(constant_key(term.args[0]) if term.args else constant_key(0))
+
+        if len(keys) != 1 or None in keys:
+            return None
+
+        return keys.pop()
+
+    def specialize(self, program):
+        changed = False
+        graph = CallGraph(program)
+
+        for name in list(graph.functions):
+            func = graph.functions[name]
+            sites = graph.call_sites[name]
+
+            if name == "main" or not sites:
+                continue
+
+            for i, param in enumerate(func.params):
+                by_value = {}
+
+                for site in sites:
+                    key = self.argument_key(site, i)
+                    if key is not None:
+                        by_value.setdefault(key, []).append(site)
+
+                # Parameters that are constant at every call site are bound in place
+                if len(by_value) == 1 and len(next(iter(by_value.values()))) == len(sites):
+                    continue
+
+                for key, value_sites in by_value.items():
+                    clone_name = self.specializations.get((name, i, key))
+
+                    # A clone that was inlined everywhere has since been removed
+                    if clone_name not in graph.functions:
+                        if self.clone_counts.get(name, 0) >= self.max_specializations:
+                            self.missed_sites(value_sites, f"{name} not specialized for {param} = {key[1]}: "
+                                                           f"limit of {self.max_specializations} clones reached")
+                            continue
+
+                        gain = FOLDED_USE_GAIN * self.parameter_uses(func, param) * len(value_sites)
+                        benefit = gain - function_size(func)
+                        if benefit < self.specialize_threshold:
+                            self.missed_sites(value_sites, f"{name} not specialized for {param} = {key[1]}: "
+                                                           f"benefit {benefit} below threshold {self.specialize_threshold}")
+                            continue
+
+                        clone_name = self.clone_function(program, func, param, key[1])
+                        self.specializations[(name, i, key)] = clone_name
+
+                    for caller, block, instr in value_sites:
+                        self.remarks.passed(caller, block, f"call redirected to {clone_name}, specialized for {param} = {key[1]}", instr)
+                        instr.args[0] = clone_name
+                    changed = True
+
+                if changed:
+                    # Call sites moved; rescan the remaining functions from scratch
+                    return True
+
+        return changed
+
+    def missed_sites(self, sites, message):
+        for caller, block, instr in sites:
+            self.remarks.missed(caller, block, message, instr)
+
+    def parameter_uses(self, func, param):
+        loaded = {instr.result for block in func.blocks for instr in block.instructions
+                  if instr.op == "load" and instr.args[0] == param}
+
+        return sum(1 for block in func.blocks for instr in block.instructions
+                   if any(arg in loaded for arg in instr.args if is_temp(arg)))
+
+    def clone_function(self, program, func, param, value):
+        index = self.clone_counts.get(func.name, 0)
+        self.clone_counts[func.name] = index + 1
+
+        # GCC-style mangling; '.' keeps clones apart from any Python identifier
+        name = f"{func.name}.constprop.{index}"
+        suffix = f"cp{len(self.specializations)}"
+        labels = {block.label: f"{block.label}_{suffix}" for block in func.blocks}
+
+        blocks = []
+        for block in func.blocks:
+            clone = BasicBlock(labels[block.label])
+
+            for instr in block.instructions:
+                args = list(instr.args)
+
+                if instr.op == "jump":
+                    args[0] = labels.get(args[0], args[0])
+                elif instr.op == "branch":
+                    args[1:3] = [labels.get(label, label) for label in args[1:3]]
+
+                clone.instructions.append(IRInstruction(instr.op, args, instr.result, instr.line))
+
+            blocks.append(clone)
+
+        entry = blocks[func.blocks.index(func.entry_block)]
+        clone_func = IRFunction(name, list(func.params), entry, blocks, list(func.local_vars))
+        self.bind_parameter(clone_func, param, value)
+        self.bound_params.add((name, param, constant_key(value)))
+
+        program.functions.insert(program.functions.index(func) + 1, clone_func)
+        return name
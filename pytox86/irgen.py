@@ -10,6 +10,7 @@ class IRInstruction:
     op: str
     args: List[Any] = field(default_factory=list)
     result: Optional[str] = None
+    line: Optional[int] = None
     
 @dataclass
 class BasicBlock:
@@ -33,14 +34,20 @@ class IRProgram:
 
 class IRGenerator:
     def __init__(self):
+        self.reset()
+        
+    def reset(self):
         self.program = IRProgram()
         self.current_function = None
         self.current_block = None
         self.temp_counter = 0
         self.label_counter = 0
         self.loop_exit_stack = []
+        self.current_line = None
         
     def generate(self, ast):
+        self.reset()
+        
         if isinstance(ast, Program):
             for node in ast.body:
                 self.visit(node)
@@ -75,7 +82,15 @@ class IRGenerator:
     def visit(self, node):
         method_name = f"visit_{node.__class__.__name__}"
         method = getattr(self, method_name, self.generic_visit)
-        return method(node)
+        
+        # Instructions are tagged with the line of the innermost enclosing statement
+        previous_line = self.current_line
+        if getattr(node, "line", None) is not None:
+            self.current_line = node.line
+            
+        result = method(node)
+        self.current_line = previous_line
+        return result
         
     def generic_visit(self, node):
         raise NotImplementedError(f"IR generation not implemented for {type(node).__name__}")
@@ -170,6 +185,7 @@ class IRGenerator:
             self.current_function.local_vars.append(node.target.id)
             
         self.emit("const", [0], index_var)
+        self.emit("jump", [cond_block.label])
         
         self.current_block = cond_block
         
@@ -221,6 +237,7 @@ class IRGenerator:
         
         self.loop_exit_stack.append(exit_block)
         
+        self.emit("jump", [cond_block.label])
         self.current_block = cond_block
         
         cond_result = self.visit(node.test)
@@ -322,14 +339,9 @@ class IRGenerator:
     def visit_Constant(self, node):
         # For constants, generate literal values directly when possible
         if isinstance(node.value, (int, float, bool, str)):
-            # For primitive types, create a temporary with the constant value
+            # For primitive types, create a temporary with the constant value.
+            # Every constant gets a fresh temp so it can never alias another value.
             result = self.temp()
-            # When using ints like 5 and 10, embed the literal value in the temp name
-            # This helps the code generator identify constants
-            if isinstance(node.value, int) and 0 <= node.value <= 100:
-                # For small integers, create a specialized temp that includes the value
-                # for easier literal substitution in code generation
-                result = f"%t{node.value}"
             self.emit("const", [node.value], result)
             return result
         elif node.value is None:
@@ -344,6 +356,17 @@ class IRGenerator:
             self.emit("const", [0], result)  # Use 0 as placeholder
             return result
         
+    def visit_List(self, node):
+        values = [self.visit(elt) for elt in node.elts]
+        
+        result = self.temp()
+        self.emit("newlist", [len(values)], result)
+        
+        for i, value in enumerate(values):
+            self.emit("setitem", [result, i, value])
+            
+        return result
+        
     def visit_Name(self, node):
         if node.ctx == "Load":
             result = self.temp()
@@ -376,7 +399,7 @@ class IRGenerator:
         return name
         
     def emit(self, op, args, result=None):
-        instr = IRInstruction(op, args, result)
+        instr = IRInstruction(op, args, result, self.current_line)
         if self.current_block:
             self.current_block.instructions.append(instr)
         else:
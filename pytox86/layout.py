@@ -0,0 +1,62 @@
+from .cfg import ControlFlowGraph
+from .loops import find_loops
+
+# Static estimate of how many times more often an edge runs for each loop
+# it stays inside
+LOOP_WEIGHT = 10
+
+class BlockLayout:
+    """Orders a function's blocks so that likely successors fall through.
+
+    Edges are weighted by the loops they stay inside; an edge leaving a loop
+    is the unlikely way out of its block. Chains of blocks are grown from the
+    heaviest edges first (Pettis and Hansen), taking back edges before other
+    edges of the same weight, which rotates loops so their test sits at the
+    bottom. Chains are then placed in source order with the entry first, so
+    loop exits follow the loop instead of splitting it.
+    """
+
+    def __init__(self, function):
+        self.function = function
+        self.cfg = ControlFlowGraph(function)
+        self.loops = find_loops(self.cfg)
+        self.order = self.place()
+
+    def edge_weight(self, source, dest):
+        for loop in self.loops:
+            if source in loop.blocks and dest in loop.blocks:
+                return LOOP_WEIGHT ** loop.depth
+        return 1
+
+    def is_back_edge(self, source, dest):
+        return any(loop.header == dest and source in loop.blocks for loop in self.loops)
+
+    def place(self):
+        index = {block.label: i for i, block in enumerate(self.function.blocks)}
+        entry = self.cfg.entry
+
+        edges = [(source, dest) for source in index for dest in self.cfg.succs[source] if dest != entry]
+        edges.sort(key=lambda edge: (-self.edge_weight(*edge), not self.is_back_edge(*edge),
+                                     index[edge[0]], index[edge[1]]))
+
+        # Every block starts as its own chain
+        chains = {label: [label] for label in index}
+        chain_of = {label: label for label in index}
+
+        # Join two chains when the edge runs from the end of one to the start of the other
+        for source, dest in edges:
+            first, second = chain_of[source], chain_of[dest]
+            if first == second or chains[first][-1] != source or chains[second][0] != dest:
+                continue
+
+            chains[first].extend(chains[second])
+            for label in chains.pop(second):
+                chain_of[label] = first
+
+        ordered = sorted(chains.values(), key=lambda chain: (entry not in chain, min(index[label] for label in chain)))
+        return [self.cfg.blocks[label] for chain in ordered for label in chain]
+
+    def loop_tops(self):
+        """The first block of every loop in the new order, where jumps back into the loop land."""
+        position = {block.label: i for i, block in enumerate(self.order)}
+        return {min(loop.blocks, key=position.__getitem__) for loop in self.loops}
@@ -0,0 +1,132 @@
+from dataclasses import dataclass, field
+from typing import List, Set, Optional
+from .irgen import IRFunction, BasicBlock, IRInstruction
+from .cfg import ControlFlowGraph, terminator
+
+@dataclass
+class Loop:
+    header: str
+    blocks: Set[str] = field(default_factory=set)
+    latches: List[str] = field(default_factory=list)
+    parent: Optional['Loop'] = None
+    depth: int = 1
+
+    def exits(self, cfg):
+        return [succ for label in self.blocks for succ in cfg.succs[label] if succ not in self.blocks]
+
+def find_loops(cfg):
+    """Natural loops of a function, innermost first."""
+    loops = {}
+
+    for label in cfg.rpo:
+        for succ in cfg.succs[label]:
+            if cfg.dominates(succ, label):
+                loop = loops.setdefault(succ, Loop(succ, {succ}))
+                loop.latches.append(label)
+
+                worklist = [label]
+                while worklist:
+                    current = worklist.pop()
+                    if current in loop.blocks:
+                        continue
+                    loop.blocks.add(current)
+                    worklist.extend(p for p in cfg.preds[current] if cfg.reachable(p))
+
+    ordered = sorted(loops.values(), key=lambda loop: len(loop.blocks))
+
+    for i, loop in enumerate(ordered):
+        for outer in ordered[i + 1:]:
+            if loop.header in outer.blocks:
+                loop.parent = outer
+                break
+
+    for loop in ordered:
+        parent = loop.parent
+        while parent is not None:
+            loop.depth += 1
+            parent = parent.parent
+
+    return ordered
+
+def innermost_loop(loops, label):
+    for loop in loops:
+        if label in loop.blocks:
+            return loop
+    return None
+
+def loop_depths(function):
+    cfg = ControlFlowGraph(function)
+    loops = find_loops(cfg)
+    depths = {}
+
+    for block in function.blocks:
+        loop = innermost_loop(loops, block.label)
+        depths[block.label] = loop.depth if loop else 0
+
+    return depths
+
+def retarget(block, old_label, new_label):
+    term = terminator(block)
+
+    if term is None:
+        block.instructions.append(IRInstruction("jump", [new_label]))
+    elif term.op == "jump":
+        term.args = [new_label]
+    elif term.op == "branch":
+        term.args = [term.args[0]] + [new_label if arg == old_label else arg for arg in term.args[1:]]
+
+    if block.next_block is not None and block.next_block.label == old_label:
+        block.next_block = None
+    if block.branch_target is not None and block.branch_target.label == old_label:
+        block.branch_target = None
+
+def find_preheader(cfg, loop):
+    outside = [p for p in cfg.preds[loop.header] if p not in loop.blocks]
+
+    if len(outside) == 1 and cfg.succs[outside[0]] == [loop.header]:
+        return cfg.blocks[outside[0]]
+
+    return None
+
+def ensure_preheader(function, cfg, loop):
+    """Return the loop's preheader, creating one if the header has none."""
+    preheader = find_preheader(cfg, loop)
+    if preheader is not None:
+        return preheader
+
+    header = cfg.blocks[loop.header]
+    preheader = BasicBlock(f"{loop.header}_preheader")
+    preheader.instructions.append(IRInstruction("jump", [loop.header]))
+    preheader.next_block = header
+
+    for label in cfg.preds[loop.header]:
+        if label not in loop.blocks:
+            retarget(cfg.blocks[label], loop.header, preheader.label)
+
+    index = function.blocks.index(header)
+
+    # Keep the block laid out before the header from falling into the preheader
+    if index > 0 and terminator(function.blocks[index - 1]) is None:
+        function.blocks[index - 1].instructions.append(IRInstruction("jump", [loop.header]))
+
+    function.blocks.insert(index, preheader)
+
+    if header is function.entry_block:
+        function.entry_block = preheader
+
+    return preheader
+
+def insert_before_terminator(block, instructions):
+    term = terminator(block)
+    index = block.instructions.index(term) if term is not None else len(block.instructions)
+    block.instructions[index:index] = instructions
+
+def clone_instruction(instr, rename_temp, rename_label):
+    args = [rename_temp(arg) for arg in instr.args]
+
+    if instr.op == "jump":
+        args[0] = rename_label(args[0])
+    elif instr.op == "branch":
+        args[1:3] = [rename_label(label) for label in args[1:3]]
+
+    return IRInstruction(instr.op, args, rename_temp(instr.result) if instr.result else None, instr.line)
@@ -1,31 +1,194 @@
+from collections import ChainMap
+from itertools import count
 from .irgen import IRProgram, IRFunction, BasicBlock, IRInstruction
+from .cfg import ControlFlowGraph, terminator, is_temp
+from .loops import (
+    find_loops, innermost_loop, find_preheader, ensure_preheader,
+    insert_before_terminator, retarget, clone_instruction
+)
+from .inline import Inliner
+from .ipcp import InterproceduralConstantPropagator
+from .stats import PassStatistics
+from .remarks import RemarkEmitter
+from .escape import EscapeAnalysis
+from .typeinfer import FloatTypes
+
+# Operations whose result depends only on their operands
+PURE_OPS = {"const", "copy", "binop", "unop", "compare", "len", "getitem", "getitem_unchecked"}
+COMMUTATIVE_OPS = {"+", "*", "&", "|", "^", "==", "!="}
+
+COMPARE_OPS = {
+    "<": lambda a, b: a < b,
+    "<=": lambda a, b: a <= b,
+    ">": lambda a, b: a > b,
+    ">=": lambda a, b: a >= b,
+}
+SWAPPED_COMPARE = {"<": ">", "<=": ">=", ">": "<", ">=": "<="}
+NEGATED_COMPARE = {"<": ">=", "<=": ">", ">": "<=", ">=": "<"}
+
+# Associative, commutative operators a tail-recursive accumulator can use
+ACCUMULATOR_IDENTITY = {"+": 0, "*": 1}
+
+# Operations that must be kept even when their result is unused
+SIDE_EFFECT_OPS = {"store", "jump", "branch", "ret", "call", "setitem"}
+
+# Largest list literal, in items, that is allocated in the stack frame
+STACK_LIST_LIMIT = 64
+
+def wrap_int64(value):
+    # Folded integers wrap around like the 64-bit registers they replace
+    if type(value) is int:
+        return (value + 2 ** 63) % 2 ** 64 - 2 ** 63
+    return value
+
+# Tunable thresholds for each optimization level; individual entries can be
+# overridden through the Optimizer's params argument.
+OPTIMIZATION_PARAMS = {
+    0: {"inline_threshold": 0, "inline_caller_budget": 0,
+        "unroll_factor": 1, "full_unroll_limit": 0, "unroll_budget": 0,
+        "specialize_threshold": 0, "max_specializations": 0},
+    1: {"inline_threshold": 0, "inline_caller_budget": 0,
+        "unroll_factor": 1, "full_unroll_limit": 0, "unroll_budget": 0,
+        "specialize_threshold": 0, "max_specializations": 0},
+    2: {"inline_threshold": 8, "inline_caller_budget": 400,
+        "unroll_factor": 4, "full_unroll_limit": 8, "unroll_budget": 96,
+        "specialize_threshold": 0, "max_specializations": 2},
+    3: {"inline_threshold": 30, "inline_caller_budget": 1500,
+        "unroll_factor": 8, "full_unroll_limit": 32, "unroll_budget": 320,
+        "specialize_threshold": -16, "max_specializations": 4},
+    # -Os: only size-neutral inlining, and no unrolling or cloning
+    "s": {"inline_threshold": 0, "inline_caller_budget": 400,
+          "unroll_factor": 1, "full_unroll_limit": 0, "unroll_budget": 0,
+          "specialize_threshold": 0, "max_specializations": 0},
+}
+
+# Every pass an explicit pass order may name
+OPTIMIZATION_PASSES = (
+    "eliminate_dead_code", "constant_folding", "constant_propagation",
+    "eliminate_unreachable_code", "merge_blocks", "copy_propagation",
+    "eliminate_tail_recursion", "propagate_interprocedural_constants",
+    "inline_functions", "global_value_numbering", "loop_invariant_code_motion",
+    "strength_reduce_induction_variables", "eliminate_bounds_checks", "unroll_loops",
+)
 
 class Optimizer:
-    def __init__(self, optimization_level=1):
+    def __init__(self, optimization_level=1, params=None, passes=None, late_passes=None):
+        # -Os runs the -O2 pipeline with size-neutral parameters
+        self.optimize_size = optimization_level == "s"
+        
+        if self.optimize_size:
+            optimization_level = 2
+            self.params = dict(OPTIMIZATION_PARAMS["s"])
+        else:
+            self.params = dict(OPTIMIZATION_PARAMS[min(max(optimization_level, 0), 3)])
+            
         self.optimization_level = optimization_level
+        self.params.update(params or {})
+        self.temp_counter = 0
+        self.label_counter = 0
+        self.unrolled_loops = set()
+        self.stats = PassStatistics()
+        self.remarks = RemarkEmitter()
+        self.inliner = Inliner(self.params["inline_threshold"], self.params["inline_caller_budget"], self.remarks)
+        self.ipcp = InterproceduralConstantPropagator(
+            self.params["specialize_threshold"], self.params["max_specializations"], self.remarks
+        )
         self.optimizations = [
             self.eliminate_dead_code,
             self.constant_folding,
             self.constant_propagation,
             self.eliminate_unreachable_code,
             self.merge_blocks,
+            self.copy_propagation,
         ]
         
+        if optimization_level >= 2:
+            self.optimizations.extend([
+                self.eliminate_tail_recursion,
+                self.propagate_interprocedural_constants,
+                self.inline_functions,
+                self.global_value_numbering,
+                self.loop_invariant_code_motion,
+                self.strength_reduce_induction_variables,
+                self.eliminate_bounds_checks,
+            ])
+            
+        # Late passes only run once the passes above have reached a fixpoint,
+        # so they see fully cleaned-up loops
+        self.late_optimizations = []
+        
+        if optimization_level >= 2:
+            self.late_optimizations.append(self.unroll_loops)
+            
+        # Final passes run once, after all other passes are done, so no later
+        # inlining or unrolling can move their results into a loop
+        self.final_optimizations = []
+        
+        if optimization_level >= 1:
+            self.final_optimizations.append(self.allocate_lists_on_stack)
+            
+        # An explicit pass order, e.g. one found by the autotuner, replaces
+        # the level's default pipeline
+        if passes is not None:
+            self.optimizations = [self.lookup_pass(name) for name in passes]
+        if late_passes is not None:
+            self.late_optimizations = [self.lookup_pass(name) for name in late_passes]
+            
+    def options(self):
+        return {
+            "optimization_level": self.optimization_level,
+            "optimize_size": self.optimize_size,
+            "params": self.params,
+            "passes": [optimization.__name__ for optimization in self.optimizations],
+            "late_passes": [optimization.__name__ for optimization in self.late_optimizations],
+            "final_passes": [optimization.__name__ for optimization in self.final_optimizations],
+        }
+        
+    def lookup_pass(self, name):
+        if name not in OPTIMIZATION_PASSES:
+            raise ValueError(f"Unknown optimization pass '{name}'")
+            
+        return getattr(self, name)
+        
     def optimize(self, program):
+        self.stats = PassStatistics()
+        self.stats.begin(program)
+        self.remarks.clear()
+        self.inliner.reset()
+        self.ipcp.reset()
+        self.temp_counter = 0
+        self.label_counter = 0
+        self.unrolled_loops = set()
+        
         if self.optimization_level <= 0:
+            self.stats.finish(program)
             return program
             
         changed = True
         
         while changed:
             changed = False
+            self.stats.iterations += 1
             
-            for optimization in self.optimizations[:self.optimization_level]:
-                if optimization(program):
+            for optimization in self.optimizations:
+                if self.run_pass(optimization, program):
                     changed = True
                     
+            if not changed:
+                for optimization in self.late_optimizations:
+                    if self.run_pass(optimization, program):
+                        changed = True
+                        
+        for optimization in self.final_optimizations:
+            self.run_pass(optimization, program)
+            
+        self.stats.finish(program)
         return program
         
+    def run_pass(self, optimization, program):
+        self.remarks.current_pass = optimization.__name__
+        return self.stats.run(optimization.__name__, optimization, program)
+        
     def eliminate_dead_code(self, program):
         changed = False
         
@@ -33,29 +196,40 @@ class Optimizer:
             used_vars = set()
             
             for block in function.blocks:
+                term = terminator(block)
+                
+                if term is not None and block.instructions[-1] is not term:
+                    # Anything after the first terminator can never execute
+                    index = block.instructions.index(term)
+                    self.remarks.passed(function, block, f"removed {len(block.instructions) - index - 1} instructions after {term.op}", term)
+                    block.instructions = block.instructions[:index + 1]
+                    changed = True
+                    
                 for instr in block.instructions:
-                    if instr.op in ["load", "binop", "unop", "compare", "call", "getitem"]:
-                        for arg in instr.args:
-                            if isinstance(arg, str) and arg.startswith("%"):
-                                used_vars.add(arg)
-                    elif instr.op == "ret" and instr.args:
-                        for arg in instr.args:
-                            if isinstance(arg, str) and arg.startswith("%"):
-                                used_vars.add(arg)
-                    elif instr.op == "branch" and len(instr.args) > 0:
-                        arg = instr.args[0]
-                        if isinstance(arg, str) and arg.startswith("%"):
+                    for arg in instr.args:
+                        if is_temp(arg):
                             used_vars.add(arg)
                             
+            # Stores to locals that are never read back are dead too
+            local_vars = set(function.local_vars) | set(function.params)
+            loaded_vars = {instr.args[0] for block in function.blocks
+                           for instr in block.instructions if instr.op == "load"}
+                           
             for block in function.blocks:
                 new_instructions = []
                 
                 for instr in block.instructions:
                     if instr.result and instr.result.startswith("%") and instr.result not in used_vars:
-                        if instr.op not in ["store", "jump", "branch", "ret"]:
+                        if instr.op not in SIDE_EFFECT_OPS:
+                            self.remarks.passed(function, block, f"removed unused {instr.op} defining {instr.result}", instr)
                             changed = True
                             continue
                             
+                    if instr.op == "store" and instr.args[1] in local_vars and instr.args[1] not in loaded_vars:
+                        self.remarks.passed(function, block, f"removed store to '{instr.args[1]}', which is never read", instr)
+                        changed = True
+                        continue
+                        
                     new_instructions.append(instr)
                     
                 if len(new_instructions) != len(block.instructions):
@@ -67,10 +241,29 @@ class Optimizer:
     def constant_folding(self, program):
         changed = False
         
+        defined = {func.name for func in program.functions}
+        
         for function in program.functions:
+            def_counts = self.count_definitions(function)
+            range_lengths = {}
+            
+            if "range" not in defined:
+                for block in function.blocks:
+                    for instr in block.instructions:
+                        if (instr.op == "call" and instr.args[0] == "range" and len(instr.args) == 2
+                                and def_counts.get(instr.result) == 1
+                                and type(self.is_constant_value(instr.args[1])) is int
+                                and not is_temp(instr.args[1])):
+                            range_lengths[instr.result] = max(self.is_constant_value(instr.args[1]), 0)
+                            
             for block in function.blocks:
                 for i, instr in enumerate(block.instructions):
-                    if instr.op == "binop" and len(instr.args) == 3:
+                    if instr.op == "len" and instr.args[0] in range_lengths:
+                        block.instructions[i] = IRInstruction("const", [range_lengths[instr.args[0]]], instr.result, instr.line)
+                        self.remarks.passed(function, block, f"folded len of range({range_lengths[instr.args[0]]})", instr)
+                        changed = True
+                        
+                    elif instr.op == "binop" and len(instr.args) == 3:
                         op, left, right = instr.args
                         
                         left_const = self.is_constant_value(left)
@@ -79,23 +272,42 @@ class Optimizer:
                         if left_const is not None and right_const is not None:
                             result = None
                             
-                            if op == "+":
+                            if op in ("/", "//", "%") and right_const == 0:
+                                # Left in place so the program still fails at run time
+                                self.remarks.missed(function, block, "not folded: division by zero", instr)
+                            elif op == "+":
                                 result = left_const + right_const
                             elif op == "-":
                                 result = left_const - right_const
                             elif op == "*":
                                 result = left_const * right_const
-                            elif op == "/" and right_const != 0:
+                            elif op == "/" and isinstance(left_const, int) and isinstance(right_const, int):
+                                # Integers divide like the generated code, which floors
+                                result = left_const // right_const
+                            elif op == "/":
                                 result = left_const / right_const
-                            elif op == "//" and right_const != 0:
+                            elif op == "//":
                                 result = left_const // right_const
                             elif op == "%":
                                 result = left_const % right_const
                                 
+                            result = wrap_int64(result)
+                            
                             if result is not None:
-                                block.instructions[i] = IRInstruction("const", [result], instr.result)
+                                block.instructions[i] = IRInstruction("const", [result], instr.result, instr.line)
+                                self.remarks.passed(function, block, f"folded {left_const} {op} {right_const} to {result}", instr)
                                 changed = True
                                 
+                    elif instr.op == "branch" and not is_temp(instr.args[0]) and self.is_constant_value(instr.args[0]) is not None:
+                        target = instr.args[1] if self.is_constant_value(instr.args[0]) else instr.args[2]
+                        block.instructions[i] = IRInstruction("jump", [target], None, instr.line)
+                        self.remarks.passed(function, block, f"folded branch on constant {instr.args[0]} to a jump to {target}", instr)
+                        changed = True
+                        
+                    elif instr.op == "copy" and self.is_constant_value(instr.args[0]) is not None:
+                        block.instructions[i] = IRInstruction("const", [instr.args[0]], instr.result, instr.line)
+                        changed = True
+                        
                     elif instr.op == "unop" and len(instr.args) == 2:
                         op, operand = instr.args
                         
@@ -109,8 +321,11 @@ class Optimizer:
                             elif op == "+":
                                 result = +operand_const
                                 
+                            result = wrap_int64(result)
+                            
                             if result is not None:
-                                block.instructions[i] = IRInstruction("const", [result], instr.result)
+                                block.instructions[i] = IRInstruction("const", [result], instr.result, instr.line)
+                                self.remarks.passed(function, block, f"folded {op}{operand_const} to {result}", instr)
                                 changed = True
                                 
                     elif instr.op == "compare" and len(instr.args) == 3:
@@ -136,7 +351,8 @@ class Optimizer:
                                 result = left_const >= right_const
                                 
                             if result is not None:
-                                block.instructions[i] = IRInstruction("const", [result], instr.result)
+                                block.instructions[i] = IRInstruction("const", [result], instr.result, instr.line)
+                                self.remarks.passed(function, block, f"folded {left_const} {op} {right_const} to {result}", instr)
                                 changed = True
                         
         return changed
@@ -145,14 +361,26 @@ class Optimizer:
         changed = False
         
         for function in program.functions:
+            # Numeric constants with a single definition hold everywhere
+            def_counts = self.count_definitions(function)
+            global_constants = {
+                instr.result: instr.args[0]
+                for block in function.blocks for instr in block.instructions
+                if instr.op == "const" and def_counts.get(instr.result) == 1
+                and isinstance(instr.args[0], (int, float, bool))
+            }
+            
             for block in function.blocks:
-                constants = {}
+                constants = dict(global_constants)
                 
                 for i, instr in enumerate(block.instructions):
                     if instr.op == "const" and instr.result:
                         constants[instr.result] = instr.args[0]
+                    elif instr.result:
+                        # A temp redefined by a non-constant no longer holds the constant
+                        constants.pop(instr.result, None)
                         
-                    if instr.op in ["binop", "unop", "compare", "load", "getitem"]:
+                    if instr.op in ["binop", "unop", "compare", "copy", "load", "getitem", "getitem_unchecked"]:
                         new_args = []
                         arg_changed = False
                         
@@ -164,7 +392,8 @@ class Optimizer:
                                 new_args.append(arg)
                                 
                         if arg_changed:
-                            block.instructions[i] = IRInstruction(instr.op, new_args, instr.result)
+                            block.instructions[i] = IRInstruction(instr.op, new_args, instr.result, instr.line)
+                            self.remarks.passed(function, block, f"propagated constants into {instr.op}", instr)
                             changed = True
                             
                     elif instr.op in ["store", "branch", "ret"]:
@@ -179,58 +408,108 @@ class Optimizer:
                                 new_args.append(arg)
                                 
                         if arg_changed:
-                            block.instructions[i] = IRInstruction(instr.op, new_args, instr.result)
+                            block.instructions[i] = IRInstruction(instr.op, new_args, instr.result, instr.line)
+                            self.remarks.passed(function, block, f"propagated constants into {instr.op}", instr)
                             changed = True
                         
         return changed
         
-    def eliminate_unreachable_code(self, program):
+    def copy_propagation(self, program):
         changed = False
         
         for function in program.functions:
-            reachable_blocks = set()
-            worklist = [function.entry_block]
-            
-            while worklist:
-                block = worklist.pop()
+            if self.forward_stores(function):
+                changed = True
+            if self.propagate_copies(function):
+                changed = True
                 
-                if block.label in reachable_blocks:
-                    continue
+        return changed
+        
+    def forward_stores(self, function):
+        # Within a block, a load of a variable that was just stored reads the
+        # stored value directly. Only another store to the variable, a call
+        # (for non-locals) or a redefinition of the stored temp ends this.
+        changed = False
+        def_counts = self.count_definitions(function)
+        local_vars = set(function.local_vars) | set(function.params)
+        
+        for block in function.blocks:
+            available = {}
+            
+            for i, instr in enumerate(block.instructions):
+                if instr.op == "load" and instr.args[0] in available and instr.result:
+                    block.instructions[i] = IRInstruction("copy", [available[instr.args[0]]], instr.result, instr.line)
+                    self.remarks.passed(function, block, f"forwarded stored value of '{instr.args[0]}' to load", instr)
+                    changed = True
+                elif instr.op == "store":
+                    value, var = instr.args
                     
-                reachable_blocks.add(block.label)
-                
-                for instr in block.instructions:
-                    if instr.op == "jump" and instr.args:
-                        target_label = instr.args[0]
-                        target_block = next((b for b in function.blocks if b.label == target_label), None)
-                        
-                        if target_block and target_block.label not in reachable_blocks:
-                            worklist.append(target_block)
-                            
-                    elif instr.op == "branch" and len(instr.args) > 2:
-                        true_label = instr.args[1]
-                        false_label = instr.args[2]
-                        
-                        true_block = next((b for b in function.blocks if b.label == true_label), None)
-                        false_block = next((b for b in function.blocks if b.label == false_label), None)
-                        
-                        if true_block and true_block.label not in reachable_blocks:
-                            worklist.append(true_block)
-                            
-                        if false_block and false_block.label not in reachable_blocks:
-                            worklist.append(false_block)
-                            
-                if block.next_block and block.next_block.label not in reachable_blocks:
-                    worklist.append(block.next_block)
+                    if self.is_forwardable(value, def_counts):
+                        available[var] = value
+                    else:
+                        available.pop(var, None)
+                elif instr.op == "call":
+                    available = {var: value for var, value in available.items() if var in local_vars}
+                    
+                if instr.result:
+                    available = {var: value for var, value in available.items() if value != instr.result}
                     
-                if block.branch_target and block.branch_target.label not in reachable_blocks:
-                    worklist.append(block.branch_target)
+        return changed
+        
+    def propagate_copies(self, function):
+        def_counts = self.count_definitions(function)
+        replacements = {}
+        
+        for block in function.blocks:
+            for instr in block.instructions:
+                if (instr.op == "copy" and instr.result and def_counts.get(instr.result) == 1
+                        and self.is_forwardable(instr.args[0], def_counts)):
+                    replacements[instr.result] = instr.args[0]
                     
-            unreachable_blocks = [b for b in function.blocks if b.label not in reachable_blocks]
+        if not replacements:
+            return False
             
-            if unreachable_blocks:
+        def resolve(value):
+            # Follow chains of copies to their source
+            while is_temp(value) and value in replacements:
+                value = replacements[value]
+            return value
+            
+        for block in function.blocks:
+            for instr in block.instructions:
+                if instr.op == "copy" and instr.result in replacements:
+                    self.remarks.passed(function, block, f"propagated copy of {instr.args[0]} into uses of {instr.result}", instr)
+                    
+            block.instructions = [instr for instr in block.instructions
+                                  if not (instr.op == "copy" and instr.result in replacements)]
+                                  
+            for instr in block.instructions:
+                if any(is_temp(arg) and arg in replacements for arg in instr.args):
+                    instr.args = [resolve(arg) for arg in instr.args]
+                    
+        return True
+        
+    def is_forwardable(self, value, def_counts):
+        # Single-definition temps and numeric literals never change under us
+        if is_temp(value):
+            return def_counts.get(value) == 1
+            
+        return isinstance(value, (int, float, bool))
+        
+    def eliminate_unreachable_code(self, program):
+        changed = False
+        
+        for function in program.functions:
+            cfg = ControlFlowGraph(function)
+            reachable_blocks = [b for b in function.blocks if cfg.reachable(b.label)]
+            
+            for block in function.blocks:
+                if not cfg.reachable(block.label):
+                    self.remarks.passed(function, block, "removed unreachable block")
+                    
+            if len(reachable_blocks) != len(function.blocks):
                 changed = True
-                function.blocks = [b for b in function.blocks if b.label in reachable_blocks]
+                function.blocks = reachable_blocks
                 
         return changed
         
@@ -249,11 +528,26 @@ class Optimizer:
                     
                 last_instr = block.instructions[-1]
                 
-                if last_instr.op == "jump" and len(last_instr.args) == 1:
+                if last_instr.op == "jump" and len(last_instr.args) == 1 and terminator(block) is last_instr:
                     target_label = last_instr.args[0]
                     target_block = next((b for b in function.blocks if b.label == target_label), None)
+                    cfg = ControlFlowGraph(function)
                     
-                    if target_block and len([b for b in function.blocks if b.next_block == target_block or b.branch_target == target_block]) == 1:
+                    reason = None
+                    
+                    if target_block is None or target_block is block:
+                        reason = "target is not another block"
+                    elif target_block is function.entry_block:
+                        reason = "target is the function entry"
+                    elif terminator(target_block) is None:
+                        reason = "target falls through to the next block"
+                    elif cfg.preds[target_label] != [block.label]:
+                        reason = f"target has {len(cfg.preds[target_label])} predecessors"
+                        
+                    if reason is not None:
+                        self.remarks.missed(function, block, f"not merged with {target_label}: {reason}", last_instr)
+                    else:
+                        self.remarks.passed(function, block, f"merged {target_label} into {block.label}", last_instr)
                         block.instructions.pop()
                         block.instructions.extend(target_block.instructions)
                         
@@ -272,6 +566,975 @@ class Optimizer:
                 
         return changed
         
+    def eliminate_tail_recursion(self, program):
+        changed = False
+        types = FloatTypes(program, unknown_globals=True)
+        
+        for function in program.functions:
+            if self.convert_tail_calls(function, types):
+                changed = True
+                
+        return changed
+        
+    def convert_tail_calls(self, function, types):
+        # Self tail calls become a jump back to the function entry. Calls whose
+        # result is combined with an associative operator before returning
+        # (`return n * f(n - 1)`) get an accumulator the way GCC's tail-call
+        # pass does: acc = acc op n before the jump, and every other return
+        # yields acc op value. Like GCC without -fassociative-math, only
+        # integer results are reassociated.
+        sites = []
+        
+        for block in function.blocks:
+            site = self.match_tail_call(function, block)
+            if site is not None:
+                sites.append((block,) + site)
+                
+        matched = {id(block.instructions[index]) for block, index, _, _ in sites}
+        
+        for block in function.blocks:
+            for instr in block.instructions:
+                if instr.op == "call" and instr.args[0] == function.name and id(instr) not in matched:
+                    self.remarks.missed(function, block, "recursive call not eliminated: not in tail position", instr)
+                    
+        for block, index, op, operand in sites:
+            if op is not None and (types.is_float(function, operand) or types.returns_float(function.name)):
+                self.remarks.missed(function, block, "recursive call not eliminated: an accumulator would reassociate float arithmetic", block.instructions[index])
+                
+        sites = [site for site in sites if site[2] is None
+                 or not (types.is_float(function, site[3]) or types.returns_float(function.name))]
+        ops = {op for _, _, op, _ in sites if op is not None}
+        
+        if len(ops) > 1:
+            for block, index, op, _ in sites:
+                if op is not None:
+                    self.remarks.missed(function, block, "recursive call not eliminated: tail calls combine their results with different operators", block.instructions[index])
+                    
+            sites = [site for site in sites if site[2] is None]
+            ops = set()
+            
+        if not sites:
+            return False
+            
+        op = ops.pop() if ops else None
+        header = function.entry_block
+        entry = BasicBlock(f"{header.label}_tre")
+        entry.next_block = header
+        acc_var = f"acc.{function.name}"
+        
+        if op is not None:
+            entry.instructions.append(IRInstruction("store", [ACCUMULATOR_IDENTITY[op], acc_var]))
+            function.local_vars.append(acc_var)
+            
+            site_blocks = {id(site[0]) for site in sites}
+            
+            for block in function.blocks:
+                term = terminator(block)
+                if id(block) in site_blocks or term is None or term.op != "ret":
+                    continue
+                    
+                value = term.args[0] if term.args else 0
+                acc, combined = self.new_temp(), self.new_temp()
+                index = block.instructions.index(term)
+                block.instructions[index:] = [
+                    IRInstruction("load", [acc_var], acc),
+                    IRInstruction("binop", [op, acc, value], combined),
+                    IRInstruction("ret", [combined]),
+                ]
+                
+        entry.instructions.append(IRInstruction("jump", [header.label]))
+        
+        for block, call_index, site_op, operand in sites:
+            call = block.instructions[call_index]
+            new_instructions = block.instructions[:call_index]
+            
+            if site_op is None:
+                self.remarks.passed(function, block, "tail call converted to a jump to the function entry", call)
+            else:
+                self.remarks.passed(function, block, f"recursive call converted to a loop with a '{site_op}' accumulator", call)
+            
+            if site_op is not None:
+                acc, combined = self.new_temp(), self.new_temp()
+                new_instructions.extend([
+                    IRInstruction("load", [acc_var], acc),
+                    IRInstruction("binop", [site_op, acc, operand], combined),
+                    IRInstruction("store", [combined, acc_var]),
+                ])
+                
+            for param, arg in zip(function.params, call.args[1:]):
+                new_instructions.append(IRInstruction("store", [arg, param]))
+                
+            new_instructions.append(IRInstruction("jump", [header.label]))
+            block.instructions = new_instructions
+            
+        function.blocks.insert(0, entry)
+        function.entry_block = entry
+        return True
+        
+    def match_tail_call(self, function, block):
+        instrs = block.instructions
+        term = terminator(block)
+        
+        if term is None or term.op != "ret" or not term.args or instrs[-1] is not term:
+            return None
+            
+        index = len(instrs) - 1
+        
+        def is_self_call(instr):
+            return (instr.op == "call" and instr.args[0] == function.name
+                    and len(instr.args) - 1 == len(function.params))
+            
+        if index >= 1 and is_self_call(instrs[index - 1]) and instrs[index - 1].result == term.args[0]:
+            return index - 1, None, None
+            
+        if index >= 2 and is_self_call(instrs[index - 2]):
+            call, combine = instrs[index - 2], instrs[index - 1]
+            
+            if (combine.op == "binop" and combine.args[0] in ACCUMULATOR_IDENTITY
+                    and combine.result == term.args[0]):
+                op, left, right = combine.args
+                
+                if right == call.result and left != call.result:
+                    return index - 2, op, left
+                if left == call.result and right != call.result:
+                    return index - 2, op, right
+                    
+        return None
+        
+    def propagate_interprocedural_constants(self, program):
+        return self.ipcp.propagate(program)
+        
+    def inline_functions(self, program):
+        # Inlined bodies are cleaned up by the rest of the pipeline, which
+        # optimize() reruns whenever a pass reports a change.
+        return self.inliner.inline(program)
+        
+    def global_value_numbering(self, program):
+        changed = False
+        
+        for function in program.functions:
+            if self.number_values(function):
+                changed = True
+                
+        return changed
+        
+    def number_values(self, function):
+        # Hash-based value numbering scoped over the dominator tree. Only temps
+        # with a single definition take part: for those, a dominating
+        # definition of the same expression is always available.
+        cfg = ControlFlowGraph(function)
+        def_counts = self.count_definitions(function)
+        local_vars = set(function.local_vars) | set(function.params)
+        fresh_version = count(1)
+        
+        stored_vars = {}
+        has_call = set()
+        
+        for label, block in cfg.blocks.items():
+            stored_vars[label] = {instr.args[1] for instr in block.instructions if instr.op == "store"}
+            
+            if any(instr.op == "call" for instr in block.instructions):
+                has_call.add(label)
+                
+        def single_def(value):
+            return not is_temp(value) or def_counts.get(value, 0) == 1
+            
+        replacements = {}
+        end_states = {}
+        changed = False
+        
+        for label in cfg.dominator_preorder():
+            block = cfg.blocks[label]
+            parent = cfg.idom[label]
+            
+            if parent == label:
+                table = ChainMap()
+                versions = {}
+                global_epoch = 0
+            else:
+                parent_table, parent_versions, global_epoch = end_states[parent]
+                table = parent_table.new_child()
+                versions = dict(parent_versions)
+                
+                # Memory written on any path from the dominator invalidates its loads
+                for between in cfg.blocks_between(parent, label):
+                    for var in stored_vars[between]:
+                        versions[var] = next(fresh_version)
+                        
+                    if between in has_call:
+                        global_epoch = next(fresh_version)
+                        
+            new_instructions = []
+            
+            for instr in block.instructions:
+                if any(arg in replacements for arg in instr.args if is_temp(arg)):
+                    instr.args = [replacements.get(arg, arg) if is_temp(arg) else arg for arg in instr.args]
+                    
+                key = None
+                
+                if instr.op in PURE_OPS and instr.result:
+                    if all(single_def(arg) for arg in instr.args) and single_def(instr.result):
+                        key = self.value_key(instr)
+                elif instr.op == "load" and instr.result and single_def(instr.result):
+                    var = instr.args[0]
+                    epoch = 0 if var in local_vars else global_epoch
+                    key = ("load", var, versions.get(var, 0), epoch)
+                elif instr.op == "store":
+                    versions[instr.args[1]] = next(fresh_version)
+                elif instr.op == "call":
+                    global_epoch = next(fresh_version)
+                    
+                if key is not None:
+                    if key in table:
+                        self.remarks.passed(function, block, f"removed redundant {instr.op}, reusing {table[key]}", instr)
+                        replacements[instr.result] = table[key]
+                        changed = True
+                        continue
+                        
+                    table[key] = instr.result
+                    
+                new_instructions.append(instr)
+                
+            block.instructions = new_instructions
+            end_states[label] = (table, versions, global_epoch)
+            
+        if replacements:
+            for block in function.blocks:
+                for instr in block.instructions:
+                    instr.args = [replacements.get(arg, arg) if is_temp(arg) else arg for arg in instr.args]
+                    
+        return changed
+        
+    def loop_invariant_code_motion(self, program):
+        changed = False
+        
+        for function in program.functions:
+            progress = True
+            
+            while progress:
+                progress = False
+                cfg = ControlFlowGraph(function)
+                
+                for loop in find_loops(cfg):
+                    if self.hoist_invariants(function, cfg, loop):
+                        changed = progress = True
+                        break
+                        
+        return changed
+        
+    def hoist_invariants(self, function, cfg, loop):
+        def_counts = self.count_definitions(function)
+        local_vars = set(function.local_vars) | set(function.params)
+        loop_labels = [label for label in cfg.rpo if label in loop.blocks]
+        loop_instrs = [instr for label in loop_labels for instr in cfg.blocks[label].instructions]
+        
+        loop_defs = {instr.result for instr in loop_instrs if instr.result}
+        stored_vars = {instr.args[1] for instr in loop_instrs if instr.op == "store"}
+        has_call = any(instr.op == "call" for instr in loop_instrs)
+        
+        invariant_temps = set()
+        hoisted = {}
+        progress = True
+        
+        while progress:
+            progress = False
+            
+            for rank, label in enumerate(loop_labels):
+                block = cfg.blocks[label]
+                seen_call = False
+                
+                for index, instr in enumerate(block.instructions):
+                    if instr.op == "call":
+                        seen_call = True
+                        
+                    if id(instr) in hoisted or not instr.result or def_counts.get(instr.result) != 1:
+                        continue
+                        
+                    if not all(arg not in loop_defs or arg in invariant_temps
+                               for arg in instr.args if is_temp(arg)):
+                        continue
+                        
+                    if instr.op == "load":
+                        var = instr.args[0]
+                        if var in stored_vars or (has_call and var not in local_vars):
+                            continue
+                    elif instr.op not in PURE_OPS:
+                        continue
+                    elif self.may_trap(instr) and (label != loop.header or seen_call):
+                        # Only the header is sure to run whenever the preheader does
+                        self.remarks.missed(function, block, f"invariant {instr.op} not hoisted: it may trap and is not sure to execute", instr)
+                        continue
+                        
+                    hoisted[id(instr)] = ((rank, index), instr)
+                    invariant_temps.add(instr.result)
+                    progress = True
+                    
+        if not hoisted:
+            return False
+            
+        preheader = ensure_preheader(function, cfg, loop)
+        
+        for label in loop_labels:
+            block = cfg.blocks[label]
+            
+            for instr in block.instructions:
+                if id(instr) in hoisted:
+                    self.remarks.passed(function, block, f"hoisted loop-invariant {instr.op} out of the loop at {loop.header}", instr)
+                    
+            block.instructions = [instr for instr in block.instructions if id(instr) not in hoisted]
+            
+        insert_before_terminator(preheader, [instr for _, instr in sorted(hoisted.values(), key=lambda item: item[0])])
+        return True
+        
+    def may_trap(self, instr):
+        # An unchecked access is only in bounds where its loop test holds
+        if instr.op in ("getitem", "getitem_unchecked"):
+            return True
+            
+        if instr.op == "binop" and instr.args[0] in ("/", "//", "%"):
+            divisor = self.is_constant_value(instr.args[2])
+            return divisor is None or divisor == 0
+            
+        return False
+        
+    def strength_reduce_induction_variables(self, program):
+        changed = False
+        
+        # A running float sum rounds differently from the multiplies it
+        # replaces, so only integer induction variables are reduced. The
+        # optimizer may see only some of the functions (see cache.py), so
+        # globals are taken to hold floats.
+        types = FloatTypes(program, unknown_globals=True)
+        
+        for function in program.functions:
+            progress = True
+            
+            while progress:
+                progress = False
+                cfg = ControlFlowGraph(function)
+                loops = find_loops(cfg)
+                
+                for loop in loops:
+                    if self.reduce_loop_multiplies(function, cfg, loops, loop, types):
+                        changed = progress = True
+                        break
+                        
+        return changed
+        
+    def reduce_loop_multiplies(self, function, cfg, loops, loop, types):
+        # Rewrites `iv * k` inside a loop as a new temp that starts at
+        # `iv * k` in the preheader and is bumped by `step * k` wherever the
+        # induction variable is updated.
+        def_counts = self.count_definitions(function)
+        temp_ivs, var_ivs, positions, defs = self.induction_variables(function, cfg, loops, loop)
+        loop_instrs = [instr for label in cfg.rpo if label in loop.blocks for instr in cfg.blocks[label].instructions]
+        
+        candidates = []
+        for instr in loop_instrs:
+            if instr.op != "binop" or instr.args[0] != "*" or def_counts.get(instr.result) != 1:
+                continue
+                
+            for operand, factor in ((instr.args[1], instr.args[2]), (instr.args[2], instr.args[1])):
+                factor = self.is_constant_value(factor)
+                if type(factor) is not int:
+                    continue
+                    
+                if operand in temp_ivs:
+                    if types.is_float(function, operand):
+                        self.remarks.missed(function, positions[id(instr)][0], "multiply of induction variable not reduced: it may hold a float", instr)
+                    else:
+                        candidates.append((instr, ("temp", operand), factor))
+                    break
+                    
+                load_defs = defs.get(operand, [])
+                if len(load_defs) == 1 and load_defs[0].op == "load" and load_defs[0].args[0] in var_ivs:
+                    var = load_defs[0].args[0]
+                    if types.is_float(function, var):
+                        self.remarks.missed(function, positions[id(instr)][0], "multiply of induction variable not reduced: it may hold a float", instr)
+                        break
+                        
+                    store = var_ivs[var][0]
+                    load_pos = positions[id(load_defs[0])]
+                    use_pos = positions[id(instr)]
+                    
+                    # The loaded value must still be the current value at the multiply
+                    if self.precedes(cfg, load_pos, use_pos) and not self.store_between(cfg, load_pos, use_pos, positions[id(store)]):
+                        candidates.append((instr, ("var", var), factor))
+                        break
+                        
+        if not candidates:
+            return False
+            
+        preheader = ensure_preheader(function, cfg, loop)
+        reduced = {}
+        
+        for instr, (kind, iv), factor in candidates:
+            key = (kind, iv, factor)
+            
+            if key not in reduced:
+                scaled = self.new_temp()
+                
+                if kind == "temp":
+                    update, step = temp_ivs[iv]
+                    init = [IRInstruction("binop", ["*", iv, factor], scaled)]
+                else:
+                    update, step = var_ivs[iv]
+                    loaded = self.new_temp()
+                    init = [
+                        IRInstruction("load", [iv], loaded),
+                        IRInstruction("binop", ["*", loaded, factor], scaled),
+                    ]
+                    
+                insert_before_terminator(preheader, init)
+                
+                update_block = cfg.blocks[positions[id(update)][0]]
+                index = update_block.instructions.index(update)
+                update_block.instructions.insert(index + 1, IRInstruction("binop", ["+", scaled, step * factor], scaled))
+                reduced[key] = scaled
+                
+            self.remarks.passed(function, positions[id(instr)][0], f"multiply of induction variable by {factor} reduced to an addition", instr)
+            instr.op = "copy"
+            instr.args = [reduced[key]]
+            
+        return True
+        
+    def eliminate_bounds_checks(self, program):
+        changed = False
+        
+        for function in program.functions:
+            cfg = ControlFlowGraph(function)
+            loops = find_loops(cfg)
+            
+            for loop in loops:
+                if self.prove_loop_accesses(function, cfg, loops, loop):
+                    changed = True
+                    
+        return changed
+        
+    def prove_loop_accesses(self, function, cfg, loops, loop):
+        accesses = [(label, index, instr) for label in loop.blocks
+                    for index, instr in enumerate(cfg.blocks[label].instructions) if instr.op == "getitem"]
+        if not accesses:
+            return False
+            
+        guard, reason = self.length_guard(function, cfg, loops, loop)
+        changed = False
+        
+        for label, index, instr in accesses:
+            if guard is not None:
+                sequence, index_value, compare_pos, body_label, positions, defs = guard
+                
+                if not cfg.dominates(body_label, label):
+                    reason = "access may run before the loop test"
+                elif instr.args != [sequence, index_value]:
+                    reason = "list or index differs from the loop test"
+                elif any(self.store_between(cfg, compare_pos, (label, index), positions[id(index_def)])
+                         for index_def in defs.get(index_value, [])):
+                    # A multiply-defined counter must not be bumped before the access
+                    reason = "index may change between the loop test and the access"
+                else:
+                    self.remarks.passed(function, label, "bounds check removed: index proven within 0 <= i < len", instr)
+                    instr.op = "getitem_unchecked"
+                    changed = True
+                    continue
+                    
+            # Accesses in nested loops are reported by their innermost loop
+            if innermost_loop(loops, label) is loop:
+                self.remarks.missed(function, label, f"bounds check kept: {reason}", instr)
+                
+        return changed
+        
+    def length_guard(self, function, cfg, loops, loop):
+        # A header test `i < len(xs)`, with i a counter that starts at a
+        # non-negative constant and only grows, puts xs[i] in bounds in every
+        # block that runs only after the test passed and before i changes.
+        header = cfg.blocks[loop.header]
+        term = terminator(header)
+        
+        if term is None or term.op != "branch":
+            return None, "loop header has no conditional test"
+            
+        cond, body_label, exit_label = term.args
+        negated = body_label not in loop.blocks
+        
+        if negated:
+            body_label, exit_label = exit_label, body_label
+            
+        if body_label not in loop.blocks or body_label == loop.header or cfg.preds[body_label] != [loop.header]:
+            return None, "loop body is entered other than through the loop test"
+            
+        def_counts = self.count_definitions(function)
+        positions = {}
+        for block in function.blocks:
+            for index, instr in enumerate(block.instructions):
+                positions[id(instr)] = (block.label, index)
+                
+        defs = {}
+        for block in function.blocks:
+            for instr in block.instructions:
+                if instr.result:
+                    defs.setdefault(instr.result, []).append(instr)
+                    
+        compare = next((instr for instr in header.instructions if instr.result == cond), None)
+        if compare is None or compare.op != "compare" or def_counts.get(cond) != 1:
+            return None, "loop test is not a comparison"
+            
+        op, left, right = compare.args
+        if negated:
+            op = NEGATED_COMPARE.get(op)
+            
+        if op == "<":
+            index_value, length = left, right
+        elif op == ">":
+            index_value, length = right, left
+        else:
+            return None, f"loop test '{op}' does not bound the index from above"
+            
+        length_defs = defs.get(length, []) if is_temp(length) else []
+        if len(length_defs) != 1 or length_defs[0].op != "len":
+            return None, "loop test does not compare against len"
+            
+        sequence = length_defs[0].args[0]
+        if is_temp(sequence) and def_counts.get(sequence) != 1:
+            return None, "list may change during the loop"
+            
+        temp_ivs = self.induction_variables(function, cfg, loops, loop)[0]
+        if not self.is_nonnegative_counter(index_value, temp_ivs, loop, positions, defs):
+            return None, "index is not a non-negative increasing counter"
+            
+        return (sequence, index_value, positions[id(compare)], body_label, positions, defs), None
+        
+    def is_nonnegative_counter(self, value, temp_ivs, loop, positions, defs):
+        if not is_temp(value):
+            constant = self.is_constant_value(value)
+            return type(constant) is int and constant >= 0
+            
+        if value not in temp_ivs or temp_ivs[value][1] <= 0:
+            return False
+            
+        for instr in defs[value]:
+            if positions[id(instr)][0] in loop.blocks:
+                continue
+                
+            start = self.is_constant_value(instr.args[0]) if instr.op == "const" else None
+            if type(start) is not int or start < 0:
+                return False
+                
+        return True
+        
+    def unroll_loops(self, program):
+        if self.params["unroll_budget"] <= 0:
+            return False
+            
+        changed = False
+        
+        for function in program.functions:
+            progress = True
+            
+            while progress:
+                progress = False
+                cfg = ControlFlowGraph(function)
+                loops = find_loops(cfg)
+                
+                for loop in loops:
+                    if (function.name, loop.header) in self.unrolled_loops:
+                        continue
+                        
+                    # Only innermost loops are unrolled, which keeps growth bounded
+                    if any(other is not loop and other.header in loop.blocks for other in loops):
+                        continue
+                        
+                    if self.unroll_loop(function, cfg, loops, loop):
+                        changed = progress = True
+                        break
+                        
+        return changed
+        
+    def unroll_loop(self, function, cfg, loops, loop):
+        header = cfg.blocks[loop.header]
+        counted = self.counted_loop(function, cfg, loops, loop)
+        if counted is None:
+            self.remarks.missed(function, header, "loop not unrolled: not a counted loop with a single exit test")
+            return False
+            
+        size = sum(len(cfg.blocks[label].instructions) for label in loop.blocks)
+        budget = self.params["unroll_budget"]
+        factor = self.params["unroll_factor"]
+        trips = self.constant_trip_count(function, cfg, loop, counted)
+        
+        count = "unknown" if trips is None else trips
+        self.remarks.analysis(function, header, f"counted loop of {size} instructions, trip count {count}")
+        
+        if trips is not None and trips <= self.params["full_unroll_limit"] and trips * size <= budget:
+            self.remarks.passed(function, header, f"loop fully unrolled ({trips} iterations)")
+            self.fully_unroll(function, cfg, loop, counted, trips)
+            return True
+            
+        if factor > 1 and size * (factor - 1) <= budget:
+            self.remarks.passed(function, header, f"loop unrolled by a factor of {factor} with a remainder loop")
+            self.partially_unroll(function, cfg, loop, counted, factor)
+            return True
+            
+        if factor > 1:
+            self.remarks.missed(function, header, f"loop not unrolled: {size} instructions exceed the unroll budget of {budget}")
+        else:
+            self.remarks.missed(function, header, "loop not unrolled: trip count unknown and partial unrolling disabled")
+        return False
+        
+    def counted_loop(self, function, cfg, loops, loop):
+        # Matches loops whose only exit is a header test `iv op bound`, with
+        # iv stepped by a constant exactly once per iteration and bound
+        # invariant in the loop.
+        header = cfg.blocks[loop.header]
+        term = terminator(header)
+        
+        if term is None or term.op != "branch" or term is not header.instructions[-1]:
+            return None
+            
+        cond, body_label, exit_label = term.args
+        negated = False
+        
+        if body_label not in loop.blocks:
+            # The loop continues while the test is false
+            body_label, exit_label = exit_label, body_label
+            negated = True
+            
+        if body_label not in loop.blocks or exit_label in loop.blocks:
+            return None
+            
+        for label in loop.blocks:
+            if label != loop.header and any(succ not in loop.blocks for succ in cfg.succs[label]):
+                return None
+                
+        compare = next((instr for instr in header.instructions if instr.result == cond), None)
+        def_counts = self.count_definitions(function)
+        
+        if compare is None or compare.op != "compare" or def_counts.get(cond) != 1:
+            return None
+            
+        temp_ivs, var_ivs, positions, defs = self.induction_variables(function, cfg, loops, loop)
+        op, left, right = compare.args
+        
+        if negated:
+            op = NEGATED_COMPARE.get(op)
+            
+        for value, bound, value_op in ((left, right, op), (right, left, SWAPPED_COMPARE.get(op))):
+            if value_op not in COMPARE_OPS:
+                continue
+                
+            if is_temp(bound) and bound in defs:
+                continue
+            if not is_temp(bound) and type(self.is_constant_value(bound)) is not int:
+                continue
+                
+            if value in temp_ivs:
+                kind, iv = "temp", value
+                update, step = temp_ivs[value]
+            else:
+                load = next((instr for instr in header.instructions if instr.result == value), None)
+                if load is None or load.op != "load" or load.args[0] not in var_ivs:
+                    continue
+                if any(instr.op == "store" for instr in header.instructions[:header.instructions.index(load)]):
+                    continue
+                kind, iv = "var", load.args[0]
+                update, step = var_ivs[iv]
+                
+            if (value_op in ("<", "<=")) != (step > 0):
+                continue
+                
+            update_label = positions[id(update)][0]
+            if not all(cfg.dominates(update_label, latch) for latch in loop.latches):
+                continue
+                
+            return {
+                "kind": kind, "iv": iv, "step": step, "op": value_op, "bound": bound,
+                "body": body_label, "exit": exit_label,
+            }
+            
+        return None
+        
+    def constant_trip_count(self, function, cfg, loop, counted):
+        bound = self.is_constant_value(counted["bound"])
+        if is_temp(counted["bound"]) or type(bound) is not int:
+            return None
+            
+        start = None
+        
+        if counted["kind"] == "temp":
+            outside = [instr for block in function.blocks if block.label not in loop.blocks
+                       for instr in block.instructions if instr.result == counted["iv"]]
+            if len(outside) == 1 and outside[0].op == "const":
+                start = outside[0].args[0]
+        else:
+            preheader = find_preheader(cfg, loop)
+            if preheader is not None:
+                for instr in reversed(preheader.instructions):
+                    if instr.op == "store" and instr.args[1] == counted["iv"]:
+                        start = self.is_constant_value(instr.args[0]) if not is_temp(instr.args[0]) else None
+                        break
+                        
+        if type(start) is not int:
+            return None
+            
+        test = COMPARE_OPS[counted["op"]]
+        trips = 0
+        
+        while test(start, bound):
+            trips += 1
+            start += counted["step"]
+            
+            if trips > self.params["full_unroll_limit"]:
+                return None
+                
+        return trips
+        
+    def clone_iteration(self, function, cfg, loop, counted, next_label):
+        # One copy of the loop body, entered through a copy of the header
+        # minus its exit test and looping back to next_label.
+        suffix = f"u{self.label_counter}"
+        self.label_counter += 1
+        def_counts = self.count_definitions(function)
+        
+        def rename_temp(value):
+            if is_temp(value) and def_counts.get(value) == 1 and value in loop_defs:
+                return f"{value}.{suffix}"
+            return value
+            
+        def rename_label(label):
+            if label == loop.header:
+                return next_label
+            if label in loop.blocks:
+                return f"{label}_{suffix}"
+            return label
+            
+        loop_defs = {instr.result for label in loop.blocks
+                     for instr in cfg.blocks[label].instructions if instr.result}
+        header = cfg.blocks[loop.header]
+        
+        entry = BasicBlock(f"{loop.header}_{suffix}")
+        entry.instructions = [clone_instruction(instr, rename_temp, rename_label)
+                              for instr in header.instructions[:-1]]
+        entry.instructions.append(IRInstruction("jump", [rename_label(counted["body"])]))
+        clones = [entry]
+        
+        for label in cfg.rpo:
+            if label in loop.blocks and label != loop.header:
+                clone = BasicBlock(rename_label(label))
+                clone.instructions = [clone_instruction(instr, rename_temp, rename_label)
+                                      for instr in cfg.blocks[label].instructions]
+                clones.append(clone)
+                
+        return clones
+        
+    def fully_unroll(self, function, cfg, loop, counted, trips):
+        header = cfg.blocks[loop.header]
+        preheader = ensure_preheader(function, cfg, loop)
+        
+        # The last copy of the header keeps the original temps, which code
+        # after the loop may use
+        final = BasicBlock(f"{loop.header}_final")
+        final.instructions = header.instructions[:-1] + [IRInstruction("jump", [counted["exit"]])]
+        
+        blocks = [final]
+        for _ in range(trips):
+            blocks = self.clone_iteration(function, cfg, loop, counted, blocks[0].label) + blocks
+            
+        retarget(preheader, loop.header, blocks[0].label)
+        function.blocks[function.blocks.index(header):function.blocks.index(header)] = blocks
+        
+    def partially_unroll(self, function, cfg, loop, counted, factor):
+        header = cfg.blocks[loop.header]
+        preheader = ensure_preheader(function, cfg, loop)
+        guard = BasicBlock(f"{loop.header}_unrolled")
+        
+        blocks = []
+        next_label = guard.label
+        for _ in range(factor):
+            blocks = self.clone_iteration(function, cfg, loop, counted, next_label) + blocks
+            next_label = blocks[0].label
+            
+        # Run the unrolled body only while all of its iterations would; the
+        # original loop is left in place to handle the remainder
+        if counted["kind"] == "temp":
+            value = counted["iv"]
+        else:
+            value = self.new_temp()
+            guard.instructions.append(IRInstruction("load", [counted["iv"]], value))
+            
+        last, test = self.new_temp(), self.new_temp()
+        guard.instructions.extend([
+            IRInstruction("binop", ["+", value, (factor - 1) * counted["step"]], last),
+            IRInstruction("compare", [counted["op"], last, counted["bound"]], test),
+            IRInstruction("branch", [test, blocks[0].label, loop.header]),
+        ])
+        
+        retarget(preheader, loop.header, guard.label)
+        function.blocks[function.blocks.index(header):function.blocks.index(header)] = [guard] + blocks
+        self.unrolled_loops.update({(function.name, loop.header), (function.name, guard.label)})
+        
+    def allocate_lists_on_stack(self, program):
+        changed = False
+        
+        for function in program.functions:
+            allocations = [(block, instr) for block in function.blocks
+                           for instr in block.instructions if instr.op == "newlist"]
+            if not allocations:
+                continue
+                
+            cfg = ControlFlowGraph(function)
+            in_loop = set().union(*(loop.blocks for loop in find_loops(cfg)))
+            escapes = EscapeAnalysis(function, program.global_vars)
+            
+            for block, instr in allocations:
+                reason = escapes.escape_reason(instr.result)
+                
+                # A stack slot is reused by every execution of its allocation,
+                # so lists built inside a loop could overwrite live ones
+                if reason is None and block.label in in_loop:
+                    reason = "allocated inside a loop"
+                if reason is None and instr.args[0] > STACK_LIST_LIMIT:
+                    reason = f"{instr.args[0]} items exceed the limit of {STACK_LIST_LIMIT}"
+                    
+                if reason is not None:
+                    self.remarks.missed(function, block, f"list kept on the heap: {reason}", instr)
+                    continue
+                    
+                items = "item" if instr.args[0] == 1 else "items"
+                self.remarks.passed(function, block, f"list of {instr.args[0]} {items} allocated on the stack", instr)
+                instr.op = "newlist_stack"
+                changed = True
+                
+        return changed
+        
+    def induction_variables(self, function, cfg, loops, loop):
+        # Basic induction variables of a loop, each mapped to the instruction
+        # that updates it and its constant step.
+        def_counts = self.count_definitions(function)
+        local_vars = set(function.local_vars) | set(function.params)
+        loop_labels = [label for label in cfg.rpo if label in loop.blocks]
+        
+        positions = {}
+        for label in loop_labels:
+            for index, instr in enumerate(cfg.blocks[label].instructions):
+                positions[id(instr)] = (label, index)
+                
+        loop_instrs = [instr for label in loop_labels for instr in cfg.blocks[label].instructions]
+        defs = {}
+        for instr in loop_instrs:
+            if instr.result:
+                defs.setdefault(instr.result, []).append(instr)
+                
+        stores = {}
+        for instr in loop_instrs:
+            if instr.op == "store":
+                stores.setdefault(instr.args[1], []).append(instr)
+                
+        def step_of(instr, operand):
+            if instr.op != "binop" or instr.args[0] not in ("+", "-"):
+                return None
+                
+            op, left, right = instr.args
+            
+            if left == operand:
+                step = self.is_constant_value(right)
+            elif op == "+" and right == operand:
+                step = self.is_constant_value(left)
+            else:
+                return None
+                
+            if type(step) is not int:
+                return None
+                
+            return step if op == "+" else -step
+            
+        # Temp induction variables: one in-loop definition `t = t +/- c`
+        temp_ivs = {}
+        for temp, temp_defs in defs.items():
+            if len(temp_defs) == 1 and def_counts.get(temp, 0) >= 2:
+                step = step_of(temp_defs[0], temp)
+                if step is not None:
+                    temp_ivs[temp] = (temp_defs[0], step)
+                    
+        # Variable induction variables: a single `v = load(v) +/- c` per iteration
+        var_ivs = {}
+        for var, var_stores in stores.items():
+            if len(var_stores) != 1 or var not in local_vars:
+                continue
+                
+            store = var_stores[0]
+            store_label, store_index = positions[id(store)]
+            value = store.args[0]
+            
+            if innermost_loop(loops, store_label) is not loop or not is_temp(value) or len(defs.get(value, [])) != 1:
+                continue
+                
+            value_def = defs[value][0]
+            for operand in value_def.args[1:]:
+                load_defs = defs.get(operand, [])
+                
+                if (len(load_defs) == 1 and def_counts.get(operand) == 1
+                        and load_defs[0].op == "load" and load_defs[0].args[0] == var
+                        and self.precedes(cfg, positions[id(load_defs[0])], (store_label, store_index))):
+                    step = step_of(value_def, operand)
+                    if step is not None:
+                        var_ivs[var] = (store, step)
+                    break
+                    
+        return temp_ivs, var_ivs, positions, defs
+        
+    def precedes(self, cfg, first, second):
+        first_label, first_index = first
+        second_label, second_index = second
+        
+        if first_label == second_label:
+            return first_index < second_index
+            
+        return cfg.dominates(first_label, second_label)
+        
+    def store_between(self, cfg, first, second, store):
+        first_label, first_index = first
+        second_label, second_index = second
+        store_label, store_index = store
+        
+        if first_label == second_label:
+            return first_index < store_index < second_index and store_label == first_label
+            
+        if store_label == first_label and store_index > first_index:
+            return True
+        if store_label == second_label and store_index < second_index:
+            return True
+            
+        return store_label in cfg.blocks_between(first_label, second_label)
+        
+    def new_temp(self):
+        name = f"%o{self.temp_counter}"
+        self.temp_counter += 1
+        return name
+        
+    def value_key(self, instr):
+        operands = [(type(arg).__name__, arg) for arg in instr.args]
+        
+        if instr.op in ("binop", "compare"):
+            op = instr.args[0]
+            operands = operands[1:]
+            
+            if op in COMMUTATIVE_OPS:
+                operands.sort(key=repr)
+                
+            return (instr.op, op, tuple(operands))
+            
+        return (instr.op, tuple(operands))
+        
+    def count_definitions(self, function):
+        def_counts = {}
+        
+        for block in function.blocks:
+            for instr in block.instructions:
+                if instr.result:
+                    def_counts[instr.result] = def_counts.get(instr.result, 0) + 1
+                    
+        return def_counts
+        
     def is_constant_value(self, value):
         if isinstance(value, (int, float, bool)):
             return value
@@ -3,7 +3,8 @@ from typing import List as ListType, Dict as DictType, Any, Optional, Union
 from .lexer import TokenType, Token
 
 class ASTNode:
-    pass
+    # Source line of the statement a node starts, set by the parser
+    line = None
 
 @dataclass
 class Program(ASTNode):
@@ -131,6 +132,15 @@ class Parser:
             self.advance()  # Skip newlines
             return None
             
+        line = self.peek().line
+        stmt = self.parse_statement_kind()
+        
+        if stmt is not None:
+            stmt.line = line
+            
+        return stmt
+        
+    def parse_statement_kind(self):
         # Parse statements
         if self.check(TokenType.KEYWORD, "def"):
             return self.parse_function_def()
@@ -411,6 +421,8 @@ class Parser:
             expr = self.parse_expression()
             self.consume(TokenType.PUNCTUATION, "Expected ')'")
             return expr
+        elif self.check(TokenType.PUNCTUATION, "["):
+            return self.parse_list()
         else:
             token = self.peek()
             # More informative error message
@@ -429,6 +441,22 @@ class Parser:
         self.consume(TokenType.PUNCTUATION, "Expected ')'")
         return Call(Name(name), args)
     
+    def parse_list(self):
+        self.advance()
+        elts = []
+        
+        while not self.check(TokenType.PUNCTUATION, "]"):
+            elts.append(self.parse_expression())
+            
+            if not self.match(TokenType.PUNCTUATION, ","):
+                break
+                
+        if not self.match(TokenType.PUNCTUATION, "]"):
+            token = self.peek()
+            raise SyntaxError(f"Expected ']' at line {token.line}, column {token.column}, got {token.type} '{token.value}'")
+            
+        return List(elts)
+    
     def consume(self, type, message):
         if self.check(type):
             return self.advance()
@@ -0,0 +1,184 @@
+import re
+
+from .asm import Instruction, Label
+
+GENERAL_REGISTER = re.compile(r"r(ax|bx|cx|dx|si|di|bp|sp|8|9|1[0-5])$")
+FLOAT_REGISTER = re.compile(r"xmm\d+$")
+
+# Register moves that copy what the store-load rule forwards
+MOVES = {"mov": "mov", "movsd": "movapd"}
+
+# Instructions whose flags the code generator may test afterwards
+FLAG_SETTERS = {"cmp", "test", "add", "sub", "and", "or", "xor", "neg", "ucomisd"}
+
+# Rules in the order they are tried, by name and method
+RULES = [
+    ("store-load", "forward_store"),
+    ("self-move", "drop_self_move"),
+    ("zero-idiom", "zero_with_xor"),
+    ("increment", "use_inc_dec"),
+    ("jump-thread", "thread_jump"),
+    ("jump-to-next", "drop_jump_to_next"),
+]
+
+def register_32(register):
+    return f"{register}d" if register[1].isdigit() else f"e{register[1:]}"
+
+def reads_flags(opcode):
+    return (opcode.startswith(("set", "cmov")) or opcode in ("adc", "sbb")
+            or opcode.startswith("j") and opcode != "jmp")
+
+class PeepholeOptimizer:
+    """Rewrites short windows of a function's instructions after code
+    generation, counting how often each rule fires.
+
+    The rules only look at straight-line neighbours and at jump targets.
+    They rely on the code generator never leaving flags live across a
+    label, a jump or a call.
+    """
+
+    def __init__(self):
+        self.counts = {name: 0 for name, _ in RULES}
+        self.labels = {}
+
+    def optimize(self, code):
+        code = list(code)
+        rules = [(name, getattr(self, method)) for name, method in RULES]
+        changed = True
+
+        while changed:
+            changed = False
+
+            for name, rule in rules:
+                self.index_labels(code)
+                i = 0
+
+                while i < len(code):
+                    rewrite = rule(code, i) if isinstance(code[i], Instruction) else None
+                    if rewrite is None:
+                        i += 1
+                        continue
+
+                    count, replacement = rewrite
+                    code[i:i + count] = replacement
+                    self.counts[name] += 1
+                    changed = True
+
+                    if count != len(replacement):
+                        self.index_labels(code)
+
+        return code
+
+    def index_labels(self, code):
+        self.labels = {record.name: i for i, record in enumerate(code) if isinstance(record, Label)}
+
+    def format_counts(self):
+        lines = ["=== Peephole rules ==="]
+
+        for name, count in self.counts.items():
+            lines.append(f"  {name:<24} {count:>8}")
+
+        lines.append(f"  {'total':<24} {sum(self.counts.values()):>8}")
+        return "\n".join(lines)
+
+    def next_instruction(self, code, start):
+        for record in code[start:]:
+            if isinstance(record, Instruction):
+                return record
+        return None
+
+    def flags_dead(self, code, start):
+        for record in code[start:]:
+            if isinstance(record, Label):
+                return True
+            if not isinstance(record, Instruction):
+                continue
+            if reads_flags(record.opcode):
+                return False
+            if record.opcode in FLAG_SETTERS or record.opcode in ("jmp", "ret", "call"):
+                return True
+        return True
+
+    def forward_store(self, code, i):
+        # mov [m], r; mov r2, [m] reads back the register just stored
+        store = code[i]
+        load = code[i + 1] if i + 1 < len(code) else None
+
+        if store.opcode not in MOVES or not isinstance(load, Instruction) or load.opcode != store.opcode:
+            return None
+        if len(store.operands) != 2 or len(load.operands) != 2:
+            return None
+
+        memory, register = store.operands
+        if "[" not in memory or load.operands[1] != memory:
+            return None
+        if not (GENERAL_REGISTER.match(register) or FLOAT_REGISTER.match(register)):
+            return None
+
+        if load.operands[0] == register:
+            return 2, [store]
+        return 2, [store, Instruction(MOVES[store.opcode], [load.operands[0], register], load.indent)]
+
+    def drop_self_move(self, code, i):
+        # A 32-bit self-move clears the upper half, so only 64-bit ones go
+        line = code[i]
+        if line.opcode == "mov" and len(line.operands) == 2 and line.operands[0] == line.operands[1] \
+                and GENERAL_REGISTER.match(line.operands[0]):
+            return 1, []
+        return None
+
+    def zero_with_xor(self, code, i):
+        line = code[i]
+        if line.opcode != "mov" or line.operands[1:] != ["0"] or not GENERAL_REGISTER.match(line.operands[0]):
+            return None
+        if not self.flags_dead(code, i + 1):
+            return None
+
+        # Writing the 32-bit register clears the upper half, and encodes shorter
+        register = register_32(line.operands[0])
+        return 1, [Instruction("xor", [register, register], line.indent)]
+
+    def use_inc_dec(self, code, i):
+        line = code[i]
+        if line.opcode not in ("add", "sub") or len(line.operands) != 2 or line.operands[1] not in ("1", "-1"):
+            return None
+
+        # inc and dec leave the carry flag alone
+        if not self.flags_dead(code, i + 1):
+            return None
+
+        opcode = "inc" if (line.opcode == "add") == (line.operands[1] == "1") else "dec"
+        return 1, [Instruction(opcode, line.operands[:1], line.indent)]
+
+    def thread_jump(self, code, i):
+        # A jump to a jmp goes straight to where that one leads
+        line = code[i]
+        if not line.opcode.startswith("j") or len(line.operands) != 1:
+            return None
+
+        target = line.operands[0]
+        seen = {target}
+
+        while target in self.labels:
+            following = self.next_instruction(code, self.labels[target] + 1)
+            if following is None or following.opcode != "jmp" or following.operands[0] in seen:
+                break
+
+            target = following.operands[0]
+            seen.add(target)
+
+        if target == line.operands[0]:
+            return None
+        return 1, [Instruction(line.opcode, [target], line.indent)]
+
+    def drop_jump_to_next(self, code, i):
+        line = code[i]
+        if line.opcode != "jmp":
+            return None
+
+        for following in code[i + 1:]:
+            if isinstance(following, Instruction):
+                return None
+            if isinstance(following, Label) and following.name == line.operands[0]:
+                return 1, []
+        return None
@@ -0,0 +1,521 @@
+from bisect import bisect_right
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+from .cfg import ControlFlowGraph
+from .loops import loop_depths
+
+# Registers the code generator never uses as scratch; rax, rcx and rdx hold
+# operands and rdi, rsi, r8 and r9 carry call arguments
+CALLER_SAVED = ["r10", "r11"]
+CALLEE_SAVED = ["rbx", "r12", "r13", "r14", "r15"]
+
+# A use inside a loop counts this many times more per level of nesting
+LOOP_WEIGHT = 10
+
+@dataclass
+class LiveInterval:
+    name: str
+    start: int
+    end: int
+    weight: float = 0.0
+    crosses_call: bool = False
+    register: Optional[str] = None
+
+@dataclass
+class Allocation:
+    registers: Dict[str, str] = field(default_factory=dict)
+    spilled: List[str] = field(default_factory=list)
+    callee_saved: List[str] = field(default_factory=list)
+
+def instruction_uses(instr):
+    if instr.op in ("binop", "unop", "compare"):
+        # The first argument is the operator
+        return [arg for arg in instr.args[1:] if isinstance(arg, str)]
+    if instr.op in ("jump", "newlist", "newlist_stack"):
+        return []
+    if instr.op == "branch":
+        return [instr.args[0]] if isinstance(instr.args[0], str) else []
+    if instr.op == "call":
+        return [arg for arg in instr.args[1:] if isinstance(arg, str)]
+    if instr.op == "store":
+        return [instr.args[0]] if isinstance(instr.args[0], str) else []
+    if instr.op == "const":
+        return []
+
+    return [arg for arg in instr.args if isinstance(arg, str)]
+
+def instruction_defs(instr):
+    if instr.op == "store":
+        return [instr.args[1]]
+    return [instr.result] if instr.result else []
+
+def liveness(function, names):
+    """Names live on entry to and on exit from each block."""
+    cfg = ControlFlowGraph(function)
+    gen = {}
+    kill = {}
+    for block in function.blocks:
+        gen[block.label] = set()
+        kill[block.label] = set()
+
+        for instr in block.instructions:
+            gen[block.label].update(name for name in instruction_uses(instr)
+                                    if name in names and name not in kill[block.label])
+            kill[block.label].update(name for name in instruction_defs(instr) if name in names)
+
+    live_in = {block.label: set() for block in function.blocks}
+    live_out = {block.label: set() for block in function.blocks}
+    changed = True
+
+    while changed:
+        changed = False
+
+        for block in reversed(function.blocks):
+            out = set().union(*(live_in[succ] for succ in cfg.succs[block.label]))
+            new_in = gen[block.label] | (out - kill[block.label])
+
+            if out != live_out[block.label] or new_in != live_in[block.label]:
+                live_out[block.label] = out
+                live_in[block.label] = new_in
+                changed = True
+
+    return live_in, live_out
+
+def live_parameters(function):
+    """Parameters whose incoming value may be read; the others need no home."""
+    live_in, _ = liveness(function, set(function.params))
+    return [param for param in function.params if param in live_in[function.entry_block.label]]
+
+def live_intervals(function, names, calling_ops):
+    """One interval per name, spanning every position where it may be live.
+
+    Instructions are numbered from 1 in layout order; parameters whose
+    incoming value may be read are defined at position 0, before the first
+    instruction.
+    """
+    live_in, live_out = liveness(function, names)
+    depths = loop_depths(function)
+    intervals = {}
+
+    def touch(name, position, weight=0.0):
+        interval = intervals.get(name)
+        if interval is None:
+            intervals[name] = LiveInterval(name, position, position, weight)
+        else:
+            interval.start = min(interval.start, position)
+            interval.end = max(interval.end, position)
+            interval.weight += weight
+
+    for param in function.params:
+        if param in live_in[function.entry_block.label]:
+            touch(param, 0, 1.0)
+
+    calls = []
+    position = 0
+
+    for block in function.blocks:
+        start = position + 1
+        weight = float(LOOP_WEIGHT ** depths.get(block.label, 0))
+
+        for name in live_in[block.label]:
+            touch(name, start)
+
+        for instr in block.instructions:
+            position += 1
+
+            if instr.op in calling_ops:
+                calls.append(position)
+
+            for name in instruction_uses(instr) + instruction_defs(instr):
+                if name in names:
+                    touch(name, position, weight)
+
+        for name in live_out[block.label]:
+            touch(name, position)
+
+    for interval in intervals.values():
+        # A call clobbers the caller-saved registers of anything live across it
+        first_call = bisect_right(calls, interval.start)
+        interval.crosses_call = first_call < len(calls) and calls[first_call] < interval.end
+
+    return intervals
+
+class LinearScanAllocator:
+    """Poletto and Sarkar's linear scan over live intervals, spilling by weight."""
+
+    def __init__(self, calling_ops, caller_saved=CALLER_SAVED, callee_saved=CALLEE_SAVED):
+        self.calling_ops = calling_ops
+        self.caller_saved = list(caller_saved)
+        self.callee_saved = list(callee_saved)
+
+    def allocate(self, function, names):
+        intervals = sorted(live_intervals(function, set(names), self.calling_ops).values(),
+                           key=lambda interval: (interval.start, interval.end))
+        free = self.caller_saved + self.callee_saved
+        active = []
+        allocation = Allocation()
+
+        for current in intervals:
+            for interval in list(active):
+                if interval.end < current.start:
+                    active.remove(interval)
+                    free.append(interval.register)
+
+            # Values live across a call must survive it; the others prefer
+            # caller-saved registers, which cost nothing to use
+            allowed = self.callee_saved if current.crosses_call else self.caller_saved + self.callee_saved
+            register = next((register for register in allowed if register in free), None)
+
+            if register is None:
+                candidates = [interval for interval in active if interval.register in allowed]
+                victim = min(candidates, key=lambda interval: interval.weight, default=None)
+
+                if victim is None or victim.weight >= current.weight:
+                    allocation.spilled.append(current.name)
+                    continue
+
+                active.remove(victim)
+                allocation.spilled.append(victim.name)
+                register = victim.register
+                victim.register = None
+            else:
+                free.remove(register)
+
+            current.register = register
+            active.append(current)
+
+        for interval in intervals:
+            if interval.register is not None:
+                allocation.registers[interval.name] = interval.register
+
+        allocation.callee_saved = [register for register in self.callee_saved
+                                   if register in allocation.registers.values()]
+        return allocation
+
+# Functions larger than this, in IR instructions, are allocated with linear
+# scan; building the interference graph grows quadratically
+GRAPH_COLORING_LIMIT = 2000
+
+# IR operations that only move a value from one name to another
+MOVE_OPS = {"copy", "load", "store"}
+
+class GraphColoringAllocator:
+    """Iterated register coalescing (George and Appel) over an interference graph.
+
+    Caller-saved registers are precolored nodes that interfere with every
+    value live across a call. Moves whose ends do not interfere are
+    coalesced when the Briggs or George test shows it cannot cause a spill,
+    and spill candidates are picked by use count weighted by loop depth,
+    divided by degree.
+    """
+
+    def __init__(self, calling_ops, caller_saved=CALLER_SAVED, callee_saved=CALLEE_SAVED,
+                 max_instructions=GRAPH_COLORING_LIMIT):
+        self.calling_ops = calling_ops
+        self.caller_saved = list(caller_saved)
+        self.callee_saved = list(callee_saved)
+        self.max_instructions = max_instructions
+
+    def allocate(self, function, names):
+        size = sum(len(block.instructions) for block in function.blocks)
+
+        if size > self.max_instructions:
+            fallback = LinearScanAllocator(self.calling_ops, self.caller_saved, self.callee_saved)
+            return fallback.allocate(function, names)
+
+        coloring = IteratedCoalescing(self.caller_saved + self.callee_saved, self.caller_saved)
+        coloring.build(function, set(names), self.calling_ops)
+        coloring.run()
+
+        allocation = Allocation()
+        for name in coloring.initial:
+            register = coloring.color.get(name)
+            if register is None:
+                allocation.spilled.append(name)
+            else:
+                allocation.registers[name] = register
+
+        allocation.callee_saved = [register for register in self.callee_saved
+                                   if register in allocation.registers.values()]
+        return allocation
+
+# Precolored nodes are named so they cannot clash with a variable
+PRECOLORED_PREFIX = "$"
+
+class IteratedCoalescing:
+    def __init__(self, registers, clobbered):
+        self.registers = registers
+        self.clobbered = [PRECOLORED_PREFIX + register for register in clobbered]
+        self.K = len(registers)
+        self.precolored = {PRECOLORED_PREFIX + register for register in registers}
+
+        self.initial = []
+        self.order = {}
+        self.adj_set = set()
+        self.adj_list = {}
+        self.degree = {node: float("inf") for node in self.precolored}
+        self.cost = {}
+        self.move_list = {}
+        self.alias = {}
+        self.color = {PRECOLORED_PREFIX + register: register for register in registers}
+
+        self.simplify_worklist = set()
+        self.freeze_worklist = set()
+        self.spill_worklist = set()
+        self.spilled_nodes = set()
+        self.coalesced_nodes = set()
+        self.colored_nodes = set()
+        self.select_stack = []
+        self.selected = set()
+
+        self.worklist_moves = set()
+        self.active_moves = set()
+        self.coalesced_moves = set()
+        self.constrained_moves = set()
+        self.frozen_moves = set()
+        self.moves = []
+
+    def add_node(self, name):
+        if name not in self.adj_list:
+            self.adj_list[name] = set()
+            self.degree[name] = 0
+            self.cost[name] = 0.0
+            self.move_list[name] = set()
+            self.order[name] = len(self.initial)
+            self.initial.append(name)
+
+    def add_edge(self, u, v):
+        if u == v or (u, v) in self.adj_set:
+            return
+
+        self.adj_set.add((u, v))
+        self.adj_set.add((v, u))
+
+        if u not in self.precolored:
+            self.adj_list[u].add(v)
+            self.degree[u] += 1
+        if v not in self.precolored:
+            self.adj_list[v].add(u)
+            self.degree[v] += 1
+
+    def build(self, function, names, calling_ops):
+        live_in, live_out = liveness(function, names)
+        depths = loop_depths(function)
+
+        for param in function.params:
+            if param in live_in[function.entry_block.label]:
+                self.add_node(param)
+                self.cost[param] += 1.0
+
+        for block in function.blocks:
+            weight = float(LOOP_WEIGHT ** depths.get(block.label, 0))
+            live = set(live_out[block.label])
+
+            for name in live:
+                self.add_node(name)
+
+            for instr in reversed(block.instructions):
+                uses = [name for name in instruction_uses(instr) if name in names]
+                defs = [name for name in instruction_defs(instr) if name in names]
+
+                for name in uses + defs:
+                    self.add_node(name)
+                    self.cost[name] += weight
+
+                if instr.op in MOVE_OPS and uses and defs:
+                    # The source and destination of a move may share a register
+                    live -= set(uses)
+                    move = len(self.moves)
+                    self.moves.append((defs[0], uses[0]))
+                    self.move_list[defs[0]].add(move)
+                    self.move_list[uses[0]].add(move)
+                    self.worklist_moves.add(move)
+
+                if instr.op in calling_ops:
+                    for name in live - set(defs):
+                        for register in self.clobbered:
+                            self.add_edge(name, register)
+
+                live |= set(defs)
+                for name in defs:
+                    for other in live:
+                        self.add_edge(other, name)
+
+                live = set(uses) | (live - set(defs))
+
+        # Parameters are all defined together on entry; live_in holds the
+        # ones whose incoming value is read
+        entry = set(live_in[function.entry_block.label])
+        for name in entry:
+            self.add_node(name)
+            for other in entry:
+                self.add_edge(name, other)
+
+    def run(self):
+        for name in self.initial:
+            if self.degree[name] >= self.K:
+                self.spill_worklist.add(name)
+            elif self.move_related(name):
+                self.freeze_worklist.add(name)
+            else:
+                self.simplify_worklist.add(name)
+
+        while True:
+            if self.simplify_worklist:
+                self.simplify()
+            elif self.worklist_moves:
+                self.coalesce()
+            elif self.freeze_worklist:
+                self.freeze()
+            elif self.spill_worklist:
+                self.select_spill()
+            else:
+                break
+
+        self.assign_colors()
+
+    def adjacent(self, name):
+        return {other for other in self.adj_list[name]
+                if other not in self.coalesced_nodes and other not in self.selected}
+
+    def node_moves(self, name):
+        return {move for move in self.move_list[name]
+                if move in self.active_moves or move in self.worklist_moves}
+
+    def move_related(self, name):
+        return bool(self.node_moves(name))
+
+    def simplify(self):
+        name = min(self.simplify_worklist, key=self.order.get)
+        self.simplify_worklist.remove(name)
+        self.select_stack.append(name)
+        self.selected.add(name)
+
+        for other in self.adjacent(name):
+            self.decrement_degree(other)
+
+    def decrement_degree(self, name):
+        degree = self.degree[name]
+        self.degree[name] = degree - 1
+
+        if degree == self.K:
+            self.enable_moves({name} | self.adjacent(name))
+            self.spill_worklist.discard(name)
+
+            if self.move_related(name):
+                self.freeze_worklist.add(name)
+            else:
+                self.simplify_worklist.add(name)
+
+    def enable_moves(self, names):
+        for name in names:
+            if name in self.precolored:
+                continue
+
+            for move in self.node_moves(name):
+                if move in self.active_moves:
+                    self.active_moves.remove(move)
+                    self.worklist_moves.add(move)
+
+    def add_worklist(self, name):
+        if name not in self.precolored and not self.move_related(name) and self.degree[name] < self.K:
+            self.freeze_worklist.discard(name)
+            self.simplify_worklist.add(name)
+
+    def ok(self, t, r):
+        return self.degree[t] < self.K or t in self.precolored or (t, r) in self.adj_set
+
+    def conservative(self, names):
+        return sum(1 for name in names if self.degree[name] >= self.K) < self.K
+
+    def get_alias(self, name):
+        while name in self.coalesced_nodes:
+            name = self.alias[name]
+        return name
+
+    def coalesce(self):
+        move = min(self.worklist_moves)
+        self.worklist_moves.remove(move)
+
+        x, y = (self.get_alias(name) for name in self.moves[move])
+        u, v = (y, x) if y in self.precolored else (x, y)
+
+        if u == v:
+            self.coalesced_moves.add(move)
+            self.add_worklist(u)
+        elif v in self.precolored or (u, v) in self.adj_set:
+            self.constrained_moves.add(move)
+            self.add_worklist(u)
+            self.add_worklist(v)
+        elif (u in self.precolored and all(self.ok(t, u) for t in self.adjacent(v))) or \
+                (u not in self.precolored and self.conservative(self.adjacent(u) | self.adjacent(v))):
+            self.coalesced_moves.add(move)
+            self.combine(u, v)
+            self.add_worklist(u)
+        else:
+            self.active_moves.add(move)
+
+    def combine(self, u, v):
+        if v in self.freeze_worklist:
+            self.freeze_worklist.remove(v)
+        else:
+            self.spill_worklist.discard(v)
+
+        self.coalesced_nodes.add(v)
+        self.alias[v] = u
+        self.move_list[u] |= self.move_list[v]
+        self.cost[u] += self.cost[v]
+        self.enable_moves({v})
+
+        for t in self.adjacent(v):
+            self.add_edge(t, u)
+            self.decrement_degree(t)
+
+        if self.degree[u] >= self.K and u in self.freeze_worklist:
+            self.freeze_worklist.remove(u)
+            self.spill_worklist.add(u)
+
+    def freeze(self):
+        name = min(self.freeze_worklist, key=self.order.get)
+        self.freeze_worklist.remove(name)
+        self.simplify_worklist.add(name)
+        self.freeze_moves(name)
+
+    def freeze_moves(self, u):
+        for move in self.node_moves(u):
+            x, y = self.moves[move]
+            v = self.get_alias(y) if self.get_alias(y) != self.get_alias(u) else self.get_alias(x)
+
+            self.active_moves.discard(move)
+            self.worklist_moves.discard(move)
+            self.frozen_moves.add(move)
+
+            if v not in self.precolored and not self.node_moves(v) and self.degree[v] < self.K:
+                self.freeze_worklist.discard(v)
+                self.simplify_worklist.add(v)
+
+    def select_spill(self):
+        # Cheapest to keep in memory: few uses, shallow loops, many neighbours
+        name = min(self.spill_worklist, key=lambda name: (self.cost[name] / max(self.degree[name], 1), self.order[name]))
+        self.spill_worklist.remove(name)
+        self.simplify_worklist.add(name)
+        self.freeze_moves(name)
+
+    def assign_colors(self):
+        while self.select_stack:
+            name = self.select_stack.pop()
+            self.selected.discard(name)
+            taken = {self.color[self.get_alias(other)] for other in self.adj_list[name]
+                     if self.get_alias(other) in self.colored_nodes or self.get_alias(other) in self.precolored}
+
+            register = next((register for register in self.registers if register not in taken), None)
+            if register is None:
+                self.spilled_nodes.add(name)
+            else:
+                self.colored_nodes.add(name)
+                self.color[name] = register
+
+        for name in self.coalesced_nodes:
+            alias = self.get_alias(name)
+            if alias in self.color:
+                self.color[name] = self.color[alias]
@@ -0,0 +1,99 @@
+import json
+from dataclasses import dataclass, asdict
+from typing import List, Optional
+
+REMARK_KINDS = ("passed", "missed", "analysis")
+
+# YAML document tags, as in LLVM's -fsave-optimization-record output
+YAML_TAGS = {"passed": "!Passed", "missed": "!Missed", "analysis": "!Analysis"}
+
+@dataclass
+class Remark:
+    kind: str
+    pass_name: str
+    function: str
+    block: Optional[str]
+    line: Optional[int]
+    message: str
+
+def source_line(block, instr=None):
+    if instr is not None and instr.line is not None:
+        return instr.line
+
+    if block is not None:
+        for other in block.instructions:
+            if other.line is not None:
+                return other.line
+
+    return None
+
+class RemarkEmitter:
+    """Collects optimization remarks: transformations applied, missed, and why."""
+
+    def __init__(self):
+        self.remarks: List[Remark] = []
+        self.seen = set()
+        self.current_pass = None
+
+    def clear(self):
+        self.remarks = []
+        self.seen = set()
+        self.current_pass = None
+
+    def emit(self, kind, function, block, message, instr=None):
+        remark = Remark(
+            kind,
+            self.current_pass or "",
+            getattr(function, "name", function),
+            getattr(block, "label", block),
+            source_line(block if hasattr(block, "instructions") else None, instr),
+            message,
+        )
+
+        # Passes rerun until a fixpoint, and blocks get merged and renamed on
+        # the way; a decision is only reported once
+        key = (remark.kind, remark.pass_name, remark.function, remark.line, remark.message)
+        if key not in self.seen:
+            self.seen.add(key)
+            self.remarks.append(remark)
+
+        return remark
+
+    def passed(self, function, block, message, instr=None):
+        return self.emit("passed", function, block, message, instr)
+
+    def missed(self, function, block, message, instr=None):
+        return self.emit("missed", function, block, message, instr)
+
+    def analysis(self, function, block, message, instr=None):
+        return self.emit("analysis", function, block, message, instr)
+
+    def select(self, kinds=None, pass_name=None):
+        return [remark for remark in self.remarks
+                if (kinds is None or remark.kind in kinds)
+                and (pass_name is None or remark.pass_name == pass_name)]
+
+    def to_list(self, kinds=None):
+        return [asdict(remark) for remark in self.select(kinds)]
+
+    def to_json(self, kinds=None):
+        return json.dumps(self.to_list(kinds), indent=2)
+
+    def to_yaml(self, kinds=None):
+        lines = []
+
+        for remark in self.select(kinds):
+            lines.append(f"--- {YAML_TAGS[remark.kind]}")
+            lines.append(f"Pass: {json.dumps(remark.pass_name)}")
+            lines.append(f"Function: {json.dumps(remark.function)}")
+
+            if remark.block is not None:
+                lines.append(f"Block: {json.dumps(remark.block)}")
+            if remark.line is not None:
+                lines.append(f"Line: {remark.line}")
+
+            # JSON strings are valid YAML double-quoted scalars
+            lines.append(f"Message: {json.dumps(remark.message)}")
+            lines.append("...")
+
+        return "\n".join(lines) + "\n" if lines else ""
@@ -0,0 +1,51 @@
+import io
+
+class AssemblySink:
+    """Where the code generator puts finished assembly, a function at a time.
+
+    Chunks of lines are joined by newlines as if the whole program were one
+    list of lines, so the text does not depend on how it was split.
+    """
+
+    def __init__(self):
+        self.started = False
+
+    def write_lines(self, lines):
+        if not lines:
+            return
+
+        text = "\n".join(lines)
+        self.write(f"\n{text}" if self.started else text)
+        self.started = True
+
+    def write(self, text):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+class StringSink(AssemblySink):
+    """Collects the assembly in memory."""
+
+    def __init__(self):
+        super().__init__()
+        self.buffer = io.StringIO()
+
+    def write(self, text):
+        self.buffer.write(text)
+
+    def getvalue(self):
+        return self.buffer.getvalue()
+
+class StreamSink(AssemblySink):
+    """Writes the assembly to an open text stream as it is generated."""
+
+    def __init__(self, stream):
+        super().__init__()
+        self.stream = stream
+
+    def write(self, text):
+        self.stream.write(text)
+
+    def close(self):
+        self.stream.flush()
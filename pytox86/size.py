@@ -0,0 +1,92 @@
+import os
+import struct
+import subprocess
+import tempfile
+
+SHT_SYMTAB = 2
+STT_FUNC = 2
+
+def assemble(assembly, assembler="as"):
+    """Assemble to an ELF object and return its bytes."""
+    with tempfile.TemporaryDirectory() as directory:
+        source = os.path.join(directory, "out.s")
+        target = os.path.join(directory, "out.o")
+
+        with open(source, "w") as f:
+            f.write(assembly)
+            if not assembly.endswith("\n"):
+                f.write("\n")
+
+        try:
+            result = subprocess.run([assembler, "--64", "-o", target, source],
+                                    capture_output=True, text=True)
+        except OSError as e:
+            raise RuntimeError(f"Cannot run assembler '{assembler}': {e}")
+
+        if result.returncode != 0:
+            raise RuntimeError(f"Assembler failed: {result.stderr.strip()}")
+
+        with open(target, "rb") as f:
+            return f.read()
+
+def read_sections(obj):
+    shoff, = struct.unpack_from("<Q", obj, 0x28)
+    shentsize, shnum, shstrndx = struct.unpack_from("<HHH", obj, 0x3A)
+
+    headers = []
+    for i in range(shnum):
+        name, kind, _, _, offset, size, link, _, _, entsize = struct.unpack_from(
+            "<IIQQQQIIQQ", obj, shoff + i * shentsize
+        )
+        headers.append((name, kind, offset, size, link, entsize))
+
+    names_offset = headers[shstrndx][2]
+
+    def string_at(base, offset):
+        end = obj.index(b"\0", base + offset)
+        return obj[base + offset:end].decode()
+
+    sections = []
+    for name, kind, offset, size, link, entsize in headers:
+        sections.append({
+            "name": string_at(names_offset, name), "type": kind,
+            "offset": offset, "size": size, "link": link, "entsize": entsize,
+        })
+
+    return sections, string_at
+
+def section_sizes(assembly, assembler="as"):
+    """Sizes of the allocated sections and of each function in .text, in bytes."""
+    obj = assemble(assembly, assembler)
+    sections, string_at = read_sections(obj)
+
+    sizes = {section["name"]: section["size"] for section in sections
+             if section["name"] in (".text", ".rodata", ".data", ".bss")}
+    functions = {}
+
+    for section in sections:
+        if section["type"] != SHT_SYMTAB:
+            continue
+
+        names_offset = sections[section["link"]]["offset"]
+        for offset in range(section["offset"], section["offset"] + section["size"], section["entsize"]):
+            name, info, _, shndx, _, size = struct.unpack_from("<IBBHQQ", obj, offset)
+
+            if info & 0xF == STT_FUNC and sections[shndx]["name"] == ".text":
+                functions[string_at(names_offset, name)] = size
+
+    return {"sections": sizes, "functions": functions}
+
+def format_sizes(sizes):
+    lines = ["=== Section sizes ==="]
+
+    for name, size in sizes["sections"].items():
+        lines.append(f"  {name:<10} {size:>8}")
+
+    lines.append("")
+    lines.append("=== Function sizes (.text) ===")
+
+    for name, size in sorted(sizes["functions"].items(), key=lambda item: -item[1]):
+        lines.append(f"  {size:>8}  {name}")
+
+    return "\n".join(lines)
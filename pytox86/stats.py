@@ -0,0 +1,128 @@
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+@dataclass
+class PassRecord:
+    name: str
+    runs: int = 0
+    changes: int = 0
+    seconds: float = 0.0
+    instructions_removed: int = 0
+
+@dataclass
+class FunctionRecord:
+    name: str
+    instructions_before: Optional[int] = None
+    blocks_before: Optional[int] = None
+    instructions_after: Optional[int] = None
+    blocks_after: Optional[int] = None
+
+def instruction_count(function):
+    return sum(len(block.instructions) for block in function.blocks)
+
+def program_counts(program):
+    return {function.name: (instruction_count(function), len(function.blocks))
+            for function in program.functions}
+
+class PassStatistics:
+    """Per-pass timing and change counts, plus IR size before and after optimization."""
+
+    def __init__(self):
+        self.passes: Dict[str, PassRecord] = {}
+        self.functions: Dict[str, FunctionRecord] = {}
+        self.iterations = 0
+        self.total_seconds = 0.0
+        self.started = None
+
+    def begin(self, program):
+        self.started = time.perf_counter()
+
+        for name, (instructions, blocks) in program_counts(program).items():
+            record = self.functions.setdefault(name, FunctionRecord(name))
+            record.instructions_before = instructions
+            record.blocks_before = blocks
+
+    def run(self, name, optimization, program):
+        record = self.passes.setdefault(name, PassRecord(name))
+        size = sum(instruction_count(function) for function in program.functions)
+
+        start = time.perf_counter()
+        changed = optimization(program)
+        record.seconds += time.perf_counter() - start
+
+        record.runs += 1
+        if changed:
+            record.changes += 1
+            record.instructions_removed += size - sum(instruction_count(function) for function in program.functions)
+
+        return changed
+
+    def finish(self, program):
+        if self.started is not None:
+            self.total_seconds += time.perf_counter() - self.started
+            self.started = None
+
+        for name, (instructions, blocks) in program_counts(program).items():
+            # Functions created by the optimizer, such as specialized clones,
+            # have no size before
+            record = self.functions.setdefault(name, FunctionRecord(name))
+            record.instructions_after = instructions
+            record.blocks_after = blocks
+
+    def totals(self):
+        def total(attribute):
+            return sum(getattr(record, attribute) or 0 for record in self.functions.values())
+
+        return {
+            "instructions_before": total("instructions_before"),
+            "blocks_before": total("blocks_before"),
+            "instructions_after": total("instructions_after"),
+            "blocks_after": total("blocks_after"),
+        }
+
+    def to_dict(self):
+        return {
+            "iterations": self.iterations,
+            "seconds": self.total_seconds,
+            "passes": {name: vars(record).copy() for name, record in self.passes.items()},
+            "functions": {name: vars(record).copy() for name, record in self.functions.items()},
+            "total": self.totals(),
+        }
+
+    def format_timing(self):
+        lines = ["=== Pass execution timing report ===",
+                 f"  Total optimization time: {self.total_seconds * 1000:.3f} ms", ""]
+        lines.append(f"  {'Time (ms)':>10}  {'%':>6}  {'Runs':>5}  Pass")
+
+        for record in sorted(self.passes.values(), key=lambda record: -record.seconds):
+            share = 100 * record.seconds / self.total_seconds if self.total_seconds else 0.0
+            lines.append(f"  {record.seconds * 1000:>10.3f}  {share:>5.1f}%  {record.runs:>5}  {record.name}")
+
+        return "\n".join(lines)
+
+    def format_stats(self):
+        lines = ["=== Optimization statistics ===",
+                 f"  Fixpoint iterations: {self.iterations}", ""]
+        lines.append(f"  {'Runs':>5}  {'Changed':>7}  {'Removed':>7}  Pass")
+
+        for record in self.passes.values():
+            lines.append(f"  {record.runs:>5}  {record.changes:>7}  {record.instructions_removed:>7}  {record.name}")
+
+        def count(value):
+            return "-" if value is None else str(value)
+
+        lines.append("")
+        lines.append(f"  {'Instrs':>13}  {'Blocks':>11}  Function")
+
+        for record in self.functions.values():
+            instrs = f"{count(record.instructions_before)} -> {count(record.instructions_after)}"
+            blocks = f"{count(record.blocks_before)} -> {count(record.blocks_after)}"
+            lines.append(f"  {instrs:>13}  {blocks:>11}  {record.name}")
+
+        totals = self.totals()
+        instrs = f"{totals['instructions_before']} -> {totals['instructions_after']}"
+        blocks = f"{totals['blocks_before']} -> {totals['blocks_after']}"
+        lines.append(f"  {instrs:>13}  {blocks:>11}  (total)")
+
+        return "\n".join(lines)
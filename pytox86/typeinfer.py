@@ -0,0 +1,191 @@
+from .cfg import is_temp
+
+# Operators whose result is a float when either operand is
+FLOAT_OPS = {"+", "-", "*", "/", "%"}
+
+# Builtins the code generator lowers to conversions
+CONVERSIONS = {"int", "float"}
+
+class FloatTypes:
+    """Which values of a program hold floats, inferred flow-insensitively.
+
+    A name is a float when any value assigned to it may be one; the code
+    generator converts ints assigned to it. A parameter is a float when any
+    call passes one, and a function returns a float when any of its
+    returns does.
+
+    Lists are tracked the same way: a list holds floats when a float is
+    stored into it, and every name the list may flow to or from shares
+    that, so ints stored into it are converted and items read from it are
+    floats.
+
+    With unknown_globals every global counts as a float, for callers that
+    see only part of the program and so not every store to a global.
+    """
+
+    def __init__(self, program, unknown_globals=False):
+        self.functions = {func.name: func for func in program.functions}
+        self.global_vars = set(program.global_vars)
+        self.unknown_globals = unknown_globals
+        self.names = {func.name: set() for func in program.functions}
+        self.global_floats = set()
+        self.returns = set()
+        self.lists = {func.name: set() for func in program.functions}
+        self.global_lists = set()
+        self.list_returns = set()
+        self.infer()
+
+    def is_local(self, func, name):
+        return is_temp(name) or name in func.local_vars or name in func.params or name not in self.global_vars
+
+    def is_float(self, func, value):
+        if isinstance(value, float):
+            return True
+        if not isinstance(value, str):
+            return False
+        if self.is_local(func, value):
+            return value in self.names[func.name]
+        return self.unknown_globals or value in self.global_floats
+
+    def holds_float_list(self, func, value):
+        if not isinstance(value, str):
+            return False
+        if self.is_local(func, value):
+            return value in self.lists[func.name]
+        return self.unknown_globals or value in self.global_lists
+
+    def mark(self, func, name):
+        floats = self.names[func.name] if self.is_local(func, name) else self.global_floats
+        if name in floats:
+            return False
+
+        floats.add(name)
+        return True
+
+    def mark_list(self, func, name):
+        if not isinstance(name, str):
+            return False
+
+        lists = self.lists[func.name] if self.is_local(func, name) else self.global_lists
+        if name in lists:
+            return False
+
+        lists.add(name)
+        return True
+
+    def join_lists(self, func, name, other_func, other):
+        # Two names that may hold the same list
+        if self.holds_float_list(func, name) or self.holds_float_list(other_func, other):
+            return self.mark_list(func, name) | self.mark_list(other_func, other)
+        return False
+
+    def param_floats(self, name):
+        """Whether each parameter of the program's function name is a float."""
+        func = self.functions[name]
+        return [param in self.names[name] for param in func.params]
+
+    def returns_float(self, name):
+        return name in self.returns
+
+    def signature(self, func):
+        """What the code generated for func assumes about floats."""
+        callees = sorted({instr.args[0] for block in func.blocks for instr in block.instructions
+                          if instr.op == "call" and instr.args[0] in self.functions})
+        return {
+            "names": sorted(self.names[func.name]),
+            "globals": sorted(self.global_floats),
+            "returns": self.returns_float(func.name),
+            "lists": sorted(self.lists[func.name]),
+            "global_lists": sorted(self.global_lists),
+            "callees": [[name, self.param_floats(name), self.returns_float(name)] for name in callees],
+        }
+
+    def is_conversion(self, name):
+        return name in CONVERSIONS and name not in self.functions
+
+    def infer(self):
+        changed = True
+
+        while changed:
+            changed = False
+
+            for func in self.functions.values():
+                for block in func.blocks:
+                    for instr in block.instructions:
+                        changed |= self.visit(func, instr)
+
+    def visit(self, func, instr):
+        if instr.op == "const" and isinstance(instr.args[0], float):
+            return self.mark(func, instr.result)
+
+        if instr.op in ("copy", "load") and instr.result:
+            changed = self.join_lists(func, instr.result, func, instr.args[0])
+            if self.is_float(func, instr.args[0]):
+                changed |= self.mark(func, instr.result)
+            return changed
+
+        if instr.op == "store":
+            changed = self.join_lists(func, instr.args[1], func, instr.args[0])
+            if self.is_float(func, instr.args[0]):
+                changed |= self.mark(func, instr.args[1])
+            return changed
+
+        if instr.op == "setitem" and self.is_float(func, instr.args[2]):
+            return self.mark_list(func, instr.args[0])
+
+        if instr.op in ("getitem", "getitem_unchecked") and instr.result and self.holds_float_list(func, instr.args[0]):
+            return self.mark(func, instr.result)
+
+        if instr.op == "binop" and instr.args[0] in FLOAT_OPS and instr.result:
+            if any(self.is_float(func, arg) for arg in instr.args[1:]):
+                return self.mark(func, instr.result)
+
+        if instr.op == "unop" and instr.args[0] in ("-", "+") and instr.result and self.is_float(func, instr.args[1]):
+            return self.mark(func, instr.result)
+
+        if instr.op == "ret" and instr.args:
+            return self.visit_return(func, instr.args[0])
+
+        if instr.op == "call":
+            return self.visit_call(func, instr)
+
+        return False
+
+    def visit_return(self, func, value):
+        changed = False
+
+        if self.is_float(func, value) and func.name not in self.returns:
+            self.returns.add(func.name)
+            changed = True
+
+        if self.holds_float_list(func, value) and func.name not in self.list_returns:
+            self.list_returns.add(func.name)
+            changed = True
+        elif func.name in self.list_returns:
+            changed |= self.mark_list(func, value)
+
+        return changed
+
+    def visit_call(self, func, instr):
+        name, args = instr.args[0], instr.args[1:]
+        changed = False
+
+        if name in self.functions:
+            callee = self.functions[name]
+            for param, arg in zip(callee.params, args):
+                changed |= self.join_lists(callee, param, func, arg)
+                if self.is_float(func, arg):
+                    changed |= self.mark(callee, param)
+
+            if instr.result and name in self.returns:
+                changed |= self.mark(func, instr.result)
+
+            if instr.result and self.holds_float_list(func, instr.result) and name not in self.list_returns:
+                self.list_returns.add(name)
+                changed = True
+            elif instr.result and name in self.list_returns:
+                changed |= self.mark_list(func, instr.result)
+        elif name == "float" and instr.result:
+            changed |= self.mark(func, instr.result)
+
+        return changed
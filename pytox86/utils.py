@@ -8,6 +8,10 @@ from .analyzer import SemanticAnalyzer
 from .irgen import IRGenerator
 from .optim import Optimizer
 from .codegen import X86Generator
+from .size import section_sizes, format_sizes
+from .autotune import Autotuner, load_config, save_config
+from .cache import CompilationCache
+from .bench import compare_register_allocators, format_comparison
 
 def print_ast(node, indent=0):
     prefix = "  " * indent
@@ -57,15 +61,38 @@ def dump_tokens(tokens: List[Token]):
         print(f"{token.type.name:12} '{token.value}' (line {token.line}, col {token.column})")
         
 def run_compiler(input_file, output_file=None, optimization_level=1, 
-                 dump_ast=False, dump_tokens_flag=False, dump_ir=False):
+                 dump_ast=False, dump_tokens_flag=False, dump_ir=False, *,
+                 time_passes=False, stats=False,
+                 remarks_output=None, remarks_format="yaml", remarks_kinds=None,
+                 size_report=False, config_file=None, autotune_budget=0, link_with=None,
+                 cache_dir=None, cache_size=64, benchmark=False, frame_report=False,
+                 peephole_report=False):
     from pytox86 import Transpiler
     
-    transpiler = Transpiler(optimization_level=optimization_level)
-    
     try:
         with open(input_file, 'r') as f:
             source_code = f.read()
             
+        config = None
+        
+        if autotune_budget:
+            tuner = Autotuner(source_code, optimization_level, link_with or [])
+            config, seconds = tuner.tune(autotune_budget)
+            print(tuner.format_history(), file=sys.stderr)
+            
+            config_file = config_file or os.path.splitext(input_file)[0] + ".tune.json"
+            save_config(config, config_file)
+            print(f"Best configuration ({seconds * 1000:.3f} ms) written to {config_file}")
+        elif config_file:
+            config = load_config(config_file)
+            
+        if config:
+            # The pass order and parameters were tuned at this level
+            optimization_level = config.get("optimization_level", optimization_level)
+            
+        cache = CompilationCache(cache_dir, cache_size * 1024 * 1024) if cache_dir else None
+        transpiler = Transpiler(optimization_level=optimization_level, config=config, cache=cache)
+        
         if dump_tokens_flag:
             lexer = Lexer()
             tokens = lexer.tokenize(source_code)
@@ -99,9 +126,46 @@ def run_compiler(input_file, output_file=None, optimization_level=1,
         
         if output_file:
             print(f"Assembly code written to {output_file}")
+            
+            if size_report:
+                with open(output_file, 'r') as f:
+                    assembly = f.read()
         else:
             print(assembly)
             
+        if size_report:
+            print(format_sizes(section_sizes(assembly)), file=sys.stderr)
+            
+        if frame_report:
+            print(transpiler.codegen.format_frame_sizes(), file=sys.stderr)
+            
+        if peephole_report:
+            print(transpiler.codegen.format_peephole_counts(), file=sys.stderr)
+            
+        if benchmark:
+            results = compare_register_allocators(source_code, optimization_level, link_with or [])
+            print(format_comparison(results), file=sys.stderr)
+            
+        if time_passes:
+            print(transpiler.optimizer.stats.format_timing(), file=sys.stderr)
+            
+        if stats:
+            print(transpiler.optimizer.stats.format_stats(), file=sys.stderr)
+            
+            if cache:
+                print(cache.format(), file=sys.stderr)
+            
+        if remarks_output:
+            remarks = transpiler.optimizer.remarks
+            
+            with open(remarks_output, 'w') as f:
+                if remarks_format == "json":
+                    f.write(remarks.to_json(remarks_kinds))
+                else:
+                    f.write(remarks.to_yaml(remarks_kinds))
+                    
+            print(f"Optimization remarks written to {remarks_output}")
+            
     except Exception as e:
         print(f"Error: {e}", file=sys.stderr)
         import traceback
@@ -0,0 +1,74 @@
+import shutil
+import sys
+
+import pytest
+
+from pytox86 import Transpiler
+from pytox86.analyzer import SemanticAnalyzer
+from pytox86.bench import time_program
+from pytox86.irgen import IRGenerator
+from pytox86.lexer import Lexer
+from pytox86.optim import Optimizer
+from pytox86.parser import Parser
+
+LEVELS = [0, 1, 2, 3, "s"]
+
+# The runtime functions compiled programs call
+RUNTIME = r"""
+#include <stdint.h>
+#include <stdio.h>
+#include <stdlib.h>
+
+typedef struct { int64_t len; int64_t items[]; } pylist;
+
+int64_t range(int64_t n) {
+    if (n < 0) n = 0;
+    pylist *list = malloc(8 + 8 * n);
+    list->len = n;
+    for (int64_t i = 0; i < n; i++) list->items[i] = i;
+    return (int64_t)list;
+}
+
+int64_t _py_len(int64_t p) { return ((pylist *)p)->len; }
+
+int64_t _py_getitem(int64_t p, int64_t i) {
+    pylist *list = (pylist *)p;
+    if (i < 0 || i >= list->len) exit(99);
+    return list->items[i];
+}
+
+int64_t print(int64_t x) { printf("%ld\n", (long)x); return 0; }
+"""
+
+requires_gcc = pytest.mark.skipif(shutil.which("gcc") is None, reason="needs gcc to link the output")
+
+def python_result(source):
+    """What main() of source returns under CPython, as an exit status."""
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 10000))
+    scope = {}
+    exec(compile(source, "<test>", "exec"), scope)
+    return scope["main"]() % 256
+
+def compiled_result(source, level, tmp_path, **options):
+    runtime = tmp_path / "runtime.c"
+    runtime.write_text(RUNTIME)
+
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 10000))
+    assembly = Transpiler(level, **options).transpile(source)
+    result = time_program(assembly, link_with=[str(runtime)], repeats=1)
+    assert result is not None, "program crashed"
+    return result[0]
+
+def optimize(source, level=2, passes=None, late_passes=None, **params):
+    """The optimizer after running over source's IR, and that IR by function name."""
+    ast = Parser().parse(Lexer().tokenize(source))
+    SemanticAnalyzer().analyze(ast)
+    program = IRGenerator().generate(ast)
+
+    optimizer = Optimizer(level, params, passes, late_passes)
+    optimizer.optimize(program)
+    return optimizer, {func.name: func for func in program.functions}
+
+def ops(function, op):
+    """Instructions of function with operation op."""
+    return [instr for block in function.blocks for instr in block.instructions if instr.op == op]
@@ -0,0 +1,68 @@
+from pytox86.autotune import Autotuner, default_config, load_config, save_config
+
+from .support import RUNTIME, compiled_result, python_result, requires_gcc
+
+LOOP = """
+def main():
+    total = 0
+    for i in range(100):
+        total = total + i * 3
+    return total
+"""
+
+def mutations(level, count, seed=0):
+    tuner = Autotuner(LOOP, optimization_level=level, seed=seed)
+    config = default_config(level)
+    seen = []
+
+    for _ in range(count):
+        config = tuner.mutate(config)
+        seen.append(config)
+    return seen
+
+def test_mutate_changes_late_passes():
+    default = default_config(2)["late_passes"]
+    assert any(config["late_passes"] != default for config in mutations(2, 200))
+
+def test_mutate_adds_passes_the_level_does_not_run():
+    configs = mutations(1, 400)
+    assert any("unroll_loops" in config["late_passes"] + config["passes"] for config in configs)
+    assert any("inline_functions" in config["passes"] for config in configs)
+
+@requires_gcc
+def test_level_one_runs_higher_level_passes(tmp_path):
+    config = default_config(1)
+    config["passes"].append("inline_functions")
+    config["late_passes"] = ["unroll_loops"]
+    assert compiled_result(LOOP, 1, tmp_path, config=config) == python_result(LOOP)
+
+def tuner(tmp_path):
+    runtime = tmp_path / "runtime.c"
+    runtime.write_text(RUNTIME)
+    return Autotuner(LOOP, optimization_level=2, link_with=[str(runtime)], repeats=1)
+
+@requires_gcc
+def test_tune_keeps_the_fastest_correct_candidate(tmp_path):
+    autotuner = tuner(tmp_path)
+    best, best_time = autotuner.tune(5)
+
+    assert len(autotuner.history) == 5
+    times = [seconds for _, seconds in autotuner.history if seconds is not None]
+    assert best_time == min(times)
+    assert (best, best_time) in autotuner.history
+    assert compiled_result(LOOP, 2, tmp_path, config=best) == python_result(LOOP)
+
+@requires_gcc
+def test_candidates_that_break_the_compiler_are_rejected(tmp_path):
+    autotuner = tuner(tmp_path)
+    autotuner.tune(1)
+
+    config = default_config(2)
+    config["passes"].append("no_such_pass")
+    assert autotuner.evaluate(config) is None
+    assert autotuner.history[-1] == (config, None)
+
+def test_config_round_trips_through_a_file(tmp_path):
+    config = mutations(2, 20)[-1]
+    save_config(config, tmp_path / "tuned.json")
+    assert load_config(tmp_path / "tuned.json") == config
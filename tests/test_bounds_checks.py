@@ -0,0 +1,86 @@
+import pytest
+
+from pytox86.irgen import IRInstruction, IRProgram
+from pytox86.optim import Optimizer
+
+from .support import LEVELS, compiled_result, ops, optimize, python_result, requires_gcc
+
+# Lists are only indexed by for loops, so the accesses the pass must keep
+# checked are made by editing the loop's IR
+SOURCE = """
+def total(xs, ys, j):
+    t = 0
+    for x in xs:
+        t = t + x
+    return t
+
+def main():
+    return total([1, 2, 3], [4, 5], 1)
+"""
+
+def loop():
+    _, functions = optimize(SOURCE, passes=[], late_passes=[])
+    function = functions["total"]
+    return function, ops(function, "getitem")[0]
+
+def eliminate(function):
+    optimizer = Optimizer(2)
+    optimizer.eliminate_bounds_checks(IRProgram([function]))
+    return [(remark.kind, remark.message) for remark in optimizer.remarks.remarks]
+
+def load_in_entry(function, var):
+    entry = function.entry_block
+    entry.instructions.insert(len(entry.instructions) - 1, IRInstruction("load", [var], f"%{var}"))
+    return f"%{var}"
+
+def insert_before(function, instr, new):
+    for block in function.blocks:
+        if instr in block.instructions:
+            block.instructions.insert(block.instructions.index(instr), new)
+
+def test_loop_variable_index_is_unchecked():
+    function, access = loop()
+    assert eliminate(function) == [("passed", "bounds check removed: index proven within 0 <= i < len")]
+    assert access.op == "getitem_unchecked"
+
+def test_other_index_keeps_the_check():
+    function, access = loop()
+    access.args[1] = load_in_entry(function, "j")
+    assert eliminate(function) == [("missed", "bounds check kept: list or index differs from the loop test")]
+    assert access.op == "getitem"
+
+def test_index_past_the_loop_variable_keeps_the_check():
+    function, access = loop()
+    insert_before(function, access, IRInstruction("binop", ["+", access.args[1], 1], "%next"))
+    access.args[1] = "%next"
+    assert eliminate(function) == [("missed", "bounds check kept: list or index differs from the loop test")]
+    assert access.op == "getitem"
+
+def test_other_list_keeps_the_check():
+    function, access = loop()
+    access.args[0] = load_in_entry(function, "ys")
+    assert eliminate(function) == [("missed", "bounds check kept: list or index differs from the loop test")]
+
+def test_negative_start_keeps_the_check():
+    function, access = loop()
+    counter = access.args[1]
+    start = next(instr for instr in ops(function, "const") if instr.result == counter)
+    start.args[0] = -1
+    assert eliminate(function) == [("missed", "bounds check kept: index is not a non-negative increasing counter")]
+
+PROGRAM = """
+def total(xs):
+    t = 0
+    for x in xs:
+        for y in xs:
+            t = t + x * y
+    return t
+
+def main():
+    return total([1, 2, 3, 4]) + total([]) + total([7])
+"""
+
+@requires_gcc
+@pytest.mark.parametrize("level", LEVELS)
+def test_unchecked_loops_run(level, tmp_path):
+    assert compiled_result(PROGRAM, level, tmp_path) == python_result(PROGRAM)
@@ -0,0 +1,58 @@
+import re
+
+import pytest
+
+from pytox86 import Transpiler
+
+from .support import LEVELS, compiled_result, python_result, requires_gcc
+
+PROGRAM = """
+def pick(x, y):
+    r = 0
+    if x < y:
+        r = r + 1
+    if x >= y - 3:
+        r = r + 2
+    flag = x == y
+    if flag:
+        r = r + 4
+    return r + flag * 8
+
+def main():
+    t = 0
+    for i in range(12):
+        t = t * 3 + pick(i - 6, 2) + pick(4, i - 3)
+    return t
+"""
+
+UNOPTIMIZED = {"passes": [], "late_passes": []}
+
+def function_body(assembly, name):
+    start = assembly.index(f"\n{name}:")
+    return assembly[start:assembly.index(f".size {name},", start)]
+
+def branches(allocator="linear-scan"):
+    transpiler = Transpiler(1, config=UNOPTIMIZED, register_allocator=allocator)
+    return function_body(transpiler.transpile(PROGRAM), "pick")
+
+@pytest.mark.parametrize("allocator", ["stack", "linear-scan", "graph-coloring"])
+def test_compare_read_only_by_its_branch_is_fused(allocator):
+    body = branches(allocator)
+    assert re.search(r"cmp [^\n]+\n\s+jge if_merge_1\n", body)
+    assert re.search(r"cmp [^\n]+\n\s+jl if_merge_3\n", body)
+    assert body.count("set") == 1
+
+def test_stored_compare_is_still_materialized():
+    body = branches()
+    assert re.search(r"sete al\n\s+movzx \w+, al\n", body)
+    assert re.search(r"test (\w+), \1\n\s+je if_merge_5\n", body)
+
+def test_branch_falls_through_to_the_next_block():
+    body = branches()
+    assert "jmp" not in body
+    assert re.search(r"jge if_merge_1\n\s*\n\s*if_then_0:", body)
+
+@requires_gcc
+@pytest.mark.parametrize("level", LEVELS)
+def test_fused_branches_run(level, tmp_path):
+    assert compiled_result(PROGRAM, level, tmp_path) == python_result(PROGRAM)
@@ -0,0 +1,76 @@
+import os
+
+import pytest
+
+from pytox86 import Transpiler
+from pytox86 import cache as cache_module
+from pytox86.cache import CompilationCache
+
+from .support import LEVELS
+
+PROGRAM = """
+def square(x):
+    return x * x
+
+def total(n):
+    t = 0
+    for i in range(n):
+        t = t + square(i)
+    return t
+
+def main():
+    return total(10) + 1.5 * 2
+"""
+
+# Temps are numbered through the whole program, so only the last function
+# is edited
+EDITED = PROGRAM.replace("total(10)", "total(12)")
+
+def cached_transpile(directory, source, level=2, max_bytes=1 << 20):
+    cache = CompilationCache(str(directory), max_bytes)
+    return Transpiler(level, cache=cache).transpile(source), cache
+
+@pytest.mark.parametrize("level", LEVELS)
+def test_cached_build_matches_uncached(level, tmp_path):
+    expected = Transpiler(level).transpile(PROGRAM)
+
+    first, cache = cached_transpile(tmp_path, PROGRAM, level)
+    assert first == expected
+    assert cache.hits == 0 and cache.misses > 0
+
+    second, cache = cached_transpile(tmp_path, PROGRAM, level)
+    assert second == expected
+    assert cache.misses == 0 and cache.hits > 0
+
+def test_edit_misses_only_what_changed(tmp_path):
+    # -O1 has no interprocedural passes, so each function is cached alone
+    _, cold = cached_transpile(tmp_path, PROGRAM, 1)
+    assembly, warm = cached_transpile(tmp_path, EDITED, 1)
+
+    assert assembly == Transpiler(1).transpile(EDITED)
+    assert warm.hits > 0 and warm.misses > 0
+    assert warm.misses < cold.misses
+
+def test_entries_from_another_compiler_are_not_read(tmp_path, monkeypatch):
+    cached_transpile(tmp_path, PROGRAM)
+
+    monkeypatch.setattr(cache_module, "compiler_fingerprint", lambda: "another compiler")
+    _, cache = cached_transpile(tmp_path, PROGRAM)
+    assert cache.hits == 0
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = CompilationCache(str(tmp_path), max_bytes=2500)
+    for key in ("a", "b", "c"):
+        cache.put("asm", key, "x" * 1000)
+        os.utime(cache.path("asm", key), (len(key), {"a": 1, "b": 3, "c": 2}[key]))
+
+    cache.put("asm", "d", "x" * 1000)
+
+    assert cache.get("asm", "a") is None
+    assert cache.get("asm", "c") is None
+    assert cache.get("asm", "b") is not None
+    assert cache.get("asm", "d") is not None
+
+def test_directory_is_private(tmp_path):
+    CompilationCache(str(tmp_path / "cache"))
+    assert os.stat(tmp_path / "cache").st_mode & 0o077 == 0
@@ -0,0 +1,12 @@
+import pytest
+
+from pytox86.codegen import X86Generator
+from pytox86.irgen import BasicBlock, IRFunction, IRInstruction, IRProgram
+
+@pytest.mark.parametrize("allocator", ["stack", "linear-scan", "graph-coloring"])
+def test_temp_without_definition_is_an_internal_error(allocator):
+    entry = BasicBlock("main_entry", [IRInstruction("ret", ["%t9"])])
+    program = IRProgram([IRFunction("main", [], entry, [entry])])
+
+    with pytest.raises(RuntimeError, match="%t9 has no home"):
+        X86Generator(register_allocator=allocator).generate(program)
@@ -0,0 +1,99 @@
+import pytest
+
+from .support import LEVELS, compiled_result, python_result, requires_gcc
+
+ARITHMETIC = """
+def main():
+    a = 7.25
+    b = 0.5
+    n = 3
+    r = int((a + b) * 8.0) - int((a - b) * 4.0)
+    r = r + int(a * b * 100.0) + int(a/b)
+    r = r + int(a + n) + int(n - a) + int(n * a)
+    c = n
+    c = c + 0.75
+    r = r + int(c * 4.0) + int(-a) + int(-(a * 2.0))
+    return r
+"""
+
+COMPARE = """
+def check(a, b):
+    r = 0
+    if a < b:
+        r = r + 1
+    if a <= b:
+        r = r + 2
+    if a > b:
+        r = r + 4
+    if a >= b:
+        r = r + 8
+    if a == b:
+        r = r + 16
+    if a != b:
+        r = r + 32
+    return r
+
+def main():
+    inf = 10.0
+    i = 0
+    while i < 400:
+        inf = inf * 10.0
+        i = i + 1
+    nan = inf - inf
+    r = check(1.5, 2.5) + check(2.5, 1.5) * 3 + check(2.0, 2) * 5
+    r = r + check(nan, 1.0) * 7 + check(nan, nan) * 11
+    flag = nan == nan
+    flag = flag + (nan != nan) * 2 + (3 < 2.5) * 4
+    return r + flag * 13
+"""
+
+CALLS = """
+def many(a, b, c, d, e, f, g, h, i, j, k):
+    return a + b * 2.0 + c * 3.0 + d * 4.0 + e * 5.0 + f * 6.0 + g * 7.0 + h * 8.0 + i * 9.0 + j * 10.0 + k * 11.0
+
+def mixed(n, x, m, y, s):
+    return n * x - m * y + s
+
+def half(x):
+    return x * 0.5
+
+def main():
+    r = int(many(1.0, 2.0, 3.0, 4.0, 5.0, 6.0, 7.0, 8.0, 9.0, 10.0, 11.5))
+    r = r + int(mixed(3, 1.5, 2, 0.25, 4) * 10.0)
+    r = r + int(half(7) * 10.0) + int(half(2.5) * 10.0)
+    return r + int(float(9) / 2.0) + int(-2.75)
+"""
+
+MODULO = """
+def main():
+    r = 0
+    r = r + int((7.5 % 2.0) * 10.0)
+    r = r + int((-7.5 % 2.0) * 10.0) * 3
+    r = r + int((7.5 % -2.0) * 10.0) * 5
+    r = r + int((-7.5 % -2.0) * 10.0) * 7
+    r = r + int((6.0 % 3.0) * 10.0) * 11 + int((5 % 1.5) * 10.0) * 13
+    return r
+"""
+
+LISTS = """
+def total(xs):
+    s = 0.0
+    for x in xs:
+        s = s + x
+    return s
+
+def main():
+    t = 0.0
+    for v in [1.5, 2.5, 4]:
+        t = t + v * 2.0
+    for w in [3, 4]:
+        t = t + w
+    return int(t * 10.0 + total([0.25, 0.5, 1]))
+"""
+
+@requires_gcc
+@pytest.mark.parametrize("level", LEVELS)
+@pytest.mark.parametrize("source", [ARITHMETIC, COMPARE, CALLS, MODULO, LISTS],
+                         ids=["arithmetic", "compare", "calls", "modulo", "lists"])
+def test_float_programs_match_python(source, level, tmp_path):
+    assert compiled_result(source, level, tmp_path) == python_result(source)
@@ -0,0 +1,68 @@
+import math
+
+import pytest
+
+from pytox86 import Transpiler
+from pytox86.constpool import ConstantPool, escape_string
+
+from .support import LEVELS, compiled_result, python_result, requires_gcc
+
+def emitted(pool):
+    lines = []
+    pool.emit(lines.append)
+    return lines
+
+def test_equal_constants_share_an_entry():
+    pool = ConstantPool()
+    assert pool.add("double", 2.5) == pool.add("double", 2.5)
+    assert pool.add("string", "hi") == pool.add("string", "hi")
+    assert len(pool.labels) == 2
+
+def test_kinds_and_signed_zeros_are_kept_apart():
+    pool = ConstantPool()
+    labels = {pool.add("double", 0.0), pool.add("double", -0.0), pool.add("string", "0.0")}
+    assert len(labels) == 3
+
+def test_nans_share_an_entry():
+    pool = ConstantPool()
+    assert pool.add("double", math.nan) == pool.add("double", float("nan"))
+
+def test_doubles_are_aligned_in_rodata():
+    pool = ConstantPool()
+    label = pool.add("double", 0.1)
+    pool.add("double", math.inf)
+    pool.add("string", "x")
+
+    lines = emitted(pool)
+    assert lines[:4] == [".section .rodata", ".p2align 3", f"{label}:", "    .double 0.1"]
+    assert "    .quad 0x7ff0000000000000" in lines
+    assert lines[-1] == '    .string "x"'
+
+def test_empty_pool_emits_nothing():
+    assert emitted(ConstantPool()) == []
+
+def test_strings_are_escaped():
+    assert escape_string('a"b\\c\nd\x01') == 'a\\"b\\\\c\\nd\\001'
+
+PROGRAM = """
+def scale(x):
+    return x * 2.5 + 2.5 - 0.125
+
+def main():
+    t = 0.0
+    for i in range(10):
+        t = t + scale(i * 1.0) * 2.5
+    return int(t)
+"""
+
+@pytest.mark.parametrize("level", LEVELS)
+def test_each_double_is_emitted_once(level):
+    assembly = Transpiler(level, config={"params": {"inline_caller_budget": 0}}).transpile(PROGRAM)
+    doubles = [line.strip() for line in assembly.splitlines() if line.strip().startswith(".double")]
+    assert len(doubles) == len(set(doubles))
+    assert ".double 2.5" in doubles
+
+@requires_gcc
+@pytest.mark.parametrize("level", LEVELS)
+def test_pooled_constants_run(level, tmp_path):
+    assert compiled_result(PROGRAM, level, tmp_path) == python_result(PROGRAM)
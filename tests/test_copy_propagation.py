@@ -0,0 +1,60 @@
+import pytest
+
+from .support import LEVELS, compiled_result, ops, optimize, python_result, requires_gcc
+
+def propagate(body):
+    source = f"def f(x):\n{body}\ndef main():\n    return f(3)\n"
+    optimizer, functions = optimize(source, passes=["copy_propagation"], late_passes=[])
+    return optimizer, functions["f"]
+
+def loaded(function):
+    return [instr.args[0] for instr in ops(function, "load")]
+
+def test_stored_values_are_forwarded_to_loads():
+    optimizer, function = propagate("""
+    a = x + 1
+    b = a * 2
+    return b + a
+""")
+    assert loaded(function) == ["x"]
+    assert ops(function, "copy") == []
+    assert {remark.message for remark in optimizer.remarks.select(["passed"])} >= {
+        "forwarded stored value of 'a' to load", "forwarded stored value of 'b' to load"}
+
+def test_later_store_replaces_the_forwarded_value():
+    _, function = propagate("""
+    a = x + 1
+    a = a * 5
+    return a
+""")
+    assert loaded(function) == ["x"]
+    returned = ops(function, "ret")[0].args[0]
+    assert [instr.args[0] for instr in ops(function, "binop") if instr.result == returned] == ["*"]
+
+def test_values_are_not_forwarded_into_a_merge():
+    _, function = propagate("""
+    a = x
+    if x > 0:
+        a = x + 1
+    return a
+""")
+    assert "a" in loaded(function)
+
+PROGRAM = """
+def f(x):
+    a = x + 1
+    b = a
+    if b > 3:
+        a = b * 2
+    c = a
+    a = c + b
+    return a * c
+
+def main():
+    return f(3) + f(1)
+"""
+
+@requires_gcc
+@pytest.mark.parametrize("level", LEVELS)
+def test_propagated_program_runs(level, tmp_path):
+    assert compiled_result(PROGRAM, level, tmp_path) == python_result(PROGRAM)
@@ -0,0 +1,80 @@
+import pytest
+
+from .support import LEVELS, compiled_result, ops, optimize, python_result, requires_gcc
+
+PROGRAM = """
+def make(n):
+    return [n, n + 1, n + 2]
+
+def total(xs):
+    t = 0
+    for x in xs:
+        t = t + x
+    return t
+
+def local(n):
+    t = 0
+    for x in [n, n * 2, n * 3]:
+        t = t + x
+    return t
+
+def alias(n):
+    xs = [n, n]
+    ys = xs
+    return ys
+
+def nested(n):
+    inner = [n]
+    outer = [inner, inner]
+    t = 0
+    for xs in outer:
+        t = t + total(xs)
+    return t
+
+def looped(n):
+    t = 0
+    for i in range(n):
+        for x in [i, i]:
+            t = t + x
+    return t
+
+def main():
+    return total(make(4)) + local(5) + total(alias(6)) + nested(7) + looped(4) + total([1, 2])
+"""
+
+def allocations():
+    optimizer, functions = optimize(PROGRAM, passes=[], late_passes=[])
+    remarks = {(remark.function, remark.message) for remark in optimizer.remarks.select(None, "allocate_lists_on_stack")}
+    return functions, remarks
+
+def test_list_used_only_locally_goes_on_the_stack():
+    functions, remarks = allocations()
+    assert len(ops(functions["local"], "newlist_stack")) == 1
+    assert ("local", "list of 3 items allocated on the stack") in remarks
+
+def test_returned_list_stays_on_the_heap():
+    functions, remarks = allocations()
+    assert ops(functions["make"], "newlist_stack") == []
+    assert ("make", "list kept on the heap: returned") in remarks
+
+def test_returned_alias_stays_on_the_heap():
+    functions, remarks = allocations()
+    assert ops(functions["alias"], "newlist_stack") == []
+    assert ("alias", "list kept on the heap: returned") in remarks
+
+def test_list_passed_to_a_call_stays_on_the_heap():
+    _, remarks = allocations()
+    assert ("main", "list kept on the heap: passed to total") in remarks
+
+def test_list_stored_into_a_list_stays_on_the_heap():
+    _, remarks = allocations()
+    assert ("nested", "list kept on the heap: stored into a list") in remarks
+
+def test_list_built_in_a_loop_stays_on_the_heap():
+    _, remarks = allocations()
+    assert ("looped", "list kept on the heap: allocated inside a loop") in remarks
+
+@requires_gcc
+@pytest.mark.parametrize("level", LEVELS)
+def test_stack_and_heap_lists_run(level, tmp_path):
+    assert compiled_result(PROGRAM, level, tmp_path) == python_result(PROGRAM)
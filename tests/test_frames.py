@@ -0,0 +1,80 @@
+import pytest
+
+from pytox86 import Transpiler
+from pytox86.codegen import CALLING_OPS, X86Generator
+from pytox86.regalloc import live_intervals
+
+from .support import LEVELS, compiled_result, optimize, python_result, requires_gcc
+
+PROGRAM = """
+def steps(x):
+    a = x + 1
+    b = a * 2
+    c = b - 3
+    d = c * c
+    e = d + x
+    f = e - a
+    return f * 2 + x
+
+def keep(x):
+    a = x + 1
+    b = x + 2
+    c = x + 3
+    return a * b * c + a + b + c
+
+def main():
+    return steps(4) + keep(5) + steps(-3)
+"""
+
+def function_slots(name):
+    _, functions = optimize(PROGRAM, level=1, passes=[], late_passes=[])
+    function = functions[name]
+    names = set(function.local_vars) | {instr.result for block in function.blocks
+                                        for instr in block.instructions if instr.result}
+    return function, names, X86Generator().share_stack_slots(function, names)
+
+@pytest.mark.parametrize("name", ["steps", "keep"])
+def test_overlapping_names_never_share_a_slot(name):
+    function, names, slots = function_slots(name)
+    intervals = live_intervals(function, names, CALLING_OPS)
+
+    assert set(slots) == names
+    for a in intervals:
+        for b in intervals:
+            if a < b and slots[a] == slots[b]:
+                assert intervals[a].end < intervals[b].start or intervals[b].end < intervals[a].start
+
+def test_names_with_disjoint_lifetimes_share_slots():
+    _, names, slots = function_slots("steps")
+    assert len(set(slots.values())) < len(names)
+
+@pytest.mark.parametrize("allocator", ["stack", "linear-scan"])
+def test_shared_frames_are_never_larger(allocator):
+    transpiler = Transpiler(0, register_allocator=allocator)
+    transpiler.transpile(PROGRAM)
+    for before, after in transpiler.codegen.frame_sizes.values():
+        assert after <= before
+        assert after % 16 == 0
+
+def test_stack_frames_shrink_at_O0():
+    transpiler = Transpiler(0)
+    transpiler.transpile(PROGRAM)
+    before, after = transpiler.codegen.frame_sizes["steps"]
+    assert after < before
+
+def test_frame_report_lists_each_function_and_a_total():
+    transpiler = Transpiler(0)
+    transpiler.transpile(PROGRAM)
+    report = transpiler.codegen.format_frame_sizes()
+    sizes = transpiler.codegen.frame_sizes
+
+    assert report.startswith("=== Frame sizes ===")
+    for name, (before, after) in sizes.items():
+        assert f"{name:<24} {before:>8} -> {after:>8} bytes" in report
+    total_after = sum(after for _, after in sizes.values())
+    assert report.splitlines()[-1].endswith(f"{total_after:>8} bytes")
+
+@requires_gcc
+@pytest.mark.parametrize("level", LEVELS)
+def test_shared_slots_run(level, tmp_path):
+    assert compiled_result(PROGRAM, level, tmp_path, register_allocator="stack") == python_result(PROGRAM)
@@ -0,0 +1,71 @@
+import pytest
+
+from .support import LEVELS, compiled_result, ops, optimize, python_result, requires_gcc
+
+GVN = ["global_value_numbering", "eliminate_dead_code"]
+
+def multiplies(source):
+    _, functions = optimize(source, passes=GVN)
+    return [instr for instr in ops(functions["f"], "binop") if instr.args[0] == "*"]
+
+def program(body):
+    return f"def f(x, y):\n{body}\ndef main():\n    return f(3, 4)\n"
+
+def test_redundant_expression_is_removed():
+    assert len(multiplies(program("""
+    a = x * y + 1
+    b = x * y + 2
+    return a + b
+"""))) == 1
+
+def test_commuted_operands_share_a_value_number():
+    assert len(multiplies(program("""
+    a = x * y
+    b = y * x
+    return a + b
+"""))) == 1
+
+def test_store_between_expressions_keeps_both():
+    assert len(multiplies(program("""
+    a = x * y
+    x = x + 1
+    b = x * y
+    return a + b
+"""))) == 2
+
+def test_sibling_branches_do_not_share_values():
+    # Neither branch dominates the other
+    assert len(multiplies(program("""
+    a = 0
+    if x < y:
+        a = x * y
+    else:
+        a = x * y + 1
+    return a
+"""))) == 2
+
+def test_dominating_expression_is_reused():
+    assert len(multiplies(program("""
+    a = x * y
+    if x < y:
+        a = a + x * y
+    return a
+"""))) == 1
+
+REDUNDANT = """
+def f(x, y):
+    t = 0
+    i = 0
+    while i < 10:
+        t = t + (x + i) * (y - i) + (i + x) * (y - i)
+        i = i + 1
+    return t
+
+def main():
+    return f(3, 4) + f(7, 2)
+"""
+
+@requires_gcc
+@pytest.mark.parametrize("level", LEVELS)
+def test_value_numbered_program_runs(level, tmp_path):
+    assert compiled_result(REDUNDANT, level, tmp_path) == python_result(REDUNDANT)
@@ -0,0 +1,61 @@
+import re
+
+import pytest
+
+from .support import LEVELS, compiled_result, ops, optimize, python_result, requires_gcc
+
+PROGRAM = """
+def mix(a, b):
+    t = a * 3 + b
+    if t > 100:
+        t = t - 100
+    return t * 2
+
+def fact(n):
+    if n <= 1:
+        return 1
+    return n * fact(n - 1)
+
+def main():
+    s = 0
+    for i in range(20):
+        s = s + mix(i, s) + fact(i % 6)
+    return s
+"""
+
+def inline(**params):
+    params = {"inline_threshold": 0, "inline_caller_budget": 1000, **params}
+    optimizer, functions = optimize(PROGRAM, passes=["inline_functions"], **params)
+    callees = [instr.args[0] for instr in ops(functions["main"], "call")]
+    return optimizer, functions, callees
+
+def inline_cost():
+    optimizer, _, _ = inline(inline_threshold=-1000)
+    remark = next(remark for remark in optimizer.remarks.select(["missed"]) if "mix not inlined" in remark.message)
+    return int(re.search(r"cost (-?\d+)", remark.message).group(1))
+
+def test_callee_at_the_threshold_is_inlined():
+    _, functions, callees = inline(inline_threshold=inline_cost())
+    assert "mix" not in callees
+    assert "mix" not in functions
+
+def test_callee_above_the_threshold_is_kept():
+    _, functions, callees = inline(inline_threshold=inline_cost() - 1)
+    assert "mix" in callees
+    assert "mix" in functions
+
+def test_recursive_callee_is_never_inlined():
+    optimizer, _, callees = inline(inline_threshold=1000)
+    assert "fact" in callees
+    assert any("fact not inlined: callee is recursive" in remark.message
+               for remark in optimizer.remarks.select(["missed"]))
+
+def test_caller_budget_limits_growth():
+    optimizer, _, callees = inline(inline_threshold=1000, inline_caller_budget=10)
+    assert "mix" in callees
+    assert any("past its budget of 10" in remark.message for remark in optimizer.remarks.select(["missed"]))
+
+@requires_gcc
+@pytest.mark.parametrize("level", LEVELS)
+def test_inlined_program_runs(level, tmp_path):
+    assert compiled_result(PROGRAM, level, tmp_path) == python_result(PROGRAM)
@@ -0,0 +1,35 @@
+import pytest
+
+from pytox86 import Transpiler
+
+from .support import LEVELS, compiled_result, python_result, requires_gcc
+
+# Both functions get clones for their constant first arguments; the clones
+# are then inlined into main and removed, and later rounds must not send
+# calls to them
+SPECIALIZED_RECURSION = """
+def f(x, n):
+    if n == 0:
+        return x
+    return f(x, n - 1) * x + n
+
+def sc(x, k):
+    if k == 0:
+        return x
+    return sc(x + k, k - 1)
+
+def main():
+    return f(3, 4) + f(3, 5) + f(2, 3) + sc(1, 10) + sc(2, 10) + sc(5, 3)
+"""
+
+@requires_gcc
+@pytest.mark.parametrize("level", LEVELS)
+def test_specialized_recursion_links(level, tmp_path):
+    assert compiled_result(SPECIALIZED_RECURSION, level, tmp_path) == python_result(SPECIALIZED_RECURSION)
+
+@pytest.mark.parametrize("level", LEVELS)
+def test_transpiling_twice_gives_the_same_assembly(level):
+    transpiler = Transpiler(level)
+    first = transpiler.transpile(SPECIALIZED_RECURSION)
+    assert transpiler.transpile(SPECIALIZED_RECURSION) == first
+    assert first.count("\nmain:") == 1
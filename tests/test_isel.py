@@ -0,0 +1,65 @@
+import re
+
+import pytest
+
+from pytox86 import Transpiler
+
+from .support import LEVELS, compiled_result, python_result, requires_gcc
+
+PROGRAM = """
+def f(x, y):
+    a = x + 5
+    b = a * y
+    c = x + y * 4 + 3
+    d = x * 9
+    e = y - 3000000000
+    if e < 7:
+        e = e + 1
+    return a + b + c + d + e
+
+def main():
+    return f(3, 4) + f(-6, 2)
+"""
+
+# Constants reach their uses, but f stays out of line with unknown arguments
+UNFOLDED = {"passes": ["constant_propagation", "copy_propagation", "eliminate_dead_code"], "late_passes": []}
+
+def function_body(assembly, name):
+    start = assembly.index(f"\n{name}:")
+    return assembly[start:assembly.index(f".size {name},", start)]
+
+def select(allocator):
+    transpiler = Transpiler(1, config=UNFOLDED, register_allocator=allocator)
+    return function_body(transpiler.transpile(PROGRAM), "f")
+
+def test_constant_addend_folds_into_lea():
+    assert re.search(r"lea \w+, \[\w+\+5\]", select("linear-scan"))
+
+def test_scaled_index_and_displacement_fold_into_one_lea():
+    assert re.search(r"lea \w+, \[\w+\+\w+\*4\+3\]", select("linear-scan"))
+
+def test_multiply_by_nine_uses_lea():
+    body = select("linear-scan")
+    assert re.search(r"lea (\w+), \[(\w+)\+\2\*8\]", body)
+    assert not re.search(r"imul \w+, \w+, 9\b", body)
+
+def test_frame_slots_are_used_as_memory_operands():
+    body = select("stack")
+    assert re.search(r"add rax, QWORD PTR \[rbp-\d+\]", body)
+    assert re.search(r"imul rax, QWORD PTR \[rbp-\d+\]", body)
+    assert re.search(r"cmp QWORD PTR \[rbp-\d+\], 7\n", body)
+
+def test_compare_with_small_constant_uses_an_immediate():
+    assert re.search(r"cmp \w+, 7\n", select("linear-scan"))
+
+def test_constant_beyond_imm32_is_not_an_immediate():
+    body = select("linear-scan")
+    assert re.search(r"mov \w+, 3000000000\n", body)
+    assert not re.search(r"(add|sub|cmp|lea)[^\n]*3000000000", body)
+
+@requires_gcc
+@pytest.mark.parametrize("level", LEVELS)
+@pytest.mark.parametrize("allocator", ["stack", "linear-scan", "graph-coloring"])
+def test_selected_instructions_run(level, allocator, tmp_path):
+    result = compiled_result(PROGRAM, level, tmp_path, config=UNFOLDED, register_allocator=allocator)
+    assert result == python_result(PROGRAM)
@@ -0,0 +1,70 @@
+import re
+
+import pytest
+
+from pytox86 import Transpiler
+from pytox86.codegen import X86Generator
+from pytox86.layout import BlockLayout
+
+from .support import LEVELS, compiled_result, optimize, python_result, requires_gcc
+
+PROGRAM = """
+def count(n):
+    t = 0
+    i = 0
+    while i < n:
+        if i % 3 == 0:
+            t = t + i
+        i = i + 1
+    return t
+
+def main():
+    t = 0
+    for k in range(25):
+        t = t + count(k)
+    return t
+"""
+
+NO_INLINING = {"params": {"inline_caller_budget": 0}}
+
+def layout():
+    _, functions = optimize(PROGRAM, level=1, passes=[], late_passes=[])
+    return [block.label for block in BlockLayout(functions["count"]).order]
+
+def test_entry_comes_first_and_the_loop_exit_last():
+    order = layout()
+    assert order[0] == "count_entry"
+    assert order[-1] == "while_exit_2"
+
+def test_loop_blocks_fall_through_to_their_likely_successor():
+    order = layout()
+    assert order.index("while_cond_0") == order.index("if_merge_4") + 1
+    assert order.index("while_body_1") == order.index("while_cond_0") + 1
+    assert order.index("if_then_3") == order.index("while_body_1") + 1
+
+@pytest.mark.parametrize("level", LEVELS)
+def test_no_jump_to_the_next_block(level):
+    assembly = Transpiler(level, config=NO_INLINING).transpile(PROGRAM)
+    assert not re.search(r"jmp (\w+)\n\s*\n(\s*\.p2align \d+\n)?\s*\1:", assembly)
+
+@pytest.mark.parametrize("level", [2, 3])
+def test_loops_are_aligned_at_speed_levels(level):
+    assembly = Transpiler(level, config=NO_INLINING).transpile(PROGRAM)
+    assert re.search(r"\.p2align 4\n\s*\w+:", assembly)
+
+@pytest.mark.parametrize("level", [0, 1, "s"])
+def test_loops_are_not_aligned_otherwise(level):
+    assert ".p2align" not in Transpiler(level, config=NO_INLINING).transpile(PROGRAM)
+
+def test_loop_alignment_is_configurable():
+    assembly = Transpiler(1, config=dict(NO_INLINING, loop_alignment=64)).transpile(PROGRAM)
+    assert ".p2align 6" in assembly
+
+def test_loop_alignment_must_be_a_power_of_two():
+    with pytest.raises(ValueError, match="power of two"):
+        X86Generator(loop_alignment=24)
+
+@requires_gcc
+@pytest.mark.parametrize("level", LEVELS)
+def test_laid_out_loops_run(level, tmp_path):
+    assert compiled_result(PROGRAM, level, tmp_path) == python_result(PROGRAM)
@@ -0,0 +1,53 @@
+import pytest
+
+from .support import LEVELS, compiled_result, python_result, requires_gcc
+
+# v is an induction variable that starts as a float; a running sum of v * 3
+# rounds differently from the products themselves
+FLOAT_INDUCTION_VARIABLE = """
+def count(n):
+    hits = 0
+    v = 0.1
+    i = 0
+    while i < n:
+        if v * 3 == (0.1 + float(i)) * 3:
+            hits = hits + 1
+        v = v + 1
+        i = i + 1
+    return hits
+
+def main():
+    return count(200)
+"""
+
+@requires_gcc
+@pytest.mark.parametrize("level", LEVELS)
+def test_float_induction_variable_keeps_multiplies(level, tmp_path):
+    assert compiled_result(FLOAT_INDUCTION_VARIABLE, level, tmp_path) == python_result(FLOAT_INDUCTION_VARIABLE)
+
+# Accumulating the sum or product in a loop would add the terms in the
+# opposite order; fact keeps its accumulator
+FLOAT_TAIL_RECURSION = """
+def harm(n):
+    if n == 0:
+        return 0.0
+    return 1.0/float(n) + harm(n - 1)
+
+def prod(n):
+    if n == 0:
+        return 1.0
+    return (1.0 + 1.0/float(n)) * prod(n - 1)
+
+def fact(n):
+    if n <= 1:
+        return 1
+    return n * fact(n - 1)
+
+def main():
+    return int(harm(2000) * 1000000000000000.0) + int(prod(3000) * 100000000000.0) + fact(10)
+"""
+
+@requires_gcc
+@pytest.mark.parametrize("level", LEVELS)
+def test_float_tail_recursion_keeps_evaluation_order(level, tmp_path):
+    assert compiled_result(FLOAT_TAIL_RECURSION, level, tmp_path) == python_result(FLOAT_TAIL_RECURSION)
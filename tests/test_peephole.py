@@ -0,0 +1,122 @@
+from pytox86 import Transpiler
+from pytox86.asm import Directive, Instruction, Label
+from pytox86.peephole import PeepholeOptimizer
+
+def optimize(code):
+    optimizer = PeepholeOptimizer()
+    result = optimizer.optimize(code)
+    fired = {name: count for name, count in optimizer.counts.items() if count}
+    return [record.render().strip() for record in result], fired
+
+def test_store_load_forwards_the_stored_register():
+    code, fired = optimize([
+        Instruction("mov", ["QWORD PTR [rbp-8]", "rax"]),
+        Instruction("mov", ["rcx", "QWORD PTR [rbp-8]"]),
+        Instruction("movsd", ["QWORD PTR [rbp-16]", "xmm0"]),
+        Instruction("movsd", ["xmm0", "QWORD PTR [rbp-16]"]),
+    ])
+    assert code == ["mov QWORD PTR [rbp-8], rax", "mov rcx, rax", "movsd QWORD PTR [rbp-16], xmm0"]
+    assert fired == {"store-load": 2}
+
+def test_store_load_needs_the_same_address():
+    code, fired = optimize([
+        Instruction("mov", ["QWORD PTR [rbp-8]", "rax"]),
+        Instruction("mov", ["rcx", "QWORD PTR [rbp-16]"]),
+    ])
+    assert fired == {}
+
+def test_self_move_drops_only_64_bit_moves():
+    code, fired = optimize([
+        Instruction("mov", ["rbx", "rbx"]),
+        Instruction("mov", ["ebx", "ebx"]),
+    ])
+    assert code == ["mov ebx, ebx"]
+    assert fired == {"self-move": 1}
+
+def test_zero_idiom_when_flags_are_dead():
+    code, fired = optimize([
+        Instruction("mov", ["r12", "0"]),
+        Instruction("cmp", ["rax", "rbx"]),
+    ])
+    assert code == ["xor r12d, r12d", "cmp rax, rbx"]
+    assert fired == {"zero-idiom": 1}
+
+def test_zero_idiom_keeps_live_flags():
+    code, fired = optimize([
+        Instruction("cmp", ["rax", "rbx"]),
+        Instruction("mov", ["rax", "0"]),
+        Instruction("setl", ["al"]),
+    ])
+    assert code[1] == "mov rax, 0"
+    assert fired == {}
+
+def test_increment_uses_inc_and_dec():
+    code, fired = optimize([
+        Instruction("add", ["rax", "1"]),
+        Instruction("sub", ["rbx", "1"]),
+        Instruction("add", ["rcx", "-1"]),
+        Instruction("ret"),
+    ])
+    assert code == ["inc rax", "dec rbx", "dec rcx", "ret"]
+    assert fired == {"increment": 3}
+
+def test_increment_keeps_carry_for_readers():
+    code, fired = optimize([
+        Instruction("add", ["rax", "1"]),
+        Instruction("jb", [".L1"]),
+        Label(".L1"),
+    ])
+    assert code[0] == "add rax, 1"
+    assert "increment" not in fired
+
+def test_jump_thread_follows_jump_chains():
+    code, fired = optimize([
+        Instruction("je", [".L1"]),
+        Instruction("ret"),
+        Label(".L1"),
+        Directive("# comment"),
+        Instruction("jmp", [".L2"]),
+        Label(".L2"),
+        Instruction("jmp", [".L3"]),
+        Label(".L3"),
+        Instruction("ret"),
+    ])
+    assert code[0] == "je .L3"
+    assert fired["jump-thread"] >= 1
+
+def test_jump_thread_stops_at_cycles():
+    code, fired = optimize([
+        Instruction("jne", [".L1"]),
+        Label(".L1"),
+        Instruction("jmp", [".L1"]),
+    ])
+    assert code[0] == "jne .L1"
+    assert "jump-thread" not in fired
+
+def test_jump_to_next_is_dropped():
+    code, fired = optimize([
+        Instruction("jmp", [".L1"]),
+        Directive(""),
+        Label(".L1"),
+        Instruction("ret"),
+    ])
+    assert code == ["", ".L1:", "ret"]
+    assert fired == {"jump-to-next": 1}
+
+def test_rules_run_on_generated_code():
+    source = """
+def count(n):
+    i = 0
+    total = 0
+    while i < n:
+        total = total + i
+        i = i + 1
+    return total
+
+def main():
+    return count(10)
+"""
+    transpiler = Transpiler(1)
+    assembly = transpiler.transpile(source)
+    assert transpiler.codegen.peephole_optimizer.counts["zero-idiom"] > 0
+    assert "xor r" in assembly
@@ -0,0 +1,165 @@
+import pytest
+
+from pytox86 import Transpiler
+from pytox86.codegen import CALLING_OPS
+from pytox86.regalloc import (CALLEE_SAVED, CALLER_SAVED, GraphColoringAllocator, IteratedCoalescing,
+                               LinearScanAllocator, live_intervals)
+
+from .support import LEVELS, compiled_result, optimize, python_result, requires_gcc
+
+# Only c and g are read; g arrives on the stack
+UNREAD_PARAMETERS = """
+def pick(a, b, c, d, e, f, g, h):
+    return c * 3 + g
+
+def main():
+    s = 0
+    for k in range(5):
+        s = s + pick(k, k, 30 + k, k, k, k, 7 + k, k)
+    return s
+"""
+
+# Keep pick out of line so its own frame is what gets checked
+NO_INLINING = {"params": {"inline_caller_budget": 0}}
+
+def function_body(assembly, name):
+    start = assembly.index(f"\n{name}:")
+    return assembly[start:assembly.index(f".size {name},", start)]
+
+@pytest.mark.parametrize("allocator", ["linear-scan", "graph-coloring"])
+def test_unread_parameters_get_no_register(allocator):
+    assembly = Transpiler("s", config=NO_INLINING, register_allocator=allocator).transpile(UNREAD_PARAMETERS)
+    body = function_body(assembly, "pick")
+
+    for register in ("rdi", "rsi", "rcx", "r8", "r9"):
+        assert f", {register}\n" not in body
+    for register in ("rbx", "r12", "r13", "r14", "r15"):
+        assert register not in body
+    assert "push rbp" not in body
+
+@requires_gcc
+@pytest.mark.parametrize("allocator", ["stack", "linear-scan", "graph-coloring"])
+@pytest.mark.parametrize("level", LEVELS)
+def test_unread_parameters_run(level, allocator, tmp_path):
+    result = compiled_result(UNREAD_PARAMETERS, level, tmp_path, config=NO_INLINING, register_allocator=allocator)
+    assert result == python_result(UNREAD_PARAMETERS)
+
+# s lives across the call to step; the loop makes i and s the heaviest names
+ACROSS_CALLS = """
+def step(x):
+    return x * 3 + 1
+
+def run(n):
+    s = 0
+    i = 0
+    while i < n:
+        s = s + step(i)
+        i = i + 1
+    return s
+
+def main():
+    return run(50)
+"""
+
+def allocate(allocator, source=ACROSS_CALLS, name="run"):
+    _, functions = optimize(source, level=1, passes=[], late_passes=[])
+    function = functions[name]
+    names = set(function.local_vars) | {instr.result for block in function.blocks
+                                        for instr in block.instructions if instr.result}
+    return function, names, allocator.allocate(function, names)
+
+def test_values_live_across_calls_get_callee_saved_registers():
+    function, names, allocation = allocate(LinearScanAllocator(CALLING_OPS))
+    intervals = live_intervals(function, names, CALLING_OPS)
+
+    crossing = [name for name, interval in intervals.items() if interval.crosses_call]
+    assert "s" in crossing
+    for name in crossing:
+        assert allocation.registers.get(name, CALLEE_SAVED[0]) in CALLEE_SAVED
+    assert allocation.callee_saved == [register for register in CALLEE_SAVED
+                                       if register in allocation.registers.values()]
+
+def test_every_name_gets_a_register_or_a_slot():
+    function, names, allocation = allocate(LinearScanAllocator(CALLING_OPS, [], ["rbx"]))
+    intervals = live_intervals(function, names, CALLING_OPS)
+
+    assert set(allocation.registers) | set(allocation.spilled) == set(intervals)
+    assert not set(allocation.registers) & set(allocation.spilled)
+    assert set(allocation.registers.values()) <= {"rbx"}
+
+def test_overlapping_intervals_never_share_a_register():
+    function, names, allocation = allocate(LinearScanAllocator(CALLING_OPS, CALLER_SAVED, CALLEE_SAVED[:2]))
+    intervals = live_intervals(function, names, CALLING_OPS)
+
+    for a, b in [(a, b) for a in allocation.registers for b in allocation.registers if a < b]:
+        if allocation.registers[a] == allocation.registers[b]:
+            assert intervals[a].end < intervals[b].start or intervals[b].end < intervals[a].start
+
+# More values live at once than there are registers
+PRESSURE = """
+def spread2(a, b, c, d, e, f, g, h):
+    return a * 1 + b * 2 + c * 3 + d * 4 + e * 5 + f * 6 + g * 7 + h * 8
+
+def spread(n):
+    a = n + 1
+    b = n * 2
+    c = n - 3
+    d = a * b
+    e = b + c
+    f = c * d
+    g = d - e
+    h = e + f
+    k = f * 2 + g
+    m = g + h
+    return a + b + c + d + e + f + g + h + k + m + spread2(a, b, c, d, e, f, g, h)
+
+def main():
+    return spread(3) + spread(10)
+"""
+
+@requires_gcc
+@pytest.mark.parametrize("level", LEVELS)
+def test_register_pressure_runs_with_linear_scan(level, tmp_path):
+    result = compiled_result(PRESSURE, level, tmp_path, register_allocator="linear-scan")
+    assert result == python_result(PRESSURE)
+
+def coloring(source=ACROSS_CALLS, name="run"):
+    _, functions = optimize(source, level=1, passes=[], late_passes=[])
+    function = functions[name]
+    names = set(function.local_vars) | {instr.result for block in function.blocks
+                                        for instr in block.instructions if instr.result}
+    coalescing = IteratedCoalescing(CALLER_SAVED + CALLEE_SAVED, CALLER_SAVED)
+    coalescing.build(function, names, CALLING_OPS)
+    coalescing.run()
+    return coalescing
+
+def test_copy_related_names_are_coalesced():
+    coalescing = coloring()
+    assert coalescing.coalesced_moves
+    for move in coalescing.coalesced_moves:
+        x, y = coalescing.moves[move]
+        assert coalescing.color[x] == coalescing.color[y]
+
+def test_interfering_names_get_different_registers():
+    coalescing = coloring(PRESSURE, "spread")
+    for u, v in coalescing.adj_set:
+        if u in coalescing.color and v in coalescing.color:
+            assert coalescing.color[u] != coalescing.color[v]
+
+def test_values_live_across_calls_avoid_caller_saved_registers():
+    function, _, allocation = allocate(GraphColoringAllocator(CALLING_OPS))
+    crossing = [name for name, interval in live_intervals(function, allocation.registers, CALLING_OPS).items()
+                if interval.crosses_call]
+    assert "s" in crossing
+    assert all(allocation.registers[name] not in CALLER_SAVED for name in crossing)
+
+def test_large_functions_fall_back_to_linear_scan():
+    _, _, fallback = allocate(GraphColoringAllocator(CALLING_OPS, max_instructions=1))
+    _, _, linear = allocate(LinearScanAllocator(CALLING_OPS))
+    assert (fallback.registers, fallback.spilled) == (linear.registers, linear.spilled)
+
+@requires_gcc
+@pytest.mark.parametrize("level", LEVELS)
+def test_register_pressure_runs_with_graph_coloring(level, tmp_path):
+    result = compiled_result(PRESSURE, level, tmp_path, register_allocator="graph-coloring")
+    assert result == python_result(PRESSURE)
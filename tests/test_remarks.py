@@ -0,0 +1,69 @@
+import json
+
+from pytox86 import Transpiler
+
+LOOP = """
+def main():
+    total = 0
+    i = 0
+    while i < 5:
+        total = total + i
+        i = i + 1
+    return total
+"""
+
+def test_unroller_reports_its_analysis():
+    transpiler = Transpiler(2)
+    transpiler.transpile(LOOP)
+
+    remarks = transpiler.optimization_remarks(["analysis"])
+    assert [remark["pass_name"] for remark in remarks] == ["unroll_loops"]
+    assert "trip count 5" in remarks[0]["message"]
+
+def test_analysis_remarks_are_tagged_in_yaml():
+    transpiler = Transpiler(2)
+    transpiler.transpile(LOOP)
+
+    assert "--- !Analysis" in transpiler.optimizer.remarks.to_yaml(["analysis"])
+    assert "!Analysis" not in transpiler.optimizer.remarks.to_yaml(["passed", "missed"])
+
+CALLS = """
+def fib(n):
+    if n < 2:
+        return n
+    return fib(n - 1) + fib(n - 2)
+
+def main():
+    return fib(5) + fib(6)
+"""
+
+def test_missed_remarks_name_the_reason_and_line():
+    transpiler = Transpiler(2)
+    transpiler.transpile(CALLS)
+
+    remarks = [remark for remark in transpiler.optimization_remarks(["missed"])
+               if remark["pass_name"] == "inline_functions"]
+    assert {remark["message"] for remark in remarks} == {"fib not inlined: callee is recursive"}
+    assert {remark["line"] for remark in remarks} == {5, 8}
+
+def test_remarks_are_reported_once_across_fixpoint_rounds():
+    transpiler = Transpiler(2)
+    transpiler.transpile(CALLS)
+
+    remarks = transpiler.optimization_remarks()
+    keys = [(remark["kind"], remark["pass_name"], remark["function"], remark["line"], remark["message"])
+            for remark in remarks]
+    assert len(keys) == len(set(keys))
+
+def test_kinds_filter_the_output():
+    transpiler = Transpiler(2)
+    transpiler.transpile(CALLS)
+    remarks = transpiler.optimizer.remarks
+
+    assert {remark["kind"] for remark in json.loads(remarks.to_json(["passed"]))} == {"passed"}
+    assert "!Missed" not in remarks.to_yaml(["passed"])
+
+def test_level_zero_reports_nothing():
+    transpiler = Transpiler(0)
+    transpiler.transpile(CALLS)
+    assert transpiler.optimization_remarks() == []
@@ -0,0 +1,95 @@
+import io
+
+import pytest
+
+from pytox86 import Transpiler
+from pytox86.cache import CompilationCache
+from pytox86.sink import AssemblySink, StreamSink, StringSink
+
+from .support import LEVELS
+
+PROGRAM = """
+def square(x):
+    return x * x + 0.5
+
+def total(n):
+    t = 0
+    for i in range(n):
+        t = t + square(i)
+    return t
+
+def main():
+    return int(total(10))
+"""
+
+NO_INLINING = {"params": {"inline_caller_budget": 0}}
+
+class RecordingSink(AssemblySink):
+    def __init__(self):
+        super().__init__()
+        self.chunks = []
+        self.closed = False
+
+    def write(self, text):
+        self.chunks.append(text)
+
+    def close(self):
+        self.closed = True
+
+@pytest.mark.parametrize("level", LEVELS)
+def test_streamed_output_matches_the_returned_text(level):
+    expected = Transpiler(level).transpile(PROGRAM)
+    output = io.StringIO()
+
+    assert Transpiler(level).transpile(PROGRAM, output=output) is None
+    assert output.getvalue() == expected
+
+@pytest.mark.parametrize("level", [1, 2])
+def test_cached_build_streams_the_same_text(level, tmp_path):
+    expected = Transpiler(level).transpile(PROGRAM)
+    transpiler = Transpiler(level, cache=CompilationCache(str(tmp_path), 1 << 20))
+
+    for _ in range(2):
+        output = io.StringIO()
+        assert transpiler.transpile(PROGRAM, output=output) is None
+        assert output.getvalue() == expected
+
+def test_each_function_is_written_when_it_is_finished():
+    transpiler = Transpiler(1, config=NO_INLINING)
+    ast = transpiler.parser.parse(transpiler.lexer.tokenize(PROGRAM))
+    transpiler.analyzer.analyze(ast)
+    program = transpiler.optimizer.optimize(transpiler.irgen.generate(ast))
+    sink = RecordingSink()
+
+    assert transpiler.codegen.generate(program, sink=sink) is None
+    assert sink.closed
+    assert len(sink.chunks) > len(program.functions)
+    assert "".join(sink.chunks) == Transpiler(1, config=NO_INLINING).transpile(PROGRAM)
+
+def test_chunks_join_like_one_list_of_lines():
+    sink = StringSink()
+    sink.write_lines(["a", "b"])
+    sink.write_lines([])
+    sink.write_lines(["c"])
+    assert sink.getvalue() == "a\nb\nc"
+
+def test_stream_sink_flushes_on_close():
+    class Stream(io.StringIO):
+        flushed = False
+
+        def flush(self):
+            self.flushed = True
+
+    stream = Stream()
+    sink = StreamSink(stream)
+    sink.write_lines(["x"])
+    sink.close()
+    assert stream.getvalue() == "x" and stream.flushed
+
+def test_transpile_file_streams_into_the_output_file(tmp_path):
+    source = tmp_path / "program.py"
+    source.write_text(PROGRAM)
+    target = tmp_path / "program.s"
+
+    Transpiler(2).transpile_file(str(source), str(target))
+    assert target.read_text() == Transpiler(2).transpile(PROGRAM)
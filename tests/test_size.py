@@ -0,0 +1,65 @@
+import shutil
+
+import pytest
+
+from pytox86 import Transpiler
+from pytox86.size import section_sizes
+
+from .support import compiled_result, python_result, requires_gcc
+
+requires_as = pytest.mark.skipif(shutil.which("as") is None, reason="needs the GNU assembler")
+
+PROGRAM = """
+def clamp(x, low, high):
+    if x < low:
+        return low
+    if x > high:
+        return high
+    return x
+
+def total(n):
+    t = 0
+    for i in range(n):
+        t = t + clamp(i * 7 - 20, 0, 50)
+    j = 0
+    while j < 12:
+        t = t + j
+        j = j + 1
+    return t
+
+def main():
+    return total(30)
+"""
+
+def function_body(assembly, name):
+    start = assembly.index(f"\n{name}:")
+    return assembly[start:assembly.index(f".size {name},", start)]
+
+@requires_as
+@pytest.mark.parametrize("level", [1, 2, 3])
+def test_size_mode_emits_the_smallest_text(level):
+    size = section_sizes(Transpiler("s").transpile(PROGRAM))["sections"][".text"]
+    assert size <= section_sizes(Transpiler(level).transpile(PROGRAM))["sections"][".text"]
+
+@requires_as
+def test_size_report_lists_each_function():
+    sizes = section_sizes(Transpiler("s").transpile(PROGRAM))
+    assert set(sizes["functions"]) >= {"main", "total"}
+    assert sum(sizes["functions"].values()) <= sizes["sections"][".text"]
+
+def test_size_mode_does_not_unroll_or_clone():
+    transpiler = Transpiler("s")
+    transpiler.transpile(PROGRAM)
+    passed = transpiler.optimization_remarks(["passed"])
+    assert not [remark for remark in passed if remark["pass_name"] == "unroll_loops"]
+    assert not [remark for remark in passed if "specialized for" in remark["message"]]
+
+def test_leaf_without_slots_has_no_frame_and_one_epilogue():
+    config = {"params": {"inline_caller_budget": 0}}
+    body = function_body(Transpiler("s", config=config).transpile(PROGRAM), "clamp")
+    assert "push rbp" not in body and "leave" not in body
+    assert body.count("ret") == 1
+
+@requires_gcc
+def test_size_mode_program_runs(tmp_path):
+    assert compiled_result(PROGRAM, "s", tmp_path) == python_result(PROGRAM)
@@ -0,0 +1,70 @@
+import re
+
+import pytest
+
+from pytox86 import Transpiler
+
+from .support import LEVELS, compiled_result, python_result, requires_gcc
+
+# Integer / is floor division in this language, so CPython runs the
+# program with // in its place
+PROGRAM = """
+def divide(x):
+    t = x / 7 + x % 7 + x / 8 + x % 8 + x / 10 + x % 10
+    return t + x / 641 + x % 641 + x / 3 + x % 3 + x / 1 + x % 1
+
+def scale(x):
+    return x * 8 + x * 3 + x * 9 + x * 15 + x * 17 + x * 40
+
+def main():
+    t = 0
+    for x in [-9223372036854775807 - 1, 9223372036854775807, -9223372036854775807, -1, 0, 1, 641, -641, -642]:
+        t = t + divide(x) % 256
+    for i in range(60):
+        t = t + divide(i * 37 - 1000) % 256 + scale(i - 30) % 256
+    return t
+"""
+
+NO_INLINING = {"params": {"inline_caller_budget": 0}}
+
+def function_body(assembly, name):
+    start = assembly.index(f"\n{name}:")
+    return assembly[start:assembly.index(f".size {name},", start)]
+
+def compiled(level, name):
+    return function_body(Transpiler(level, config=NO_INLINING).transpile(PROGRAM), name)
+
+@pytest.mark.parametrize("level", [1, 2, 3, "s"])
+def test_division_by_positive_constants_avoids_idiv(level):
+    assert "idiv" not in compiled(level, "divide")
+
+def test_power_of_two_division_uses_shifts():
+    body = compiled(1, "divide")
+    assert re.search(r"sar \w+, 3\n", body)
+    assert re.search(r"and \w+, 7\n", body)
+
+def test_other_divisors_multiply_by_a_magic_number():
+    body = compiled(1, "divide")
+    assert re.search(r"mov rdx, 5270498306774157605\n\s+mul rdx\n", body)
+    assert re.search(r"mov rdx, 7367186400732675841\n\s+mul rdx\n", body)
+
+def test_multiply_by_constants_uses_shifts_and_lea():
+    body = compiled(1, "scale")
+    assert re.search(r"lea \w+, \[\w+\*8\]", body)
+    assert re.search(r"lea \w+, \[(\w+)\+\1\*2\]", body)
+    assert re.search(r"lea (\w+), \[\w+\+\w+\*4\]\n\s+lea \w+, \[\1\+\1\*2\]", body)
+    assert re.search(r"lea (\w+), \[\w+\+\w+\*4\]\n\s+sal \1, 3\n", body)
+    for factor in (3, 8, 9, 15, 40):
+        assert not re.search(rf"imul [^\n]*, {factor}\n", body)
+
+@requires_gcc
+@pytest.mark.parametrize("level", LEVELS)
+def test_division_matches_floor_semantics(level, tmp_path):
+    expected = python_result(PROGRAM.replace(" / ", " // "))
+    assert compiled_result(PROGRAM, level, tmp_path) == expected
+
+@requires_gcc
+@pytest.mark.parametrize("level", LEVELS)
+def test_division_matches_floor_semantics_out_of_line(level, tmp_path):
+    expected = python_result(PROGRAM.replace(" / ", " // "))
+    assert compiled_result(PROGRAM, level, tmp_path, config=NO_INLINING) == expected
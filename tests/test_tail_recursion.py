@@ -0,0 +1,47 @@
+import pytest
+
+from .support import LEVELS, compiled_result, ops, optimize, python_result, requires_gcc
+
+PROGRAM = """
+def fact(n):
+    if n <= 1:
+        return 1
+    return n * fact(n - 1)
+
+def gcd(a, b):
+    if b == 0:
+        return a
+    return gcd(b, a % b)
+
+def fib(n):
+    if n < 2:
+        return n
+    return fib(n - 1) + fib(n - 2)
+
+def main():
+    return fact(10) + gcd(84, 36) + fib(15)
+"""
+
+def eliminate():
+    optimizer, functions = optimize(PROGRAM, passes=["eliminate_tail_recursion"], late_passes=[])
+    messages = {(remark.function, remark.message) for remark in optimizer.remarks.select(["passed"])}
+    return functions, messages
+
+def test_factorial_becomes_a_loop_with_an_accumulator():
+    functions, messages = eliminate()
+    assert ops(functions["fact"], "call") == []
+    assert ("fact", "recursive call converted to a loop with a '*' accumulator") in messages
+
+def test_tail_call_becomes_a_jump():
+    functions, messages = eliminate()
+    assert ops(functions["gcd"], "call") == []
+    assert ("gcd", "tail call converted to a jump to the function entry") in messages
+
+def test_only_the_call_in_accumulator_position_goes():
+    functions, _ = eliminate()
+    assert [instr.args[0] for instr in ops(functions["fib"], "call")] == ["fib"]
+
+@requires_gcc
+@pytest.mark.parametrize("level", LEVELS)
+def test_eliminated_recursion_runs(level, tmp_path):
+    assert compiled_result(PROGRAM, level, tmp_path) == python_result(PROGRAM)
@@ -0,0 +1,83 @@
+import pytest
+
+from pytox86.cfg import ControlFlowGraph
+from pytox86.loops import find_loops
+
+from .support import LEVELS, compiled_result, optimize, python_result, requires_gcc
+
+CONSTANT_TRIPS = """
+def main():
+    total = 0
+    i = 0
+    while i < 5:
+        total = total + i * i
+        i = i + 1
+    return total
+"""
+
+# Trip counts 0 to 9 leave every remainder of a factor of 4 or 8
+UNKNOWN_TRIPS = """
+def count(n):
+    total = 0
+    i = 0
+    while i < n:
+        total = total * 3 + i
+        i = i + 1
+    return total
+
+def count_by_three(n):
+    total = 0
+    i = 0
+    while i < n:
+        total = total * 5 + i
+        i = i + 3
+    return total
+
+def main():
+    t = 0
+    for n in range(10):
+        t = t + count(n) + count_by_three(n) * 7
+    return t
+"""
+
+# The cleanup the loops need first; the bound n is only invariant once
+# its load is hoisted
+CLEANUP = ["constant_propagation", "copy_propagation", "eliminate_dead_code", "merge_blocks",
+           "loop_invariant_code_motion"]
+
+def unroll(source, **params):
+    return optimize(source, passes=CLEANUP, late_passes=["unroll_loops"], **params)
+
+def messages(optimizer, kind="passed"):
+    return [remark.message for remark in optimizer.remarks.select([kind], "unroll_loops")]
+
+def test_constant_trip_count_is_fully_unrolled():
+    optimizer, functions = unroll(CONSTANT_TRIPS, full_unroll_limit=8, unroll_budget=100)
+    assert messages(optimizer) == ["loop fully unrolled (5 iterations)"]
+    assert find_loops(ControlFlowGraph(functions["main"])) == []
+
+def test_trip_count_above_the_limit_is_partially_unrolled():
+    optimizer, _ = unroll(CONSTANT_TRIPS, full_unroll_limit=4, unroll_factor=2, unroll_budget=100)
+    assert messages(optimizer) == ["loop unrolled by a factor of 2 with a remainder loop"]
+
+def test_unknown_trip_count_keeps_a_remainder_loop():
+    optimizer, functions = unroll(UNKNOWN_TRIPS, unroll_factor=4, unroll_budget=100)
+    assert "loop unrolled by a factor of 4 with a remainder loop" in messages(optimizer)
+    assert len(find_loops(ControlFlowGraph(functions["count"]))) == 2
+    assert len(find_loops(ControlFlowGraph(functions["count_by_three"]))) == 2
+
+def test_budget_stops_unrolling():
+    optimizer, _ = unroll(UNKNOWN_TRIPS, unroll_factor=4, unroll_budget=1)
+    assert messages(optimizer) == []
+    assert any("exceed the unroll budget of 1" in message for message in messages(optimizer, "missed"))
+
+@requires_gcc
+@pytest.mark.parametrize("level", LEVELS)
+def test_unrolled_remainders_run(level, tmp_path):
+    assert compiled_result(UNKNOWN_TRIPS, level, tmp_path) == python_result(UNKNOWN_TRIPS)
+
+@requires_gcc
+@pytest.mark.parametrize("factor", [2, 3, 4, 8])
+def test_every_factor_handles_remainders(factor, tmp_path):
+    config = {"params": {"unroll_factor": factor, "unroll_budget": 1000, "inline_caller_budget": 0}}
+    assert compiled_result(UNKNOWN_TRIPS, 2, tmp_path, config=config) == python_result(UNKNOWN_TRIPS)